@@ -80,44 +80,106 @@ const humChart = new Chart(humCtx, {
   options: { responsive: true, plugins: { legend: { display: false } } }
 });
 
-async function fetchDashboard() {
+const DASHBOARD_POINTS = 12;
+const CLASS_COLORS = { Anomali:"#666", Normal:"#2a9d2a", Minor:"#ff9f00", Major:"#ff6b00", Critical:"#e53935" };
+let dashboardHistory = [];
+let dashboardStream = null;
+let pollTimer = null;
+
+function dashboardQuery() {
   const location = serverSelect.value;
   const room = roomSelect.value;
   const sensor = sensorSelect.value;
-  if (!location || !room || !sensor) return;
+  if (!location || !room || !sensor) return null;
+  return `location=${location}&room=${room}&sensor=${sensor}&points=${DASHBOARD_POINTS}`;
+}
 
-  const endpoint = `http://127.0.0.1:8000/dashboard-data?location=${location}&room=${room}&sensor=${sensor}&points=12`;
-  try {
-    const res = await fetch(endpoint);
-    if (!res.ok) return;
-    const json = await res.json();
-    if (!json.latest) return;
+function renderLatest(latest) {
+  tempNowEl.textContent = `${Number(latest.temperature).toFixed(1)} °C`;
+  humNowEl.textContent = `${Number(latest.humidity).toFixed(1)} %`;
+  classNowEl.textContent = latest.class || "Normal";
+  classNowEl.style.color = CLASS_COLORS[latest.class] || "#222";
+}
 
-    tempNowEl.textContent = `${Number(json.latest.temperature).toFixed(1)} °C`;
-    humNowEl.textContent = `${Number(json.latest.humidity).toFixed(1)} %`;
-    classNowEl.textContent = json.latest.class || "Normal";
+function renderCharts() {
+  const labels = dashboardHistory.map(h => new Date(h.timestamp).toLocaleTimeString([], {hour:'2-digit', minute:'2-digit'}));
 
-    const cls = json.latest.class;
-    const colorMap = { Anomali:"#666", Normal:"#2a9d2a", Minor:"#ff9f00", Major:"#ff6b00", Critical:"#e53935" };
-    classNowEl.style.color = colorMap[cls] || "#222";
+  tempChart.data.labels = labels;
+  tempChart.data.datasets[0].data = dashboardHistory.map(h => h.temperature);
+  tempChart.update();
 
-    const labels = json.history.map(h => new Date(h.timestamp).toLocaleTimeString([], {hour:'2-digit', minute:'2-digit'}));
-    const temps = json.history.map(h => h.temperature);
-    const hums = json.history.map(h => h.humidity);
+  humChart.data.labels = labels;
+  humChart.data.datasets[0].data = dashboardHistory.map(h => h.humidity);
+  humChart.update();
+}
+
+function renderDashboard(json) {
+  if (!json.latest) return;
+  dashboardHistory = json.history;
+  renderLatest(json.latest);
+  renderCharts();
+}
 
-    tempChart.data.labels = labels;
-    tempChart.data.datasets[0].data = temps;
-    tempChart.update();
+// data baru dari stream: timestamp sama -> ganti titik terakhir (rata-rata ALL diperbarui)
+function applyReading(reading) {
+  const last = dashboardHistory[dashboardHistory.length - 1];
+  if (last && last.timestamp === reading.timestamp) {
+    dashboardHistory[dashboardHistory.length - 1] = reading;
+  } else if (!last || reading.timestamp > last.timestamp) {
+    dashboardHistory.push(reading);
+    dashboardHistory = dashboardHistory.slice(-DASHBOARD_POINTS);
+  } else {
+    return;
+  }
+  renderLatest(reading);
+  renderCharts();
+}
 
-    humChart.data.labels = labels;
-    humChart.data.datasets[0].data = hums;
-    humChart.update();
+async function fetchDashboard() {
+  const query = dashboardQuery();
+  if (!query) return;
 
+  const endpoint = `http://127.0.0.1:8000/dashboard-data?${query}`;
+  try {
+    const res = await fetch(endpoint);
+    if (!res.ok) return;
+    renderDashboard(await res.json());
   } catch (err) {
     console.error("fetchDashboard error", err);
   }
 }
+
+function stopDashboard() {
+  if (dashboardStream) {
+    dashboardStream.close();
+    dashboardStream = null;
+  }
+  if (pollTimer) {
+    clearInterval(pollTimer);
+    pollTimer = null;
+  }
+}
+
+// pakai Server-Sent Events; polling hanya kalau browser tidak mendukung EventSource
+function startDashboard() {
+  stopDashboard();
+  const query = dashboardQuery();
+  if (!query) return;
+
+  if (!window.EventSource) {
+    fetchDashboard();
+    pollTimer = setInterval(fetchDashboard, 10000);
+    return;
+  }
+
+  dashboardStream = new EventSource(`http://127.0.0.1:8000/dashboard-stream?${query}`);
+  dashboardStream.addEventListener("snapshot", e => renderDashboard(JSON.parse(e.data)));
+  dashboardStream.addEventListener("reading", e => applyReading(JSON.parse(e.data)));
+  dashboardStream.onerror = err => console.error("dashboard stream error", err);  // EventSource reconnect sendiri
+}
+
 serverSelect.addEventListener("change", () => {
+  stopDashboard();
   populateRoomsAndSensors();
   tempNowEl.textContent = "-- °C";
   humNowEl.textContent = "-- %";
@@ -125,13 +187,9 @@ serverSelect.addEventListener("change", () => {
 });
 roomSelect.addEventListener("change", () => {
   updateSensors();
-  
-  setTimeout(() => {
-    fetchDashboard();
-  }, 100); 
+  startDashboard();
 });
-sensorSelect.addEventListener("change", fetchDashboard);
-setInterval(fetchDashboard, 10000);
+sensorSelect.addEventListener("change", startDashboard);
 
 /* ---------------- Future Prediction ---------------- */
 const fpServerSelect = document.getElementById("fpServerSelect");
@@ -1,14 +1,2 @@
-from mysql.connector import pooling
-
-dbconfig = {
-    "host": "localhost",
-    "user": "root",
-    "password": "",
-    "database": "intern_telkomsel"
-}
-
-connection_pool = pooling.MySQLConnectionPool(pool_name="mypool", pool_size=5, **dbconfig)
-
-def get_connection():
-    return connection_pool.get_connection()
-
+# implementasi pool / query ada di shared/db.py (dipakai bersama backend dan ML_Services)
+from shared.db import get_connection, fetchall, fetchone, run, stats, PoolTimeout  # noqa: F401
@@ -51,6 +51,7 @@
 #     }
 
 # ML_Services/main.py
+import sys
 import time
 import traceback
 import logging
@@ -61,10 +62,23 @@ from typing import Dict, Any
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
-from ML_Services.schemas import PredictionRequest
-from ML_Services.models_config import MODELS_KEBALEN, MODELS_GAYUNGAN
-from ML_Services.services.prediction import make_prediction, save_predictions
-from ML_Services.services.preprocessing import get_sensor_data, average_by_interval
+from ML_Services.db import stats as db_stats
+from shared.metrics import instrument, observe_stages, track_executor, gauge
+from ML_Services.schemas import PredictionRequest, BatchPredictionRequest
+from ML_Services.models_config import MODELS_KEBALEN, MODELS_GAYUNGAN, REGISTRY, MODEL_PRELOAD
+from ML_Services.services import numpy_lstm
+from ML_Services.services.prediction import forecast_start, make_prediction, make_predictions_batch, model_backends, save_predictions
+from ML_Services.services.preprocessing import (
+    get_sensor_data, get_location_sensor_data, get_latest_time_ids, average_by_interval,
+    get_room_rollup, get_location_rollups, ROLLUPS_ENABLED, SensorRows,
+)
+from ML_Services.services.forecast_cache import FORECAST_CACHE, FORECAST_CACHE_ENABLED
+from ML_Services.services.prediction_writer import PREDICTION_WRITER, PREDICTION_WRITE_BEHIND
+from ML_Services.services.schema import PREDICTION_UNIQUE_INDEX, missing_prediction_indexes
+from ML_Services.services.scheduler import ForecastScheduler, FORECAST_SCHEDULER, SCHEDULER_HORIZON_HOURS
+from ML_Services.services.inference_workers import (
+    INFERENCE_POOL, INFERENCE_WORKERS, INFERENCE_QUEUE_DEPTH, INFERENCE_TIMEOUT,
+)
 
 # logging
 logger = logging.getLogger("uvicorn.error")
@@ -80,7 +94,39 @@ app.add_middleware(
 
 # Thread pool for CPU-bound blocking work (inference, DB access, preprocessing)
 # Choose max_workers according to CPU cores and memory. Start small (2-4).
-EXECUTOR = ThreadPoolExecutor(max_workers=3)
+# With INFERENCE_WORKERS > 0 inference runs in worker processes and these threads
+# mostly wait on DB / workers, so allow enough of them to keep every worker queue fed.
+EXECUTOR = ThreadPoolExecutor(max_workers=max(3, INFERENCE_WORKERS * INFERENCE_QUEUE_DEPTH))
+
+# /metrics: request counts/latency, per-stage histograms, executor queue, DB pool, model loads, writer
+instrument(app, "ml")
+track_executor("predict", EXECUTOR)
+gauge("models_resident", "Models currently held by the registry", lambda: REGISTRY.status()["resident_count"])
+gauge("prediction_writer_queue_depth", "Forecasts waiting in the write-behind queue", PREDICTION_WRITER.queue_depth)
+PIPELINE_STAGES = ("cache_lookup", "data_fetch", "averaging", "inference", "save", "total")
+
+MODELS_BY_LOCATION = {
+    "kebalen": MODELS_KEBALEN,
+    "gayungan": MODELS_GAYUNGAN,
+}
+
+def _invalidate_fused(location, sensor, room):
+    # forecast_engine pulls in TensorFlow, so it is only imported once the fused engine runs
+    engine = sys.modules.get("ML_Services.services.forecast_engine")
+    if engine is not None:
+        engine.invalidate(location, sensor, room)
+
+
+# compiled graphs hold model references, drop them when the registry evicts a model
+REGISTRY.add_eviction_listener(_invalidate_fused)
+REGISTRY.add_eviction_listener(numpy_lstm.invalidate)
+
+
+@app.on_event("startup")
+async def preload_models():
+    if MODEL_PRELOAD and not INFERENCE_WORKERS:
+        # load in background so the server starts accepting requests immediately
+        asyncio.get_event_loop().run_in_executor(EXECUTOR, lambda: REGISTRY.preload(backend=model_backends))
 
 
 @app.get("/")
@@ -88,6 +134,91 @@ async def root():
     return {"message": "ml service is running"}
 
 
+def _save_predictions(location: str, room: int, predictions: list):
+    """Queue on the write-behind writer when enabled, otherwise bulk upsert inline."""
+    if PREDICTION_WRITE_BEHIND:
+        return PREDICTION_WRITER.submit(location, room, predictions)
+    save_predictions(location, room, predictions)
+    return "written"
+
+
+def _cache_lookup(location: str, rooms: list, duration_hours: int):
+    """
+    Returns ({room: cached_result}, {room: data version}) (latest time_id, or rollup bucket + cnt).
+    Lookup failures are non-critical: the pipeline simply recomputes.
+    """
+    if not FORECAST_CACHE_ENABLED:
+        return {}, {}
+    try:
+        latest = get_latest_time_ids(location, rooms)
+    except Exception as e:
+        logger.error(f"[{location}] latest time_id lookup failed: {e}")
+        return {}, {}
+
+    start = forecast_start().isoformat()
+    hits = {}
+    for room in rooms:
+        cached = FORECAST_CACHE.get(location, room, duration_hours, latest.get(room), start)
+        if cached is not None:
+            hits[room] = cached
+    return hits, latest
+
+
+def _short_series_error(points: int):
+    return f"Not enough data for this room (need at least {numpy_lstm.WINDOW} points, got {points})"
+
+
+def _cache_profiling(hit_rooms):
+    stats = FORECAST_CACHE.stats()
+    stats["hit"] = hit_rooms
+    return stats
+
+
+@app.on_event("startup")
+async def start_prediction_writer():
+    if PREDICTION_WRITE_BEHIND:
+        PREDICTION_WRITER.start()
+
+
+@app.on_event("startup")
+async def check_prediction_schema():
+    # upsert prediksi butuh unique key; tanpa itu tiap forecast ulang menambah baris duplikat
+    try:
+        missing = await asyncio.get_event_loop().run_in_executor(EXECUTOR, missing_prediction_indexes)
+    except Exception as e:
+        logger.warning(f"Could not check {PREDICTION_UNIQUE_INDEX} on prediction tables: {e}")
+        return
+    for table in missing:
+        logger.error(
+            f"{table} has no unique index {PREDICTION_UNIQUE_INDEX}: saved forecasts will pile up as duplicates. "
+            f"Run: python -m ML_Services.services.schema"
+        )
+
+
+@app.on_event("shutdown")
+async def flush_prediction_writer():
+    # flush queued forecasts before the process exits
+    PREDICTION_WRITER.stop()
+
+
+@app.get("/admin/writer")
+async def admin_writer():
+    """Write-behind queue depth, batch sizes and flush latency for saved predictions."""
+    return PREDICTION_WRITER.stats()
+
+
+@app.get("/admin/models")
+async def admin_models():
+    """Which models are resident, their load/warmup times and the cache budget."""
+    return REGISTRY.status()
+
+
+@app.get("/admin/db")
+async def admin_db():
+    """Pool usage, acquire wait times and per-query timings."""
+    return db_stats()
+
+
 def _do_predict_pipeline(
     location: str,
     room: str,
@@ -107,10 +238,26 @@ def _do_predict_pipeline(
     start_total = time.time()
 
     try:
-        # 1) fetch raw data
+        # 0) forecast cache: skip the whole pipeline if no new sensor row arrived
+        tc = time.time()
+        hits, latest = _cache_lookup(location, [room], duration_hours)
+        profiling['cache_lookup'] = time.time() - tc
+        profiling['cache'] = _cache_profiling(room in hits)
+        if room in hits:
+            profiling['total'] = time.time() - start_total
+            observe_stages("ml", location, room, profiling, PIPELINE_STAGES)
+            logger.info(f"[{location}/{room}] forecast cache hit: {profiling['total']:.3f}s")
+            return {"prediction_result": hits[room], "profiling": profiling}
+
+        # 1) fetch raw data (or already-averaged 5-minute rollups)
         t0 = time.time()
-        raw_data = get_sensor_data(location, room, duration_hours)
+        if ROLLUPS_ENABLED:
+            raw_data = get_room_rollup(location, room, duration_hours)
+        else:
+            raw_data = get_sensor_data(location, room, duration_hours)
         profiling['data_fetch'] = time.time() - t0
+        if isinstance(raw_data, SensorRows):
+            profiling['rows'] = raw_data.stats()
         logger.info(f"[{location}/{room}] data fetch: {profiling['data_fetch']:.3f}s (rows={len(raw_data) if hasattr(raw_data, '__len__') else 'N/A'})")
 
         if len(raw_data) == 0:
@@ -119,29 +266,34 @@ def _do_predict_pipeline(
             profiling['total'] = total
             return {"error": "No data found for this room", "profiling": profiling}
 
-        # 2) averaging / preprocessing
+        # 2) resample to the fixed 5-minute grid (rollups are already bucketed, gaps still filled)
+        # the float32 arrays go straight to make_prediction, no list-of-dicts round trip
         t1 = time.time()
-        averaged_df = average_by_interval(raw_data)
+        seq_data = raw_data if ROLLUPS_ENABLED else average_by_interval(raw_data)
         profiling['averaging'] = time.time() - t1
-        logger.info(f"[{location}/{room}] averaging: {profiling['averaging']:.3f}s (records={len(averaged_df) if hasattr(averaged_df, '__len__') else 'N/A'})")
+        profiling['gaps_filled'] = seq_data.gaps_filled
+        logger.info(f"[{location}/{room}] averaging: {profiling['averaging']:.3f}s (records={len(seq_data)}, gaps_filled={seq_data.gaps_filled})")
 
-        # Convert to list-of-dicts (sequence) expected by make_prediction
-        t2 = time.time()
-        seq_data = averaged_df.to_dict(orient="records") if hasattr(averaged_df, "to_dict") else list(averaged_df)
-        profiling['prep_format'] = time.time() - t2
-        logger.info(f"[{location}/{room}] format prep: {profiling['prep_format']:.3f}s")
+        if len(seq_data) < numpy_lstm.WINDOW:
+            profiling['total'] = time.time() - start_total
+            return {"error": _short_series_error(len(seq_data)), "profiling": profiling}
 
         # 3) inference / prediction
         t3 = time.time()
-        result = make_prediction(seq_data, models_dict, location, room, duration_hours)
+        if INFERENCE_POOL.enabled:
+            result = INFERENCE_POOL.predict(location, room, seq_data, duration_hours)
+        else:
+            result = make_prediction(seq_data, models_dict, location, room, duration_hours)
         profiling['inference'] = time.time() - t3
         logger.info(f"[{location}/{room}] inference: {profiling['inference']:.3f}s")
 
+        if FORECAST_CACHE_ENABLED:
+            FORECAST_CACHE.put(location, room, latest.get(room), result)
+
         # 4) save predictions (non-critical, but measure)
         t4 = time.time()
         try:
-            save_predictions(location, result.get("room", room), result.get("predictions", []))
-            saved = True
+            saved = _save_predictions(location, result.get("room", room), result.get("predictions", []))
         except Exception as e:
             # Log but don't fail entire request if saving fails
             saved = False
@@ -152,6 +304,7 @@ def _do_predict_pipeline(
 
         total = time.time() - start_total
         profiling['total'] = total
+        observe_stages("ml", location, room, profiling, PIPELINE_STAGES)
         logger.info(f"[{location}/{room}] total pipeline time: {total:.3f}s")
 
         return {"prediction_result": result, "profiling": profiling}
@@ -166,11 +319,225 @@ def _do_predict_pipeline(
         raise RuntimeError({"error": str(e), "profiling": profiling})
 
 
+def _do_predict_all_pipeline(
+    location: str,
+    rooms: list,
+    duration_hours: int,
+    models_dict: dict
+) -> Dict[str, Any]:
+    """
+    Same stages as _do_predict_pipeline, but for several rooms of one location:
+    one DB query for all rooms, one batched inference run across rooms.
+
+    Returns dict: { "location": ..., "results": { room: {...} }, "profiling": {...} }
+    """
+    profiling = {}
+    start_total = time.time()
+    results = {}
+
+    try:
+        # 0) forecast cache: only rooms without a valid cached forecast go through the pipeline
+        tc = time.time()
+        hits, latest = _cache_lookup(location, rooms, duration_hours)
+        for room, cached in hits.items():
+            results[room] = {"prediction_result": cached}
+        rooms = [r for r in rooms if r not in hits]
+        profiling['cache_lookup'] = time.time() - tc
+        profiling['cache'] = _cache_profiling(sorted(hits))
+
+        # 1) fetch raw data for all rooms in one query
+        t0 = time.time()
+        if not rooms:
+            raw_by_room = {}
+        elif ROLLUPS_ENABLED:
+            raw_by_room = get_location_rollups(location, rooms, duration_hours)
+        else:
+            raw_by_room = get_location_sensor_data(location, rooms, duration_hours)
+        profiling['data_fetch'] = time.time() - t0
+        fetched = [raw for raw in raw_by_room.values() if isinstance(raw, SensorRows)]
+        if fetched:
+            profiling['rows'] = {
+                "scanned": fetched[0].rows_scanned,  # one query for all rooms
+                "fetched": sum(raw.rows_fetched for raw in fetched),
+                "returned": sum(len(raw) for raw in fetched),
+            }
+        logger.info(f"[{location}/all] data fetch: {profiling['data_fetch']:.3f}s (rooms={len(rooms)})")
+
+        # 2) resample per room to the fixed 5-minute grid
+        t1 = time.time()
+        seq_by_room = {}
+        for room, raw_data in raw_by_room.items():
+            if len(raw_data) == 0:
+                results[room] = {"error": "No data found for this room"}
+                continue
+            seq = raw_data if ROLLUPS_ENABLED else average_by_interval(raw_data)
+            if len(seq) < numpy_lstm.WINDOW:
+                # satu room pendek tidak boleh menggagalkan rollout room lain
+                results[room] = {"error": _short_series_error(len(seq))}
+                continue
+            seq_by_room[room] = seq
+        profiling['averaging'] = time.time() - t1
+        profiling['gaps_filled'] = {room: seq.gaps_filled for room, seq in seq_by_room.items()}
+        logger.info(f"[{location}/all] averaging: {profiling['averaging']:.3f}s")
+
+        # 3) batched inference across rooms (or one task per room on the worker processes)
+        t3 = time.time()
+        if seq_by_room and INFERENCE_POOL.enabled:
+            futures = {
+                room: INFERENCE_POOL.submit(location, room, seq, duration_hours)
+                for room, seq in seq_by_room.items()
+            }
+            predicted = {}
+            for room, future in futures.items():
+                try:
+                    predicted[room] = future.result(timeout=INFERENCE_TIMEOUT)
+                except Exception as e:
+                    logger.error(f"[{location}/{room}] worker inference failed: {e}")
+                    results[room] = {"error": str(e).splitlines()[0]}
+        elif seq_by_room:
+            predicted = make_predictions_batch(seq_by_room, models_dict, location, duration_hours)
+        else:
+            predicted = {}
+        profiling['inference'] = time.time() - t3
+        logger.info(f"[{location}/all] inference: {profiling['inference']:.3f}s (rooms={len(predicted)})")
+
+        if FORECAST_CACHE_ENABLED:
+            for room, result in predicted.items():
+                FORECAST_CACHE.put(location, room, latest.get(room), result)
+
+        # 4) save predictions per room (non-critical)
+        t4 = time.time()
+        for room, result in predicted.items():
+            try:
+                _save_predictions(location, result.get("room", room), result.get("predictions", []))
+            except Exception as e:
+                logger.error(f"[{location}/{room}] save_predictions failed: {e}")
+                logger.debug(traceback.format_exc())
+            results[room] = {"prediction_result": result}
+        profiling['save'] = time.time() - t4
+        logger.info(f"[{location}/all] save: {profiling['save']:.3f}s")
+
+        total = time.time() - start_total
+        profiling['total'] = total
+        observe_stages("ml", location, "all", profiling, PIPELINE_STAGES)
+        logger.info(f"[{location}/all] total pipeline time: {total:.3f}s")
+
+        return {"location": location, "results": results, "profiling": profiling}
+
+    except Exception as e:
+        tb = traceback.format_exc()
+        logger.error("Exception in batch prediction pipeline: %s\n%s", str(e), tb)
+        profiling['error'] = str(e)
+        profiling['total_so_far'] = time.time() - start_total
+        raise RuntimeError({"error": str(e), "profiling": profiling})
+
+
 async def _run_in_executor(fn, *args, **kwargs):
     loop = asyncio.get_event_loop()
     return await loop.run_in_executor(EXECUTOR, lambda: fn(*args, **kwargs))
 
 
+# In-flight request coalescing: identical concurrent requests share one pipeline run.
+# key -> [future, followers]
+_INFLIGHT: Dict[tuple, list] = {}
+COALESCE_STATS = {"runs": 0, "coalesced": 0}
+
+
+async def _run_coalesced(key: tuple, fn, *args):
+    """
+    Run fn(*args) on the executor unless an identical call (same key) is already in
+    flight, in which case await that run instead. Every caller gets its own copy of
+    the result with profiling['coalescing'] describing what happened.
+    """
+    entry = _INFLIGHT.get(key)
+    if entry is not None:
+        entry[1] += 1
+        COALESCE_STATS["coalesced"] += 1
+        t0 = time.time()
+        res = await asyncio.shield(entry[0])
+        return _with_coalescing(res, "follower", entry[1], waited=time.time() - t0)
+
+    # the executor future is shared as is: a cancelled leader stops waiting for it,
+    # but the run continues and the followers still get its result
+    future = asyncio.get_event_loop().run_in_executor(EXECUTOR, lambda: fn(*args))
+    entry = _INFLIGHT[key] = [future, 0]
+    COALESCE_STATS["runs"] += 1
+
+    def _done(f):
+        if _INFLIGHT.get(key) is entry:
+            _INFLIGHT.pop(key)
+        if not f.cancelled():
+            f.exception()  # retrieved here, so no "never retrieved" warning without followers
+
+    future.add_done_callback(_done)
+    res = await asyncio.shield(future)
+    return _with_coalescing(res, "leader", entry[1])
+
+
+def _with_coalescing(res, role: str, followers: int, waited: float = None):
+    if not isinstance(res, dict):
+        return res
+    profiling = dict(res.get("profiling") or {})
+    profiling["coalescing"] = dict(
+        COALESCE_STATS,
+        role=role,
+        shared_with=followers,
+        in_flight=len(_INFLIGHT),
+    )
+    if waited is not None:
+        profiling["coalescing"]["waited"] = waited
+    return dict(res, profiling=profiling)
+
+
+# Background forecaster: recompute every configured room right after each 5-minute
+# boundary so /predict-* requests are answered from the forecast cache.
+SCHEDULER = ForecastScheduler(
+    jobs=[
+        (location, room)
+        for location, models_dict in MODELS_BY_LOCATION.items()
+        for room in sorted(models_dict["temperature"])
+    ],
+    run_fn=lambda location, room: _do_predict_pipeline(
+        location, room, SCHEDULER_HORIZON_HOURS, MODELS_BY_LOCATION[location]
+    ),
+    executor=EXECUTOR,
+)
+
+
+@app.on_event("startup")
+async def start_inference_workers():
+    # each worker preloads only the rooms routed to it
+    INFERENCE_POOL.start(jobs=SCHEDULER.jobs)
+
+
+@app.on_event("shutdown")
+async def stop_inference_workers():
+    INFERENCE_POOL.stop()
+
+
+@app.get("/admin/inference")
+async def admin_inference():
+    """Worker processes, their rooms, in-flight tasks and restarts."""
+    return INFERENCE_POOL.stats()
+
+
+@app.on_event("startup")
+async def start_scheduler():
+    if FORECAST_SCHEDULER:
+        SCHEDULER.start()
+
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    await SCHEDULER.stop()
+
+
+@app.get("/admin/scheduler")
+async def admin_scheduler():
+    """Per-room schedule lag, run duration and status of the background forecaster."""
+    return SCHEDULER.status()
+
+
 @app.post("/predict-kebalen")
 async def predict_kebalen(request: PredictionRequest):
     """
@@ -179,7 +546,8 @@ async def predict_kebalen(request: PredictionRequest):
     """
     try:
         # Run full blocking pipeline in executor (preprocessing + inference + save)
-        res = await _run_in_executor(
+        res = await _run_coalesced(
+            ("kebalen", request.room, request.duration_hours),
             _do_predict_pipeline,
             "kebalen",
             request.room,
@@ -206,7 +574,8 @@ async def predict_kebalen(request: PredictionRequest):
 @app.post("/predict-gayungan")
 async def predict_gayungan(request: PredictionRequest):
     try:
-        res = await _run_in_executor(
+        res = await _run_coalesced(
+            ("gayungan", request.room, request.duration_hours),
             _do_predict_pipeline,
             "gayungan",
             request.room,
@@ -228,4 +597,36 @@ async def predict_gayungan(request: PredictionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/predict-all")
+async def predict_all(request: BatchPredictionRequest):
+    """
+    Forecast every room of a location (or request.rooms) in one pipeline run.
+    Returns: { location, results: { room: { prediction_result } | { error } }, profiling }.
+    """
+    models_dict = MODELS_BY_LOCATION.get(request.location)
+    if models_dict is None:
+        raise HTTPException(status_code=400, detail="Unknown location")
+
+    configured = sorted(models_dict["temperature"])
+    rooms = request.rooms or configured
+    invalid = [r for r in rooms if r not in configured]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"No model for room(s) {invalid} in {request.location}")
 
+    try:
+        return await _run_coalesced(
+            ("all", request.location, tuple(sorted(set(rooms))), request.duration_hours),
+            _do_predict_all_pipeline,
+            request.location,
+            sorted(set(rooms)),
+            request.duration_hours,
+            models_dict
+        )
+
+    except RuntimeError as re:
+        payload = re.args[0] if re.args else {"error": "unknown", "profiling": {}}
+        logger.error("RuntimeError in /predict-all: %s", payload)
+        raise HTTPException(status_code=500, detail=payload)
+    except Exception as e:
+        logger.error("Unhandled error in /predict-all: %s\n%s", str(e), traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
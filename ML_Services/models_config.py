@@ -1,6 +1,18 @@
-import joblib
-from tensorflow.keras.models import load_model
-from tensorflow.keras.losses import MeanSquaredError
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ML_Services.services.numpy_lstm import NumpyLSTMModel
+from ML_Services.services.model_bundle import BUNDLES
+from shared.metrics import MODEL_LOAD
+
+logger = logging.getLogger("uvicorn.error")
 
 # ------------------------------
 # Path model & scaler per lokasi
@@ -62,19 +74,265 @@ SCALER_GAYUNGAN = {
 }
 
 # ------------------------------
-# Load semua model & scaler
+# Model registry: lazy / parallel load, LRU, warmup
 # ------------------------------
-def load_models(model_dict, scaler_dict):
-    return {
-        sensor: {
-            r: (
-                load_model(model_dict[sensor][r], custom_objects={"mse": MeanSquaredError()}),
-                joblib.load(scaler_dict[sensor][r]),
-            )
-            for r in model_dict[sensor]
-        }
-        for sensor in model_dict
-    }
-
-MODELS_KEBALEN = load_models(MODEL_KEBALEN, SCALER_KEBALEN)
-MODELS_GAYUNGAN = load_models(MODEL_GAYUNGAN, SCALER_GAYUNGAN)
\ No newline at end of file
+MODEL_PATHS = {
+    "kebalen": (MODEL_KEBALEN, SCALER_KEBALEN),
+    "gayungan": (MODEL_GAYUNGAN, SCALER_GAYUNGAN),
+}
+
+# 0 = tanpa batas
+MODEL_CACHE_MAX_MODELS = int(os.getenv("MODEL_CACHE_MAX_MODELS", "0"))
+MODEL_CACHE_MAX_MB = float(os.getenv("MODEL_CACHE_MAX_MB", "0"))
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "1") == "1"
+MODEL_PRELOAD_WORKERS = int(os.getenv("MODEL_PRELOAD_WORKERS", "4"))
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+
+
+class ModelLoadError(RuntimeError):
+    pass
+
+
+# "keras" = tf.keras model, "numpy" = NumpyLSTMModel (tanpa TensorFlow saat inference)
+BACKENDS = ("keras", "numpy")
+
+
+def _load_pair(location, sensor, room, model_path, scaler_path, backend="keras"):
+    """
+    Return (model, scaler, source). Kalau ada bundle (lihat model_bundle.py), scaler dan
+    bobot numpy diambil dari sana; TensorFlow / joblib hanya di-import kalau memang dipakai.
+    """
+    bundle = BUNDLES.get(location)
+    if bundle is not None and (sensor, room) not in bundle:
+        bundle = None
+
+    if backend == "numpy" and bundle is not None:
+        model = bundle.model(sensor, room)
+    elif backend == "numpy":
+        model = NumpyLSTMModel.from_h5(model_path)
+    else:
+        from tensorflow.keras.models import load_model
+        from tensorflow.keras.losses import MeanSquaredError
+        model = load_model(model_path, custom_objects={"mse": MeanSquaredError()})
+
+    if bundle is not None:
+        return model, bundle.scaler(sensor, room), "bundle"
+    import joblib
+    return model, joblib.load(scaler_path), "h5"
+
+
+def _warmup(model, backend="keras"):
+    # dummy forward pass supaya request pertama tidak kena biaya build
+    shape = [1 if d is None else d for d in model.input_shape]
+    x = np.zeros(shape, dtype=np.float32)
+    if backend == "numpy":
+        model.predict(x)
+    else:
+        model(x, training=False)
+
+
+class ModelRegistry:
+    """
+    Menyimpan (model, scaler) per (location, sensor, room, backend).
+    Load saat pertama dipakai (atau preload paralel), dengan budget jumlah / MB
+    dan eviction LRU. File rusak hanya membuat room itu tidak tersedia.
+    """
+
+    def __init__(self, paths, max_models=0, max_mb=0, warmup=True):
+        self.paths = paths
+        self.max_models = max_models
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.warmup = warmup
+
+        self._resident = OrderedDict()  # key -> (model, scaler), urutan = LRU
+        self._info = {}                 # key -> dict statistik
+        self._key_locks = {}
+        self._lock = threading.RLock()
+        self._evict_listeners = []
+
+    # --- key helpers ---
+    def keys(self, location=None, backend="keras"):
+        """backend: nama backend, atau callable (location, room) -> tuple backend."""
+        for loc, (model_dict, _) in self.paths.items():
+            if location is not None and loc != location:
+                continue
+            for sensor in model_dict:
+                for room in model_dict[sensor]:
+                    for b in (backend(loc, room) if callable(backend) else (backend,)):
+                        yield (loc, sensor, room, b)
+
+    def add_eviction_listener(self, fn):
+        """fn(location, sensor, room) dipanggil setiap ada model yang di-evict (backend apa pun)."""
+        self._evict_listeners.append(fn)
+
+    # --- loading ---
+    def get(self, location, sensor, room, backend="keras"):
+        key = (location, sensor, room, backend)
+        with self._lock:
+            if key in self._resident:
+                self._resident.move_to_end(key)
+                self._info[key]["last_used"] = time.time()
+                return self._resident[key]
+            try:
+                model_path = self.paths[location][0][sensor][room]
+                scaler_path = self.paths[location][1][sensor][room]
+            except KeyError:
+                raise KeyError(key)
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # load di luar lock global supaya room lain tetap bisa dilayani
+        with key_lock:
+            with self._lock:
+                if key in self._resident:
+                    self._resident.move_to_end(key)
+                    return self._resident[key]
+
+            info = {"resident": False, "error": None}
+            t0 = time.time()
+            try:
+                model, scaler, info["source"] = _load_pair(location, sensor, room, model_path, scaler_path, backend)
+                pair = (model, scaler)
+                info["load_time"] = time.time() - t0
+                if self.warmup:
+                    t1 = time.time()
+                    _warmup(pair[0], backend)
+                    info["warmup_time"] = time.time() - t1
+            except Exception as e:
+                info["error"] = str(e)
+                info["load_time"] = time.time() - t0
+                with self._lock:
+                    self._info[key] = info
+                logger.error("Failed to load model %s: %s", key, e)
+                raise ModelLoadError(f"Model {location}/{sensor}/room{room} ({backend}) unavailable: {e}")
+
+            MODEL_LOAD.labels(location, sensor, backend).observe(info["load_time"])
+            info["size_bytes"] = pair[0].count_params() * 4
+            info["loaded_at"] = info["last_used"] = time.time()
+            info["resident"] = True
+
+            with self._lock:
+                self._resident[key] = pair
+                self._info[key] = info
+                self._evict_over_budget(keep=key)
+            logger.info("Loaded model %s in %.3fs", key, info["load_time"])
+            return pair
+
+    def preload(self, location=None, backend="keras", workers=MODEL_PRELOAD_WORKERS):
+        """Load semua model secara paralel. Error per file dicatat, tidak menghentikan yang lain."""
+        keys = list(self.keys(location, backend))
+        if self.max_models:
+            keys = keys[:self.max_models]
+
+        def _try(key):
+            try:
+                self.get(*key)
+            except ModelLoadError:
+                pass
+
+        t0 = time.time()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_try, keys))
+        logger.info("Preloaded %d models in %.3fs", len(keys), time.time() - t0)
+
+    # --- eviction ---
+    def _resident_bytes(self):
+        return sum(self._info[k]["size_bytes"] for k in self._resident)
+
+    def _over_budget(self):
+        if self.max_models and len(self._resident) > self.max_models:
+            return True
+        if self.max_bytes and self._resident_bytes() > self.max_bytes:
+            return True
+        return False
+
+    def _evict_over_budget(self, keep=None):
+        while self._over_budget():
+            victim = next((k for k in self._resident if k != keep), None)
+            if victim is None:
+                break
+            self.evict(*victim)
+
+    def evict(self, location, sensor, room, backend="keras"):
+        key = (location, sensor, room, backend)
+        with self._lock:
+            if self._resident.pop(key, None) is None:
+                return False
+            self._info[key]["resident"] = False
+            self._info[key]["evictions"] = self._info[key].get("evictions", 0) + 1
+        for fn in self._evict_listeners:
+            fn(location, sensor, room)
+        logger.info("Evicted model %s", key)
+        return True
+
+    # --- introspection ---
+    def status(self):
+        with self._lock:
+            models = []
+            keys = list(self.keys())
+            keys += [k for k in self._info if k not in set(keys)]
+            for key in keys:
+                info = dict(self._info.get(key, {"resident": False}))
+                info.update({"location": key[0], "sensor": key[1], "room": key[2], "backend": key[3]})
+                models.append(info)
+            return {
+                "resident_count": len(self._resident),
+                "resident_bytes": self._resident_bytes(),
+                "max_models": self.max_models,
+                "max_bytes": self.max_bytes,
+                "models": models,
+            }
+
+    def view(self, location, backend="keras"):
+        return _LocationView(self, location, backend)
+
+
+class _SensorView(Mapping):
+    def __init__(self, registry, location, sensor, backend):
+        self._registry = registry
+        self._location = location
+        self._sensor = sensor
+        self._backend = backend
+
+    def __getitem__(self, room):
+        return self._registry.get(self._location, self._sensor, room, self._backend)
+
+    def __iter__(self):
+        return iter(self._registry.paths[self._location][0][self._sensor])
+
+    def __len__(self):
+        return len(self._registry.paths[self._location][0][self._sensor])
+
+
+class _LocationView(Mapping):
+    """Pengganti dict MODELS_<LOKASI>: models["temperature"][room] -> (model, scaler)."""
+
+    def __init__(self, registry, location, backend="keras"):
+        self._registry = registry
+        self._location = location
+        self.backend = backend
+
+    def with_backend(self, backend):
+        """View yang sama untuk backend lain, mis. models.with_backend("numpy")."""
+        return _LocationView(self._registry, self._location, backend)
+
+    def __getitem__(self, sensor):
+        if sensor not in self._registry.paths[self._location][0]:
+            raise KeyError(sensor)
+        return _SensorView(self._registry, self._location, sensor, self.backend)
+
+    def __iter__(self):
+        return iter(self._registry.paths[self._location][0])
+
+    def __len__(self):
+        return len(self._registry.paths[self._location][0])
+
+
+REGISTRY = ModelRegistry(
+    MODEL_PATHS,
+    max_models=MODEL_CACHE_MAX_MODELS,
+    max_mb=MODEL_CACHE_MAX_MB,
+    warmup=MODEL_WARMUP,
+)
+
+MODELS_KEBALEN = REGISTRY.view("kebalen")
+MODELS_GAYUNGAN = REGISTRY.view("gayungan")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 # class SequenceData(BaseModel):
 #     temperature: float
@@ -8,3 +8,9 @@ from typing import List
 class PredictionRequest(BaseModel):
     room: int
     duration_hours: int
+
+
+class BatchPredictionRequest(BaseModel):
+    location: str
+    duration_hours: int
+    rooms: Optional[List[int]] = None  # None = semua room di lokasi
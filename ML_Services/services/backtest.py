@@ -0,0 +1,321 @@
+"""
+Backtest forecaster LSTM per room pada data historis.
+
+Window 12 langkah digeser sepanjang rentang waktu; tiap origin di-forecast `steps` langkah
+ke depan secara autoregresif (sama seperti /predict), tapi semua origin satu model dihitung
+sekaligus dalam batch besar per forward pass. Model + scaler dari models_config.REGISTRY.
+
+    python -m ML_Services.services.backtest --location gayungan --start 2026-01-01 --end 2026-02-01
+    python -m ML_Services.services.backtest --location kebalen --start 2026-01-20 --hours 3 --out bt.json
+    python -m ML_Services.services.backtest ... --baseline bt.json        # exit 1 kalau MAE memburuk
+    python -m ML_Services.services.backtest ... --sequential-sample 50    # bandingkan dengan jalur per origin
+
+Output: MAE/RMSE per langkah horizon, room dan variabel (+ MAE persistence sebagai pembanding),
+jumlah window dan windows/detik.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ML_Services.db import get_connection
+from ML_Services.models_config import REGISTRY
+from ML_Services.services import numpy_lstm
+from ML_Services.services.numpy_lstm import WINDOW
+from ML_Services.services.preprocessing import TABLE_MAP, ROLLUP_TABLE_MAP, ROLLUPS_ENABLED, ROOM_MAP
+from ML_Services.services.resample import resample
+
+# origin per forward pass
+BACKTEST_BATCH = int(os.getenv("BACKTEST_BATCH", "4096"))
+# MAE boleh naik sebanyak ini (relatif) terhadap baseline sebelum dianggap regresi
+BACKTEST_TOLERANCE = float(os.getenv("BACKTEST_TOLERANCE", "0.05"))
+BACKTEST_ENGINES = ("numpy", "keras")
+SOURCES = ("raw", "rollup")
+VARIABLES = ("temperature", "humidity")
+
+
+def load_history(location: str, rooms: list, start: datetime, end: datetime, source: str = None):
+    """
+    Rata-rata room per 5 menit untuk [start, end), di grid tetap (lihat resample).
+    source "rollup" membaca baris 'ALL' tabel rollup (data raw lama bisa sudah di-compact).
+    Return {room: Resampled}; room tanpa data tidak ada di hasil.
+    """
+    source = source or ("rollup" if ROLLUPS_ENABLED else "raw")
+    room_names = {ROOM_MAP[room]: room for room in rooms}
+    placeholders = ",".join(["%s"] * len(room_names))
+    if source == "rollup":
+        sql = f"""
+            SELECT room_id, bucket, temp_avg, hum_avg FROM {ROLLUP_TABLE_MAP[location]}
+            WHERE room_id IN ({placeholders}) AND sensor_id = 'ALL' AND bucket >= %s AND bucket < %s
+        """
+    else:
+        sql = f"""
+            SELECT room_id, time_id, temperature, humidity FROM {TABLE_MAP[location]}
+            WHERE room_id IN ({placeholders}) AND time_id >= %s AND time_id < %s
+        """
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, tuple(room_names) + (start, end))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    by_room = defaultdict(list)
+    for room_id, ts, temp, hum in rows:
+        by_room[room_id].append((ts, np.nan if temp is None else temp, np.nan if hum is None else hum))
+
+    history = {}
+    for room_name, room_rows in by_room.items():
+        ts, temps, hums = zip(*room_rows)
+        history[room_names[room_name]] = resample(
+            np.array(ts, dtype="datetime64[ns]"),
+            np.array(temps, dtype=np.float64),
+            np.array(hums, dtype=np.float64),
+        )
+    return history
+
+
+def make_windows(series, steps: int, stride: int = 1):
+    """
+    Origin i: input = nilai [i - WINDOW, i), target = [i, i + steps). Input boleh berisi bucket
+    hasil isian (sama seperti /predict), target hanya bucket yang benar-benar ada datanya.
+    Return (origins, {variabel: (inputs [N, WINDOW], targets [N, steps])}).
+    """
+    n = len(series)
+    origins = np.arange(WINDOW, n - steps + 1, stride)
+    if len(origins) == 0:
+        empty = np.empty((0, WINDOW), dtype=np.float32), np.empty((0, steps), dtype=np.float32)
+        return origins, {var: empty for var in VARIABLES}
+
+    finite = np.isfinite(series.temperature) & np.isfinite(series.humidity)
+    ok = sliding_window_view(finite, WINDOW)[origins - WINDOW].all(axis=1)
+    ok &= sliding_window_view(finite & ~series.filled, steps)[origins].all(axis=1)
+    origins = origins[ok]
+
+    windows = {}
+    for var in VARIABLES:
+        values = getattr(series, var)
+        windows[var] = (
+            sliding_window_view(values, WINDOW)[origins - WINDOW],
+            sliding_window_view(values, steps)[origins],
+        )
+    return origins, windows
+
+
+def _forecast_numpy(model, scaler, inputs, steps: int, batch: int):
+    scale, min_ = numpy_lstm._scaler_arrays([scaler])
+    out = np.empty((len(inputs), steps), dtype=np.float32)
+    for i in range(0, len(inputs), batch):
+        windows = np.array(inputs[i:i + batch], dtype=np.float32)[None]  # salinan [1, B, WINDOW]
+        out[i:i + batch] = numpy_lstm._rollout_windows(model, scale, min_, windows, steps)[:, 0].T
+    return out
+
+
+def _forecast_keras(model, scaler, inputs, steps: int, batch: int):
+    out = np.empty((len(inputs), steps), dtype=np.float32)
+    for i in range(0, len(inputs), batch):
+        windows = np.array(inputs[i:i + batch], dtype=np.float32)
+        for s in range(steps):
+            x = scaler.transform(windows.reshape(-1, 1)).reshape(len(windows), WINDOW, 1)
+            nxt = scaler.inverse_transform(np.asarray(model(x, training=False)))[:, 0]
+            out[i:i + len(windows), s] = nxt
+            windows[:, :-1] = windows[:, 1:]
+            windows[:, -1] = nxt
+    return out
+
+
+def _metrics(pred, actual, last):
+    err = pred.astype(np.float64) - actual
+    persistence = np.abs(last[:, None].astype(np.float64) - actual)
+    r = lambda a: [round(float(v), 4) for v in a]  # noqa: E731
+    return {
+        "mae": r(np.abs(err).mean(axis=0)),
+        "rmse": r(np.sqrt((err ** 2).mean(axis=0))),
+        "mae_mean": round(float(np.abs(err).mean()), 4),
+        "rmse_mean": round(float(np.sqrt((err ** 2).mean())), 4),
+        "persistence_mae": r(persistence.mean(axis=0)),
+        "persistence_mae_mean": round(float(persistence.mean()), 4),
+    }
+
+
+def _sequential(models_dict, room: int, windows: dict, steps: int, sample: int, batched: dict):
+    """Jalur lama: satu rollout per origin (numpy_lstm.rollout_batch, seperti /predict)."""
+    n = min(sample, len(windows["temperature"][0]))
+    t0 = time.perf_counter()
+    diff = 0.0
+    for j in range(n):
+        temps, hums = numpy_lstm.rollout_batch(
+            {room: (windows["temperature"][0][j], windows["humidity"][0][j])}, models_dict, steps
+        )[room]
+        diff = max(diff, float(np.max(np.abs(temps - batched["temperature"][j]))),
+                   float(np.max(np.abs(hums - batched["humidity"][j]))))
+    return n, time.perf_counter() - t0, diff
+
+
+def run_backtest(location: str, start: datetime, end: datetime, steps: int = 12, stride: int = 1,
+                 engine: str = "numpy", rooms: list = None, batch: int = BACKTEST_BATCH,
+                 source: str = None, sequential_sample: int = 0):
+    if engine not in BACKTEST_ENGINES:
+        raise ValueError(f"Unknown backtest engine: {engine}")
+    rooms = rooms or sorted(REGISTRY.paths[location][0]["temperature"])
+
+    t0 = time.perf_counter()
+    models = REGISTRY.view(location, backend=engine)
+    pairs = {(var, room): models[var][room] for var in VARIABLES for room in rooms}
+    t1 = time.perf_counter()
+    history = load_history(location, rooms, start, end, source)
+    t2 = time.perf_counter()
+
+    forecast = _forecast_numpy if engine == "numpy" else _forecast_keras
+    report_rooms, all_pred, all_actual, all_last = {}, defaultdict(list), defaultdict(list), defaultdict(list)
+    forecast_s, total_windows = 0.0, 0
+    seq_windows, seq_seconds, seq_diff = 0, 0.0, 0.0
+
+    for room in rooms:
+        series = history.get(room)
+        if series is None:
+            report_rooms[str(room)] = {"windows": 0}
+            continue
+        origins, windows = make_windows(series, steps, stride)
+        entry = {"windows": int(len(origins)), "gaps_filled": series.gaps_filled}
+        if len(origins):
+            preds = {}
+            for var in VARIABLES:
+                model, scaler = pairs[(var, room)]
+                inputs, targets = windows[var]
+                f0 = time.perf_counter()
+                preds[var] = forecast(model, scaler, inputs, steps, batch)
+                forecast_s += time.perf_counter() - f0
+                entry[var] = _metrics(preds[var], targets, inputs[:, -1])
+                all_pred[var].append(preds[var])
+                all_actual[var].append(targets)
+                all_last[var].append(inputs[:, -1])
+            total_windows += len(origins)
+            if sequential_sample and engine == "numpy":
+                n, seconds, diff = _sequential(models, room, windows, steps, sequential_sample, preds)
+                seq_windows, seq_seconds, seq_diff = seq_windows + n, seq_seconds + seconds, max(seq_diff, diff)
+        report_rooms[str(room)] = entry
+
+    overall = {
+        var: _metrics(np.concatenate(all_pred[var]), np.concatenate(all_actual[var]), np.concatenate(all_last[var]))
+        for var in VARIABLES if all_pred[var]
+    }
+    report = {
+        "meta": {
+            "location": location,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "steps": steps,
+            "stride": stride,
+            "engine": engine,
+            "source": source or ("rollup" if ROLLUPS_ENABLED else "raw"),
+            "batch": batch,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "rooms": report_rooms,
+        "overall": overall,
+        "timing": {
+            "load_models_s": round(t1 - t0, 3),
+            "load_history_s": round(t2 - t1, 3),
+            "forecast_s": round(forecast_s, 3),
+            "windows": total_windows,
+            "windows_per_sec": round(total_windows / forecast_s, 1) if forecast_s else None,
+        },
+    }
+    if seq_windows:
+        seq_rate = seq_windows / seq_seconds
+        report["timing"]["sequential"] = {
+            "windows": seq_windows,
+            "windows_per_sec": round(seq_rate, 1),
+            "speedup": round(report["timing"]["windows_per_sec"] / seq_rate, 1),
+            "max_abs_diff": seq_diff,
+        }
+    return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float = BACKTEST_TOLERANCE):
+    """List regresi akurasi: mae_mean per room/variabel naik lebih dari `tolerance` (relatif)."""
+    regressions = []
+    for room, entry in report["rooms"].items():
+        old = baseline.get("rooms", {}).get(room)
+        if not old:
+            continue
+        for var in VARIABLES:
+            if var in entry and var in old and entry[var]["mae_mean"] > old[var]["mae_mean"] * (1 + tolerance):
+                regressions.append(
+                    f"room {room} {var}: MAE {old[var]['mae_mean']:.4f} -> {entry[var]['mae_mean']:.4f}"
+                )
+    return regressions
+
+
+def _print_report(report: dict):
+    meta, timing = report["meta"], report["timing"]
+    print(f"{meta['location']} {meta['start']} .. {meta['end']}  steps {meta['steps']}  engine {meta['engine']}"
+          f"  source {meta['source']}")
+    for room, entry in report["rooms"].items():
+        for var in VARIABLES:
+            if var not in entry:
+                continue
+            m = entry[var]
+            print(f"  room {room:>2} {var:11s} windows {entry['windows']:>6}  MAE@1 {m['mae'][0]:7.3f}"
+                  f"  MAE@{meta['steps']} {m['mae'][-1]:7.3f}  MAE {m['mae_mean']:7.3f}  RMSE {m['rmse_mean']:7.3f}"
+                  f"  persistence MAE {m['persistence_mae_mean']:7.3f}")
+    print(f"{timing['windows']} windows in {timing['forecast_s']:.2f}s = {timing['windows_per_sec']} windows/s"
+          f" (models {timing['load_models_s']:.2f}s, history {timing['load_history_s']:.2f}s)")
+    seq = timing.get("sequential")
+    if seq:
+        print(f"sequential: {seq['windows_per_sec']} windows/s, batched is {seq['speedup']}x faster,"
+              f" max abs diff {seq['max_abs_diff']:.2e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the per-room LSTM forecasters on historical data")
+    parser.add_argument("--location", choices=sorted(TABLE_MAP), required=True)
+    parser.add_argument("--start", type=datetime.fromisoformat, required=True)
+    parser.add_argument("--end", type=datetime.fromisoformat, help="exclusive, default now")
+    parser.add_argument("--hours", type=int, default=1, help="forecast horizon in hours (12 steps per hour)")
+    parser.add_argument("--stride", type=int, default=1, help="5-minute buckets between forecast origins")
+    parser.add_argument("--engine", choices=BACKTEST_ENGINES, default="numpy")
+    parser.add_argument("--rooms", help="comma separated room numbers, default: every room with a model")
+    parser.add_argument("--batch", type=int, default=BACKTEST_BATCH, help="origins per forward pass")
+    parser.add_argument("--source", choices=SOURCES, help="default: rollup if ROLLUPS_ENABLED else raw")
+    parser.add_argument("--sequential-sample", type=int, default=0,
+                        help="also time N origins per room through the one-at-a-time rollout (numpy engine)")
+    parser.add_argument("--out", help="write the report JSON here")
+    parser.add_argument("--baseline", help="report JSON to compare MAE against")
+    parser.add_argument("--tolerance", type=float, default=BACKTEST_TOLERANCE)
+    args = parser.parse_args()
+
+    rooms = [int(r) for r in args.rooms.split(",")] if args.rooms else None
+    unknown = set(rooms or []) - set(REGISTRY.paths[args.location][0]["temperature"])
+    if unknown:
+        parser.error(f"no model for room(s) {sorted(unknown)} in {args.location}")
+
+    report = run_backtest(
+        args.location, args.start, args.end or datetime.now(), args.hours * 12, args.stride,
+        args.engine, rooms, args.batch, args.source, args.sequential_sample,
+    )
+    _print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+FORECAST_CACHE_ENABLED = os.getenv("FORECAST_CACHE_ENABLED", "1") == "1"
+FORECAST_CACHE_MAX_ENTRIES = int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", "256"))
+FORECAST_CACHE_TTL_SECONDS = float(os.getenv("FORECAST_CACHE_TTL_SECONDS", "900"))
+
+
+class ForecastCache:
+    """
+    Cache hasil forecast per (location, room), valid selama belum ada sensor row baru
+    (latest time_id sama) dan start time forecast masih sama.
+
+    Satu entry menyimpan horizon terpanjang yang pernah dihitung; request dengan
+    duration lebih pendek dilayani sebagai prefix (model hanya memakai 12 titik
+    terakhir, jadi forecast pendek = awal dari forecast panjang).
+    """
+
+    def __init__(self, max_entries=FORECAST_CACHE_MAX_ENTRIES, ttl_seconds=FORECAST_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # (location, room) -> entry, urutan = LRU
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, location: str, room: int, duration_hours: int, latest_time_id, start_time: str):
+        steps = duration_hours * 12
+        with self._lock:
+            entry = self._entries.get((location, room))
+            valid = (
+                entry is not None
+                and latest_time_id is not None
+                and entry["latest_time_id"] == latest_time_id
+                and entry["start_time"] == start_time
+                and len(entry["predictions"]) >= steps
+                and time.time() - entry["created"] <= self.ttl_seconds
+            )
+            if not valid:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((location, room))
+            self.hits += 1
+            return {"room": room, "predictions": entry["predictions"][:steps]}
+
+    def put(self, location: str, room: int, latest_time_id, result: dict):
+        predictions = result.get("predictions") or []
+        if latest_time_id is None or not predictions:
+            return
+        with self._lock:
+            current = self._entries.get((location, room))
+            # jangan timpa horizon panjang dengan yang lebih pendek untuk data yang sama
+            if (
+                current is not None
+                and current["latest_time_id"] == latest_time_id
+                and current["start_time"] == predictions[0]["timestamp"]
+                and len(current["predictions"]) > len(predictions)
+            ):
+                return
+            self._entries[(location, room)] = {
+                "latest_time_id": latest_time_id,
+                "start_time": predictions[0]["timestamp"],
+                "predictions": list(predictions),
+                "created": time.time(),
+            }
+            self._entries.move_to_end((location, room))
+            self._evict()
+
+    def _evict(self):
+        now = time.time()
+        for key in [k for k, e in self._entries.items() if now - e["created"] > self.ttl_seconds]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, location: str = None, room: int = None):
+        with self._lock:
+            for key in list(self._entries):
+                if (location is None or key[0] == location) and (room is None or key[1] == room):
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+FORECAST_CACHE = ForecastCache()
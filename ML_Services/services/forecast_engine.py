@@ -0,0 +1,135 @@
+import numpy as np
+import tensorflow as tf
+
+WINDOW = 12
+
+# cache graph hasil compile per (lokasi, tuple room)
+_COMPILED = {}
+
+
+def _scaler_params(scaler):
+    # MinMaxScaler: X_scaled = X * scale_ + min_
+    return float(scaler.scale_[0]), float(scaler.min_[0])
+
+
+def _transform(x, scale, min_):
+    # sama persis dengan sklearn: hitung di float64, simpan balik ke float32 tiap operasi
+    x = tf.cast(tf.cast(x, tf.float64) * scale, tf.float32)
+    return tf.cast(tf.cast(x, tf.float64) + min_, tf.float32)
+
+
+def _inverse_transform(x, scale, min_):
+    x = tf.cast(tf.cast(x, tf.float64) - min_, tf.float32)
+    return tf.cast(tf.cast(x, tf.float64) / scale, tf.float32)
+
+
+def architecture_signature(model):
+    """Rooms dengan signature sama bisa di-batch dalam satu graph / satu forward pass."""
+    return tuple(
+        (layer.__class__.__name__, tuple(tuple(w.shape) for w in layer.weights))
+        for layer in model.layers
+    )
+
+
+def build_rollout(members):
+    """
+    Compile seluruh autoregressive rollout (temperature + humidity) untuk satu atau
+    beberapa room jadi satu tf.function.
+
+    members: list of (temp_model, temp_scaler, hum_model, hum_scaler), satu per room.
+    Input: dua window float32 [n_room, WINDOW] dan jumlah step.
+    Output: dua tensor [steps, n_room].
+    """
+    n = len(members)
+    params = [
+        (tm, _scaler_params(ts), hm, _scaler_params(hs))
+        for tm, ts, hm, hs in members
+    ]
+
+    def _step(window, model, scale, min_):
+        x = tf.reshape(_transform(window, scale, min_), (1, WINDOW, 1))
+        return _inverse_transform(model(x, training=False)[0, 0], scale, min_)
+
+    @tf.function(
+        input_signature=[
+            tf.TensorSpec([n, WINDOW], tf.float32),
+            tf.TensorSpec([n, WINDOW], tf.float32),
+            tf.TensorSpec([], tf.int32),
+        ]
+    )
+    def rollout(window_temp, window_hum, steps):
+        out_temp = tf.TensorArray(tf.float32, size=steps)
+        out_hum = tf.TensorArray(tf.float32, size=steps)
+
+        for i in tf.range(steps):
+            next_temp = tf.stack([
+                _step(window_temp[j], tm, *t_params)
+                for j, (tm, t_params, _, _) in enumerate(params)
+            ])
+            next_hum = tf.stack([
+                _step(window_hum[j], hm, *h_params)
+                for j, (_, _, hm, h_params) in enumerate(params)
+            ])
+
+            out_temp = out_temp.write(i, next_temp)
+            out_hum = out_hum.write(i, next_hum)
+
+            # rolling window 12 slot, ukuran tetap
+            window_temp = tf.concat([window_temp[:, 1:], next_temp[:, None]], axis=1)
+            window_hum = tf.concat([window_hum[:, 1:], next_hum[:, None]], axis=1)
+
+        return out_temp.stack(), out_hum.stack()
+
+    return rollout
+
+
+def get_rollout(lokasi: str, rooms, models_dict):
+    rooms = tuple(rooms)
+    members = [models_dict["temperature"][r] + models_dict["humidity"][r] for r in rooms]
+    # identitas objek ikut disimpan, supaya model yang di-reload tidak pakai graph lama
+    ident = tuple(id(obj) for m in members for obj in m)
+
+    cached = _COMPILED.get((lokasi, rooms))
+    if cached is None or cached[0] != ident:
+        cached = (ident, build_rollout(members))
+        _COMPILED[(lokasi, rooms)] = cached
+    return cached[1]
+
+
+def invalidate(lokasi: str, sensor: str, room: int):
+    """Buang graph yang memegang model room ini (dipanggil saat model di-evict)."""
+    for key in [k for k in _COMPILED if k[0] == lokasi and room in k[1]]:
+        _COMPILED.pop(key, None)
+
+
+def _last_window(X, room):
+    if len(X) < WINDOW:
+        raise ValueError(f"Room {room}: need at least {WINDOW} averaged points, got {len(X)}")
+    return np.asarray(X[-WINDOW:], dtype=np.float32)
+
+
+def rollout_batch(series_by_room, models_dict, lokasi: str, steps: int):
+    """
+    series_by_room: {room: (X_temp, X_hum)}. Semua room dijalankan dalam satu graph.
+    Return {room: (temps, hums)} sebagai np.float32 array.
+    """
+    rooms = sorted(series_by_room)
+    window_temp = np.stack([_last_window(series_by_room[r][0], r) for r in rooms])
+    window_hum = np.stack([_last_window(series_by_room[r][1], r) for r in rooms])
+
+    fn = get_rollout(lokasi, rooms, models_dict)
+    temps, hums = fn(
+        tf.constant(window_temp),
+        tf.constant(window_hum),
+        tf.constant(steps, dtype=tf.int32),
+    )
+    temps, hums = temps.numpy(), hums.numpy()
+    return {r: (temps[:, j], hums[:, j]) for j, r in enumerate(rooms)}
+
+
+def rollout(X_temp, X_hum, models_dict, lokasi: str, room: int, steps: int):
+    """
+    Jalankan forecast `steps` langkah ke depan dari WINDOW nilai terakhir.
+    Return (temps, hums) sebagai np.float32 array.
+    """
+    return rollout_batch({room: (X_temp, X_hum)}, models_dict, lokasi, steps)[room]
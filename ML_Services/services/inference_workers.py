@@ -0,0 +1,238 @@
+import os
+import time
+import zlib
+import queue
+import logging
+import threading
+import itertools
+import traceback
+import multiprocessing as mp
+from concurrent.futures import Future
+
+logger = logging.getLogger("uvicorn.error")
+
+# 0 = inferensi tetap di thread pool proses utama
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+# maksimum task (antre + berjalan) per worker; submit menunggu kalau penuh
+INFERENCE_QUEUE_DEPTH = int(os.getenv("INFERENCE_QUEUE_DEPTH", "4"))
+INFERENCE_SUBMIT_TIMEOUT = float(os.getenv("INFERENCE_SUBMIT_TIMEOUT", "30"))
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "300"))
+INFERENCE_RESTART = os.getenv("INFERENCE_RESTART", "1") == "1"
+
+
+class InferenceBusy(RuntimeError):
+    """Queue worker penuh lebih lama dari INFERENCE_SUBMIT_TIMEOUT."""
+
+
+class WorkerCrashed(RuntimeError):
+    """Proses worker mati sebelum task selesai."""
+
+
+def assign_workers(jobs, workers: int):
+    """Round-robin (location, room) yang diketahui (urut) ke worker: beban rata, sama di setiap restart."""
+    return {job: i % workers for i, job in enumerate(sorted(set(jobs)))}
+
+
+def worker_for(location: str, room: int, workers: int, assignment: dict = None):
+    """Affinity tetap (location, room) -> worker; room di luar assignment pakai crc32."""
+    if assignment and (location, room) in assignment:
+        return assignment[(location, room)]
+    return zlib.crc32(f"{location}:{room}".encode()) % workers
+
+
+def _worker_main(index, assigned, tasks, results):
+    # import berat (TensorFlow) hanya di proses worker
+    from ML_Services.models_config import REGISTRY
+    from ML_Services.services.prediction import make_prediction, model_backends
+
+    # muat hanya model room yang di-route ke worker ini, dengan backend yang dipakai make_prediction
+    for location, room in assigned:
+        for backend in model_backends(location, room):
+            for sensor in ("temperature", "humidity"):
+                try:
+                    REGISTRY.get(location, sensor, room, backend)
+                except Exception as e:
+                    logger.warning(f"[inference-{index}] preload {location}/{sensor}/{room} ({backend}) failed: {e}")
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, location, room, seq_data, duration_hours = task
+        t0 = time.time()
+        try:
+            result = make_prediction(seq_data, REGISTRY.view(location), location, room, duration_hours)
+            results.put((index, task_id, True, result, time.time() - t0))
+        except Exception as e:
+            results.put((index, task_id, False, f"{e}\n{traceback.format_exc()}", time.time() - t0))
+
+
+class _Worker:
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.tasks = None
+        self.slots = threading.BoundedSemaphore(INFERENCE_QUEUE_DEPTH)
+        self.pending = {}  # task_id -> Future
+        self.rooms = set()
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self.busy_seconds = 0.0
+        self.dead = False  # mati dan tidak di-restart
+
+
+class InferencePool:
+    """
+    Inferensi di proses terpisah (bukan thread) supaya forecast beberapa room
+    benar-benar paralel. Setiap (location, room) selalu dikirim ke worker yang
+    sama, jadi tiap worker hanya memuat model room miliknya.
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, restart=INFERENCE_RESTART):
+        self.size = workers
+        self.restart = restart
+        self._ctx = mp.get_context("spawn")  # TensorFlow tidak aman di-fork
+        self._results = None
+        self._workers = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._collector = None
+        self._stop = threading.Event()
+        self._assignment = {}
+
+    @property
+    def enabled(self):
+        return self.size > 0 and self._collector is not None
+
+    def start(self, jobs=()):
+        """jobs: (location, room) yang diketahui, dipakai untuk preload di worker pemiliknya."""
+        if self.size <= 0 or self._collector is not None:
+            return
+        self._results = self._ctx.Queue()
+        self._workers = [_Worker(i) for i in range(self.size)]
+        self._assignment = assign_workers(jobs, self.size)
+        for (location, room), index in self._assignment.items():
+            self._workers[index].rooms.add((location, room))
+        for worker in self._workers:
+            self._spawn(worker)
+        self._stop.clear()
+        self._collector = threading.Thread(target=self._collect, name="inference-collector", daemon=True)
+        self._collector.start()
+        logger.info(f"Started {self.size} inference worker process(es)")
+
+    def _spawn(self, worker):
+        worker.tasks = self._ctx.Queue()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.index, sorted(worker.rooms), worker.tasks, self._results),
+            name=f"inference-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    def submit(self, location: str, room: int, seq_data: list, duration_hours: int):
+        """Return concurrent.futures.Future berisi hasil make_prediction."""
+        worker = self._workers[worker_for(location, room, self.size, self._assignment)]
+        if worker.dead:
+            raise WorkerCrashed(f"inference worker {worker.index} is down (INFERENCE_RESTART=0)")
+        if not worker.slots.acquire(timeout=INFERENCE_SUBMIT_TIMEOUT):
+            raise InferenceBusy(f"inference worker {worker.index} queue full")
+
+        future = Future()
+        task_id = next(self._ids)
+        with self._lock:
+            worker.rooms.add((location, room))
+            worker.pending[task_id] = future
+            worker.tasks.put((task_id, location, room, seq_data, duration_hours))
+        return future
+
+    def predict(self, location: str, room: int, seq_data: list, duration_hours: int):
+        return self.submit(location, room, seq_data, duration_hours).result(timeout=INFERENCE_TIMEOUT)
+
+    def _resolve(self, index, task_id, ok, payload, elapsed):
+        worker = self._workers[index]
+        with self._lock:
+            future = worker.pending.pop(task_id, None)
+            if future is None:
+                return
+            worker.busy_seconds += elapsed
+            if ok:
+                worker.completed += 1
+            else:
+                worker.failed += 1
+        worker.slots.release()
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _check_workers(self):
+        for worker in self._workers:
+            if worker.dead or worker.process.is_alive():
+                continue
+            exitcode = worker.process.exitcode
+            with self._lock:
+                lost, worker.pending = worker.pending, {}
+                worker.failed += len(lost)
+                if self.restart and not self._stop.is_set():
+                    worker.restarts += 1
+                    self._spawn(worker)
+                else:
+                    worker.dead = True
+            for future in lost.values():
+                worker.slots.release()
+                future.set_exception(WorkerCrashed(f"inference worker {worker.index} exited with code {exitcode}"))
+            logger.error(f"Inference worker {worker.index} died (exit={exitcode}, lost={len(lost)}, restarted={not worker.dead})")
+
+    def _collect(self):
+        while not self._stop.is_set():
+            try:
+                self._resolve(*self._results.get(timeout=0.5))
+            except queue.Empty:
+                pass
+            except Exception as e:
+                logger.error("Inference collector error: %s\n%s", e, traceback.format_exc())
+            self._check_workers()
+
+    def stop(self):
+        if self._collector is None:
+            return
+        self._stop.set()
+        self._collector.join(timeout=2)
+        self._collector = None
+        for worker in self._workers:
+            if worker.process.is_alive():
+                worker.tasks.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            for future in worker.pending.values():
+                future.set_exception(WorkerCrashed("inference pool stopped"))
+            worker.pending = {}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "workers": [
+                    {
+                        "index": w.index,
+                        "pid": w.process.pid if w.process else None,
+                        "alive": bool(w.process and w.process.is_alive()),
+                        "dead": w.dead,
+                        "in_flight": len(w.pending),
+                        "completed": w.completed,
+                        "failed": w.failed,
+                        "restarts": w.restarts,
+                        "busy_seconds": w.busy_seconds,
+                        "rooms": [f"{loc}:{room}" for loc, room in sorted(w.rooms)],
+                    }
+                    for w in self._workers
+                ],
+                "queue_depth": INFERENCE_QUEUE_DEPTH,
+            }
+
+
+INFERENCE_POOL = InferencePool()
@@ -0,0 +1,345 @@
+"""
+Bundle model per lokasi untuk cold start cepat (serverless): semua bobot LSTM dalam
+satu file float32 yang di-mmap, parameter MinMaxScaler sebagai angka biasa, dan
+manifest.json berisi versi + checksum. Boot dari bundle tidak butuh TensorFlow,
+h5py, joblib/sklearn atau unpickle.
+
+    python -m ML_Services.services.model_bundle --build      # .h5/.pkl -> bundle
+    python -m ML_Services.services.model_bundle --check      # bundle masih sesuai file sumber?
+
+Layout: <MODEL_BUNDLE_DIR>/<location>/{manifest.json, weights.f32}
+
+Bundle adalah hasil build (tidak di-commit): jalankan --build di langkah build/deploy.
+Dengan MODEL_BUNDLE=auto, model yang .h5/.pkl-nya berubah sejak build dimuat dari file sumber.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import platform
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from ML_Services.services.numpy_lstm import NumpyLSTMModel
+
+logger = logging.getLogger("uvicorn.error")
+
+BUNDLE_FORMAT_VERSION = 1
+MODEL_BUNDLE_DIR = os.getenv("MODEL_BUNDLE_DIR", "ML_Services/model/bundle")
+# auto = pakai bundle kalau ada, 1 = wajib ada, 0 = selalu dari .h5/.pkl
+MODEL_BUNDLE = os.getenv("MODEL_BUNDLE", "auto")
+# cek sha256 weights.f32 saat load (beberapa ms untuk ukuran bundle sekarang)
+MODEL_BUNDLE_VERIFY = os.getenv("MODEL_BUNDLE_VERIFY", "1") == "1"
+
+MANIFEST_FILE = "manifest.json"
+WEIGHTS_FILE = "weights.f32"
+# offset tiap array dibulatkan ke 16 float (64 byte)
+ALIGN = 16
+
+
+class BundleError(RuntimeError):
+    pass
+
+
+def _sha256(path: str):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ScalerParams:
+    """Pengganti MinMaxScaler (1 fitur) hasil unpickle: X * scale_ + min_, dtype input dipertahankan."""
+
+    def __init__(self, scale, min_, data_min=None, data_max=None, feature_range=(0, 1)):
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+        self.min_ = np.asarray(min_, dtype=np.float64)
+        self.data_min_ = None if data_min is None else np.asarray(data_min, dtype=np.float64)
+        self.data_max_ = None if data_max is None else np.asarray(data_max, dtype=np.float64)
+        self.feature_range = tuple(feature_range)
+
+    @staticmethod
+    def _copy(X):
+        X = np.array(X)
+        return X if X.dtype in (np.float32, np.float64) else X.astype(np.float64)
+
+    def transform(self, X):
+        X = self._copy(X)
+        X *= self.scale_
+        X += self.min_
+        return X
+
+    def inverse_transform(self, X):
+        X = self._copy(X)
+        X -= self.min_
+        X /= self.scale_
+        return X
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        return cls(scaler.scale_, scaler.min_, scaler.data_min_, scaler.data_max_, scaler.feature_range)
+
+    def to_dict(self):
+        as_list = lambda a: None if a is None else [float(v) for v in a]  # noqa: E731
+        return {
+            "scale": as_list(self.scale_), "min": as_list(self.min_),
+            "data_min": as_list(self.data_min_), "data_max": as_list(self.data_max_),
+            "feature_range": list(self.feature_range),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["scale"], d["min"], d.get("data_min"), d.get("data_max"), d.get("feature_range", (0, 1)))
+
+
+def _model_key(sensor: str, room: int):
+    return f"{sensor}/{room}"
+
+
+# ------------------------------
+# Build
+# ------------------------------
+def build_bundle(location: str, model_paths: dict, scaler_paths: dict, out_dir: str = MODEL_BUNDLE_DIR):
+    """Compile semua pasangan .h5/.pkl satu lokasi ke <out_dir>/<location>. Return manifest."""
+    import h5py
+    import joblib
+    import sklearn
+
+    target = os.path.join(out_dir, location)
+    os.makedirs(target, exist_ok=True)
+    weights_path = os.path.join(target, WEIGHTS_FILE)
+
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "location": location,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "versions": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "h5py": h5py.__version__,
+            "sklearn": sklearn.__version__,
+        },
+        "weights_file": WEIGHTS_FILE,
+        "models": {},
+    }
+
+    offset = 0
+    tmp_path = weights_path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        for sensor in model_paths:
+            for room, model_path in model_paths[sensor].items():
+                scaler_path = scaler_paths[sensor][room]
+                model = NumpyLSTMModel.from_h5(model_path)
+                with h5py.File(model_path, "r") as f:
+                    keras_version = f.attrs.get("keras_version")
+                scaler = joblib.load(scaler_path)
+
+                layers = []
+                for kind, cfg, arrays in model.layers:
+                    entries = []
+                    for a in arrays:
+                        data = np.ascontiguousarray(a[0], dtype="<f4")
+                        pad = (-offset) % ALIGN
+                        out.write(b"\0" * (pad * 4))
+                        offset += pad
+                        entries.append({"offset": offset, "shape": list(data.shape)})
+                        out.write(data.tobytes())
+                        offset += data.size
+                    layers.append({"kind": kind, "config": cfg, "arrays": entries})
+
+                manifest["models"][_model_key(sensor, room)] = {
+                    "sensor": sensor,
+                    "room": room,
+                    "input_shape": list(model.input_shape),
+                    "layers": layers,
+                    "scaler": ScalerParams.from_sklearn(scaler).to_dict(),
+                    "source": {
+                        "model": model_path,
+                        "model_sha256": _sha256(model_path),
+                        "keras_version": keras_version.decode() if isinstance(keras_version, bytes) else keras_version,
+                        "scaler": scaler_path,
+                        "scaler_sha256": _sha256(scaler_path),
+                    },
+                }
+
+    os.replace(tmp_path, weights_path)
+    manifest["weights_bytes"] = offset * 4
+    manifest["weights_sha256"] = _sha256(weights_path)
+    with open(os.path.join(target, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def check_bundle(location: str, bundle_dir: str = MODEL_BUNDLE_DIR):
+    """Return list masalah (kosong = bundle cocok dengan file .h5/.pkl saat ini)."""
+    path = os.path.join(bundle_dir, location, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return [f"{path} missing"]
+    with open(path) as f:
+        manifest = json.load(f)
+
+    problems = []
+    if manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        problems.append(f"format_version {manifest.get('format_version')} != {BUNDLE_FORMAT_VERSION}")
+    weights = os.path.join(bundle_dir, location, manifest["weights_file"])
+    if not os.path.exists(weights) or _sha256(weights) != manifest["weights_sha256"]:
+        problems.append(f"{weights}: checksum mismatch")
+    for key, entry in manifest["models"].items():
+        problems.extend(f"{key}: {p}" for p in _source_problems(entry))
+    return problems
+
+
+def _source_problems(entry):
+    """Masalah file .h5/.pkl sumber satu model dibanding checksum di manifest."""
+    problems = []
+    src = entry["source"]
+    for kind in ("model", "scaler"):
+        if not os.path.exists(src[kind]):
+            problems.append(f"{src[kind]} missing")
+        elif _sha256(src[kind]) != src[f"{kind}_sha256"]:
+            problems.append(f"{src[kind]} changed since the bundle was built")
+    return problems
+
+
+# ------------------------------
+# Load
+# ------------------------------
+class ModelBundle:
+    """Bundle satu lokasi yang sudah di-mmap; model & scaler dibuat per permintaan (view, tanpa copy)."""
+
+    def __init__(self, location: str, bundle_dir: str = MODEL_BUNDLE_DIR, verify: bool = MODEL_BUNDLE_VERIFY):
+        t0 = time.time()
+        root = os.path.join(bundle_dir, location)
+        with open(os.path.join(root, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+            raise BundleError(
+                f"{root}: bundle format {self.manifest.get('format_version')}, expected {BUNDLE_FORMAT_VERSION}"
+            )
+
+        weights_path = os.path.join(root, self.manifest["weights_file"])
+        if verify and _sha256(weights_path) != self.manifest["weights_sha256"]:
+            raise BundleError(f"{weights_path}: checksum mismatch, rebuild the bundle")
+        self.location = location
+        self.weights = np.memmap(weights_path, dtype="<f4", mode="r")
+        self.stale = set()  # model yang sumbernya berubah; dilayani dari .h5/.pkl
+        self.load_time = time.time() - t0
+
+    def __contains__(self, key):
+        key = _model_key(*key)
+        return key in self.manifest["models"] and key not in self.stale
+
+    def check_sources(self):
+        """Tandai model yang .h5/.pkl-nya berubah sejak build (mis. room di-retrain) sebagai stale."""
+        for key, entry in self.manifest["models"].items():
+            src = entry["source"]
+            changed = [
+                src[kind] for kind in ("model", "scaler")
+                if os.path.exists(src[kind]) and _sha256(src[kind]) != src[f"{kind}_sha256"]
+            ]
+            if changed:
+                self.stale.add(key)
+                logger.warning("Model bundle %s/%s is stale (%s changed), loading from .h5/.pkl",
+                               self.location, key, ", ".join(changed))
+        return self.stale
+
+    def _entry(self, sensor: str, room: int):
+        try:
+            return self.manifest["models"][_model_key(sensor, room)]
+        except KeyError:
+            raise BundleError(f"{self.location}: no {sensor}/room{room} in bundle")
+
+    def _array(self, spec):
+        size = int(np.prod(spec["shape"]))
+        return self.weights[spec["offset"]:spec["offset"] + size].reshape(spec["shape"])
+
+    def model(self, sensor: str, room: int):
+        entry = self._entry(sensor, room)
+        layers = [
+            (layer["kind"], layer["config"], [self._array(spec)[None] for spec in layer["arrays"]])
+            for layer in entry["layers"]
+        ]
+        return NumpyLSTMModel(layers, tuple(entry["input_shape"]))
+
+    def scaler(self, sensor: str, room: int):
+        return ScalerParams.from_dict(self._entry(sensor, room)["scaler"])
+
+
+class BundleStore:
+    """Bundle per lokasi, dibuka sekali saat pertama dipakai. get() -> None kalau bundle tidak dipakai."""
+
+    def __init__(self, bundle_dir: str = MODEL_BUNDLE_DIR, mode: str = MODEL_BUNDLE, verify: bool = MODEL_BUNDLE_VERIFY):
+        self.bundle_dir = bundle_dir
+        self.mode = mode
+        self.verify = verify
+        self._bundles = {}
+        self._lock = threading.Lock()
+
+    def get(self, location: str):
+        if self.mode == "0":
+            return None
+        with self._lock:
+            if location not in self._bundles:
+                self._bundles[location] = self._open(location)
+            return self._bundles[location]
+
+    def _open(self, location: str):
+        if not os.path.exists(os.path.join(self.bundle_dir, location, MANIFEST_FILE)):
+            if self.mode == "1":
+                raise BundleError(f"MODEL_BUNDLE=1 but no bundle for {location} in {self.bundle_dir}")
+            return None
+        try:
+            bundle = ModelBundle(location, self.bundle_dir, self.verify)
+            if self.mode == "auto":
+                # mode auto: file sumber tersedia, jadi bundle tidak boleh menang dari model yang lebih baru
+                bundle.check_sources()
+        except Exception as e:
+            if self.mode == "1":
+                raise
+            logger.error("Model bundle for %s unusable, falling back to .h5/.pkl: %s", location, e)
+            return None
+        logger.info("Opened model bundle %s (%d models) in %.3fs",
+                    location, len(bundle.manifest["models"]), bundle.load_time)
+        return bundle
+
+
+BUNDLES = BundleStore()
+
+
+def main():
+    import argparse
+    from ML_Services.models_config import MODEL_PATHS
+
+    parser = argparse.ArgumentParser(description="Build / check per-location model bundles")
+    parser.add_argument("--build", action="store_true", help="compile .h5/.pkl into bundles")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a bundle is stale or corrupt")
+    parser.add_argument("--location", choices=sorted(MODEL_PATHS), help="default: all locations")
+    parser.add_argument("--out", default=MODEL_BUNDLE_DIR)
+    args = parser.parse_args()
+
+    locations = [args.location] if args.location else list(MODEL_PATHS)
+    if args.build:
+        for location in locations:
+            t0 = time.time()
+            manifest = build_bundle(location, *MODEL_PATHS[location], out_dir=args.out)
+            print(f"{location}: {len(manifest['models'])} models, {manifest['weights_bytes']} bytes "
+                  f"in {time.time() - t0:.2f}s")
+    if args.check:
+        stale = 0
+        for location in locations:
+            problems = check_bundle(location, args.out)
+            stale += bool(problems)
+            print(f"{location}: {'OK' if not problems else 'STALE'}")
+            for p in problems:
+                print(f"  {p}")
+        raise SystemExit(1 if stale else 0)
+    if not (args.build or args.check):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
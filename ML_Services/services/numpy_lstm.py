@@ -0,0 +1,297 @@
+"""
+Inference LSTM tanpa TensorFlow: baca bobot langsung dari file .h5 (h5py)
+lalu jalankan forward pass LSTM + Dense dengan NumPy.
+
+Model dengan arsitektur sama bisa di-stack (leading axis = room) supaya
+beberapa room dihitung dalam satu forward pass.
+
+Cek hasil terhadap Keras:
+    python -m ML_Services.services.numpy_lstm --verify
+"""
+import json
+
+import numpy as np
+
+WINDOW = 12
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "tanh": np.tanh,
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "relu": lambda x: np.maximum(x, 0),
+}
+
+
+def _activation(name):
+    if name not in _ACTIVATIONS:
+        raise NotImplementedError(f"Activation not supported by numpy engine: {name}")
+    return _ACTIVATIONS[name]
+
+
+def _read_layer_weights(group, layer_name):
+    layer = group[layer_name]
+    return [np.asarray(layer[name], dtype=np.float32) for name in layer.attrs["weight_names"]]
+
+
+class NumpyLSTMModel:
+    """
+    Sequential model (LSTM / Dropout / Dense). Semua bobot punya leading axis R
+    (jumlah model yang di-stack); model hasil from_h5 punya R = 1.
+    """
+
+    def __init__(self, layers, input_shape):
+        self.layers = layers  # list of (kind, config, [arrays dengan leading axis R])
+        self.input_shape = input_shape
+
+    @classmethod
+    def from_h5(cls, path):
+        import h5py  # hanya saat baca .h5; boot dari bundle tidak butuh h5py
+
+        with h5py.File(path, "r") as f:
+            config = json.loads(f.attrs["model_config"])
+            if config["class_name"] != "Sequential":
+                raise NotImplementedError(f"Only Sequential models are supported, got {config['class_name']}")
+
+            weights_group = f["model_weights"]
+            layers = []
+            input_shape = None
+            for layer in config["config"]["layers"]:
+                kind, cfg = layer["class_name"], layer["config"]
+                if kind == "InputLayer":
+                    input_shape = tuple(cfg.get("batch_shape") or cfg.get("batch_input_shape"))
+                    continue
+                if kind == "Dropout":
+                    continue  # identity saat inference
+                if kind == "LSTM":
+                    if cfg.get("go_backwards") or cfg.get("stateful"):
+                        raise NotImplementedError("go_backwards/stateful LSTM not supported")
+                    _activation(cfg["activation"])
+                    _activation(cfg["recurrent_activation"])
+                elif kind == "Dense":
+                    _activation(cfg["activation"])
+                else:
+                    raise NotImplementedError(f"Layer not supported by numpy engine: {kind}")
+
+                arrays = _read_layer_weights(weights_group, cfg["name"])
+                layers.append((kind, cfg, [a[None] for a in arrays]))
+
+        return cls(layers, input_shape)
+
+    @property
+    def n_stacked(self):
+        return self.layers[0][2][0].shape[0]
+
+    def signature(self):
+        return tuple(
+            (kind, cfg.get("units"), cfg.get("return_sequences"), tuple(a.shape[1:] for a in arrays))
+            for kind, cfg, arrays in self.layers
+        )
+
+    def count_params(self):
+        return sum(a[0].size for _, _, arrays in self.layers for a in arrays)
+
+    def forward(self, x):
+        """x: [R, B, T, F] -> [R, B, out]."""
+        h = np.asarray(x, dtype=np.float32)
+        for kind, cfg, arrays in self.layers:
+            if kind == "LSTM":
+                h = _lstm_forward(h, cfg, *arrays)
+            else:
+                h = _dense_forward(h, cfg, *arrays)
+        return h
+
+    def predict(self, x):
+        """x: [B, T, F] -> [B, out], untuk model yang tidak di-stack."""
+        return self.forward(np.asarray(x)[None])[0]
+
+
+def _lstm_forward(x, cfg, kernel, recurrent_kernel, bias=None):
+    # x: [R, B, T, F], kernel: [R, F, 4U], recurrent_kernel: [R, U, 4U], bias: [R, 4U]
+    R, B, T, F = x.shape
+    units = cfg["units"]
+    act = _activation(cfg["activation"])
+    rec_act = _activation(cfg["recurrent_activation"])
+
+    # proyeksi input untuk semua timestep sekaligus
+    xw = np.matmul(x.reshape(R, B * T, F), kernel).reshape(R, B, T, 4 * units)
+    if bias is not None:
+        xw += bias[:, None, None, :]
+
+    h = np.zeros((R, B, units), dtype=np.float32)
+    c = np.zeros((R, B, units), dtype=np.float32)
+    outputs = []
+    for t in range(T):
+        z = xw[:, :, t] + np.matmul(h, recurrent_kernel)
+        # urutan gate Keras: input, forget, cell, output
+        gates = rec_act(z)
+        i, f, o = gates[..., :units], gates[..., units:2 * units], gates[..., 3 * units:]
+        c = f * c + i * act(z[..., 2 * units:3 * units])
+        h = o * act(c)
+        if cfg.get("return_sequences"):
+            outputs.append(h)
+
+    if cfg.get("return_sequences"):
+        return np.stack(outputs, axis=2)
+    return h
+
+
+def _dense_forward(x, cfg, kernel, bias=None):
+    # x: [R, B, U] atau [R, B, T, U]
+    shape = x.shape
+    out = np.matmul(x.reshape(shape[0], -1, shape[-1]), kernel)
+    if bias is not None:
+        out += bias[:, None, :]
+    out = _activation(cfg["activation"])(out)
+    return out.reshape(shape[:-1] + (kernel.shape[-1],))
+
+
+def stack_models(models):
+    """Gabungkan beberapa model dengan signature sama jadi satu model ber-leading axis R."""
+    sig = models[0].signature()
+    for m in models[1:]:
+        if m.signature() != sig:
+            raise ValueError("Cannot stack models with different architectures")
+
+    layers = []
+    for idx, (kind, cfg, _) in enumerate(models[0].layers):
+        arrays = [
+            np.concatenate([m.layers[idx][2][k] for m in models], axis=0)
+            for k in range(len(models[0].layers[idx][2]))
+        ]
+        layers.append((kind, cfg, arrays))
+    return NumpyLSTMModel(layers, models[0].input_shape)
+
+
+# ------------------------------
+# Autoregressive rollout
+# ------------------------------
+_STACKED = {}
+
+
+def _get_stacked(models):
+    ident = tuple(id(m) for m in models)
+    stacked = _STACKED.get(ident)
+    if stacked is None:
+        stacked = _STACKED[ident] = (models, stack_models(models))
+    return stacked[1]
+
+
+def invalidate(lokasi: str, sensor: str, room: int):
+    _STACKED.clear()
+
+
+def _scaler_arrays(scalers):
+    scale = np.array([float(s.scale_[0]) for s in scalers])[:, None]
+    min_ = np.array([float(s.min_[0]) for s in scalers])[:, None]
+    return scale, min_
+
+
+def _transform(x, scale, min_):
+    # sama dengan sklearn: hitung di float64, simpan ke float32 tiap operasi
+    x = (x.astype(np.float64) * scale).astype(np.float32)
+    return (x.astype(np.float64) + min_).astype(np.float32)
+
+
+def _inverse_transform(x, scale, min_):
+    x = (x.astype(np.float64) - min_).astype(np.float32)
+    return (x.astype(np.float64) / scale).astype(np.float32)
+
+
+def _rollout_windows(model, scale, min_, windows, steps: int):
+    # windows: [R, B, WINDOW] float32 (B origin per model), diubah in-place; return [steps, R, B]
+    out = np.empty((steps,) + windows.shape[:2], dtype=np.float32)
+    for i in range(steps):
+        x = _transform(windows, scale[:, :, None], min_[:, :, None])[..., None]  # [R, B, WINDOW, 1]
+        y = model.forward(x)[..., 0]                                            # [R, B]
+        nxt = _inverse_transform(y, scale, min_)
+        out[i] = nxt
+        windows[..., :-1] = windows[..., 1:]
+        windows[..., -1] = nxt
+    return out
+
+
+def _rollout_stacked(model, scale, min_, window, steps: int):
+    # window: [R, WINDOW] float32, diubah in-place sebagai rolling window
+    return _rollout_windows(model, scale, min_, window[:, None, :], steps)[:, :, 0]
+
+
+def rollout_batch(series_by_room, models_dict, steps: int):
+    """
+    series_by_room: {room: (X_temp, X_hum)}; models_dict berisi (NumpyLSTMModel, scaler).
+    Room dengan arsitektur sama di-stack dan dihitung dalam satu forward pass per step.
+    Return {room: (temps, hums)} sebagai np.float32 array.
+    """
+    results = {room: [None, None] for room in series_by_room}
+    for col, sensor in enumerate(("temperature", "humidity")):
+        groups = {}
+        for room in sorted(series_by_room):
+            model, _ = models_dict[sensor][room]
+            groups.setdefault(model.signature(), []).append(room)
+
+        for rooms in groups.values():
+            pairs = [models_dict[sensor][r] for r in rooms]
+            model = _get_stacked([m for m, _ in pairs])
+            scale, min_ = _scaler_arrays([s for _, s in pairs])
+
+            windows = []
+            for r in rooms:
+                X = series_by_room[r][col]
+                if len(X) < WINDOW:
+                    raise ValueError(f"Room {r}: need at least {WINDOW} averaged points, got {len(X)}")
+                windows.append(np.asarray(X[-WINDOW:], dtype=np.float32))
+
+            out = _rollout_stacked(model, scale, min_, np.stack(windows), steps)
+            for j, r in enumerate(rooms):
+                results[r][col] = out[:, j]
+
+    return {room: tuple(v) for room, v in results.items()}
+
+
+def rollout(X_temp, X_hum, models_dict, room: int, steps: int):
+    return rollout_batch({room: (X_temp, X_hum)}, models_dict, steps)[room]
+
+
+# ------------------------------
+# Verifikasi terhadap Keras
+# ------------------------------
+def verify_against_keras(np_model, keras_model, n_samples: int = 64, seed: int = 0):
+    """Bandingkan output numpy vs Keras pada input acak di rentang skala [0, 1]. Return max abs diff."""
+    rng = np.random.default_rng(seed)
+    shape = [n_samples] + [d for d in np_model.input_shape[1:]]
+    x = rng.random(shape, dtype=np.float32)
+    expected = np.asarray(keras_model(x, training=False))
+    return float(np.max(np.abs(np_model.predict(x) - expected)))
+
+
+def _main():
+    import argparse
+    from ML_Services.models_config import MODEL_PATHS
+    from tensorflow.keras.models import load_model
+    from tensorflow.keras.losses import MeanSquaredError
+
+    parser = argparse.ArgumentParser(description="Numpy LSTM engine utilities")
+    parser.add_argument("--verify", action="store_true", help="compare every model against Keras")
+    parser.add_argument("--tolerance", type=float, default=1e-5)
+    args = parser.parse_args()
+
+    if not args.verify:
+        parser.print_help()
+        return
+
+    failed = 0
+    for location, (model_dict, _) in MODEL_PATHS.items():
+        for sensor in model_dict:
+            for room, path in model_dict[sensor].items():
+                diff = verify_against_keras(
+                    NumpyLSTMModel.from_h5(path),
+                    load_model(path, custom_objects={"mse": MeanSquaredError()}),
+                )
+                ok = diff <= args.tolerance
+                failed += not ok
+                print(f"{location}/{sensor}/room{room}: max_abs_diff={diff:.2e} {'OK' if ok else 'FAIL'}")
+
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    _main()
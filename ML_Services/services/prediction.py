@@ -1,10 +1,14 @@
+import os
+import logging
 import numpy as np
-import pandas as pd
 from fastapi import HTTPException
 from datetime import datetime, timedelta
 from ML_Services.db import get_connection
+from ML_Services.services import numpy_lstm
 from collections import defaultdict
 
+logger = logging.getLogger("uvicorn.error")
+
 TABLE_MAP = {
     "kebalen": "server_kebalen",
     "gayungan": "server_gayungan"
@@ -24,21 +28,29 @@ ROOM_MAP = {
 }
 
 
-def make_prediction(seq_data, models_dict, lokasi: str, room: int, duration: int):
-    temp_model, temp_scaler = models_dict["temperature"][room]
-    hum_model, hum_scaler = models_dict["humidity"][room]
+# "fused"  = satu graph compile per (lokasi, room)
+# "numpy"  = forward pass LSTM dengan NumPy, bobot dibaca langsung dari .h5
+# "legacy" = loop model.predict lama
+FORECAST_ENGINES = ("fused", "numpy", "legacy")
+FORECAST_ENGINE = os.getenv("FORECAST_ENGINE", "fused")
 
-    X_temp = np.array([d["temperature"] for d in seq_data], dtype=np.float32)
-    X_hum = np.array([d["humidity"] for d in seq_data], dtype=np.float32)
+# override per model, format: "gayungan:1=numpy,kebalen:2=legacy"
+FORECAST_ENGINE_OVERRIDES = {}
+for _item in filter(None, os.getenv("FORECAST_ENGINE_OVERRIDES", "").split(",")):
+    _target, _engine = _item.split("=")
+    _loc, _room = _target.split(":")
+    FORECAST_ENGINE_OVERRIDES[(_loc.strip(), int(_room))] = _engine.strip()
 
-    now = datetime.now()
-    minute_offset = (5 - (now.minute % 5)) % 5 or 5
-    start_time = now.replace(second=0, microsecond=0) + timedelta(minutes=minute_offset)
+# verifikasi engine numpy terhadap Keras (fused) untuk setiap request
+NUMPY_ENGINE_VERIFY = os.getenv("NUMPY_ENGINE_VERIFY", "0") == "1"
+NUMPY_ENGINE_TOLERANCE = float(os.getenv("NUMPY_ENGINE_TOLERANCE", "0.01"))
 
-    predictions = []
+
+def _rollout_legacy(X_temp, X_hum, temp_model, temp_scaler, hum_model, hum_scaler, steps: int):
+    temps, hums = [], []
     window = 12
 
-    for i in range(duration * 12):
+    for i in range(steps):
         # Use numpy slicing for last 12 values
         input_temp = X_temp[-window:].reshape(-1, 1)
         input_temp_scaled = temp_scaler.transform(input_temp).reshape(1, window, 1)
@@ -50,42 +62,210 @@ def make_prediction(seq_data, models_dict, lokasi: str, room: int, duration: int
         next_hum = hum_model.predict(input_hum_scaled, verbose=0)
         next_hum = hum_scaler.inverse_transform(next_hum)[0][0]
 
+        temps.append(next_temp)
+        hums.append(next_hum)
+
+        X_temp = np.append(X_temp, next_temp)
+        X_hum = np.append(X_hum, next_hum)
+
+    return temps, hums
+
+
+def _to_arrays(seq_data):
+    if hasattr(seq_data, "temperature"):
+        # Resampled (average_by_interval / rollup): sudah float32 kontigu
+        return seq_data.temperature, seq_data.humidity
+    X_temp = np.array([d["temperature"] for d in seq_data], dtype=np.float32)
+    X_hum = np.array([d["humidity"] for d in seq_data], dtype=np.float32)
+    return X_temp, X_hum
+
+
+def forecast_start():
+    now = datetime.now()
+    minute_offset = (5 - (now.minute % 5)) % 5 or 5
+    return now.replace(second=0, microsecond=0) + timedelta(minutes=minute_offset)
+
+
+def _format_predictions(room: int, temps, hums, start_time):
+    predictions = []
+    for i in range(len(temps)):
         pred_time = start_time + timedelta(minutes=5 * i)
         predictions.append({
             "timestamp": pred_time.isoformat(),
-            "temperature": round(float(next_temp), 2),
-            "humidity": round(float(next_hum), 2)
+            "temperature": round(float(temps[i]), 2),
+            "humidity": round(float(hums[i]), 2)
         })
 
-        # Efficient append
-        X_temp = np.append(X_temp, next_temp)
-        X_hum = np.append(X_hum, next_hum)
-
     return {"room": room, "predictions": predictions}
 
 
-def save_predictions(location: str, room: int, predictions: list):
-    table = PREDICTION_TABLE_MAP[location]
-    room_name = ROOM_MAP.get(room, f"ROOM{room}")  # fallback kalau ga ada
+def resolve_engine(lokasi: str, room: int, engine: str = None):
+    engine = engine or FORECAST_ENGINE_OVERRIDES.get((lokasi, room)) or FORECAST_ENGINE
+    if engine not in FORECAST_ENGINES:
+        raise ValueError(f"Unknown forecast engine: {engine}")
+    return engine
+
+
+def model_backends(lokasi: str, room: int, engine: str = None):
+    """Backend registry yang dipakai make_prediction untuk room ini (untuk preload)."""
+    if resolve_engine(lokasi, room, engine) != "numpy":
+        return ("keras",)
+    # verifikasi numpy membandingkan dengan graph Keras, jadi keduanya dipakai
+    return ("numpy", "keras") if NUMPY_ENGINE_VERIFY else ("numpy",)
+
+
+def _numpy_models(models_dict):
+    # registry view -> view backend numpy; dict biasa dianggap sudah berisi NumpyLSTMModel
+    return models_dict.with_backend("numpy") if hasattr(models_dict, "with_backend") else models_dict
 
-    conn = get_connection()
-    cursor = conn.cursor()
 
-    sql = f"""
-        INSERT INTO {table} (room, predicted_temp, predicted_humid, predicted_time, created_at)
-        VALUES (%s, %s, %s, %s, %s)
+def _rollout_fused(series_by_room, models_dict, lokasi: str, steps: int):
+    # TensorFlow baru di-import di sini, engine numpy (+ bundle) boot tanpa TF
+    from ML_Services.services import forecast_engine
+
+    # room dengan arsitektur sama dijalankan dalam satu graph
+    groups = defaultdict(dict)
+    for room, series in series_by_room.items():
+        temp_model, _ = models_dict["temperature"][room]
+        hum_model, _ = models_dict["humidity"][room]
+        sig = (
+            forecast_engine.architecture_signature(temp_model),
+            forecast_engine.architecture_signature(hum_model),
+        )
+        groups[sig][room] = series
+
+    out = {}
+    for group in groups.values():
+        out.update(forecast_engine.rollout_batch(group, models_dict, lokasi, steps))
+    return out
+
+
+def _verify_numpy(out, series_by_room, models_dict, lokasi: str, steps: int):
+    expected = _rollout_fused(series_by_room, models_dict, lokasi, steps)
+    verification = {}
+    for room, (temps, hums) in out.items():
+        diff = max(
+            float(np.max(np.abs(temps - expected[room][0]), initial=0.0)),
+            float(np.max(np.abs(hums - expected[room][1]), initial=0.0)),
+        )
+        ok = diff <= NUMPY_ENGINE_TOLERANCE
+        verification[room] = {"max_abs_diff": diff, "ok": ok}
+        if not ok:
+            logger.error(f"[{lokasi}/{room}] numpy engine off by {diff:.4f} (> {NUMPY_ENGINE_TOLERANCE}), using keras output")
+            out[room] = expected[room]
+    return verification
+
+
+def _rollout_rooms(series_by_room, models_dict, lokasi: str, steps: int, engine: str = None):
+    """
+    series_by_room: {room: (X_temp, X_hum)}.
+    Return ({room: (temps, hums)}, {room: verification}) — verification hanya terisi
+    untuk engine numpy saat NUMPY_ENGINE_VERIFY aktif.
     """
+    by_engine = defaultdict(dict)
+    for room, series in series_by_room.items():
+        by_engine[resolve_engine(lokasi, room, engine)][room] = series
 
-    now = datetime.now()
-    for pred in predictions:
-        cursor.execute(sql, (
+    out, verification = {}, {}
+    for eng, group in by_engine.items():
+        if eng == "legacy":
+            for room, (X_temp, X_hum) in group.items():
+                temp_model, temp_scaler = models_dict["temperature"][room]
+                hum_model, hum_scaler = models_dict["humidity"][room]
+                out[room] = _rollout_legacy(X_temp, X_hum, temp_model, temp_scaler, hum_model, hum_scaler, steps)
+        elif eng == "fused":
+            out.update(_rollout_fused(group, models_dict, lokasi, steps))
+        else:
+            group_out = numpy_lstm.rollout_batch(group, _numpy_models(models_dict), steps)
+            if NUMPY_ENGINE_VERIFY:
+                verification.update(_verify_numpy(group_out, group, models_dict, lokasi, steps))
+            out.update(group_out)
+
+    return out, verification
+
+
+def make_prediction(seq_data, models_dict, lokasi: str, room: int, duration: int, engine: str = None):
+    X_temp, X_hum = _to_arrays(seq_data)
+    start_time = forecast_start()
+
+    out, verification = _rollout_rooms({room: (X_temp, X_hum)}, models_dict, lokasi, duration * 12, engine)
+    temps, hums = out[room]
+
+    result = _format_predictions(room, temps, hums, start_time)
+    if room in verification:
+        result["verification"] = verification[room]
+    return result
+
+
+def make_predictions_batch(seq_by_room: dict, models_dict, lokasi: str, duration: int, engine: str = None):
+    """
+    Forecast beberapa room sekaligus. Room dengan arsitektur model yang sama
+    dijalankan bersama (satu graph untuk "fused", bobot di-stack untuk "numpy").
+    Return {room: {"room": ..., "predictions": [...]}}.
+    """
+    start_time = forecast_start()
+    series_by_room = {room: _to_arrays(seq) for room, seq in seq_by_room.items()}
+
+    out, verification = _rollout_rooms(series_by_room, models_dict, lokasi, duration * 12, engine)
+
+    results = {}
+    for room, (temps, hums) in out.items():
+        results[room] = _format_predictions(room, temps, hums, start_time)
+        if room in verification:
+            results[room]["verification"] = verification[room]
+    return results
+
+
+# jumlah baris per statement INSERT multi-row
+PREDICTION_INSERT_BATCH = int(os.getenv("PREDICTION_INSERT_BATCH", "500"))
+
+
+def prediction_rows(room: int, predictions: list, created_at=None):
+    room_name = ROOM_MAP.get(room, f"ROOM{room}")  # fallback kalau ga ada
+    created_at = created_at or datetime.now()
+    return [
+        (
             room_name,                 # room string (ex: ROOM1)
             pred["temperature"],       # simpan temperature
             pred["humidity"],          # simpan humidity
             pred["timestamp"],         # simpan timestamp prediksi
-            now                        # created_at
-        ))
+            created_at                 # created_at
+        )
+        for pred in predictions
+    ]
 
-    conn.commit()
-    cursor.close()
-    conn.close()
\ No newline at end of file
+
+def write_prediction_rows(location: str, rows: list):
+    """
+    Tulis baris prediksi dengan INSERT multi-row, upsert pada (room, predicted_time)
+    supaya forecast ulang menimpa nilai lama, bukan menambah baris duplikat.
+    Butuh unique key (room, predicted_time), lihat ML_Services/services/schema.py.
+    """
+    if not rows:
+        return 0
+    table = PREDICTION_TABLE_MAP[location]
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        for i in range(0, len(rows), PREDICTION_INSERT_BATCH):
+            chunk = rows[i:i + PREDICTION_INSERT_BATCH]
+            values = ",".join(["(%s, %s, %s, %s, %s)"] * len(chunk))
+            sql = f"""
+                INSERT INTO {table} (room, predicted_temp, predicted_humid, predicted_time, created_at)
+                VALUES {values}
+                ON DUPLICATE KEY UPDATE
+                    predicted_temp = VALUES(predicted_temp),
+                    predicted_humid = VALUES(predicted_humid),
+                    created_at = VALUES(created_at)
+            """
+            cursor.execute(sql, tuple(v for row in chunk for v in row))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return len(rows)
+
+
+def save_predictions(location: str, room: int, predictions: list):
+    return write_prediction_rows(location, prediction_rows(room, predictions))
@@ -0,0 +1,143 @@
+import os
+import time
+import queue
+import logging
+import threading
+import traceback
+from collections import defaultdict
+
+from ML_Services.services.prediction import prediction_rows, write_prediction_rows
+from shared.metrics import PREDICTION_WRITER_BATCH, PREDICTION_WRITER_FLUSH
+
+logger = logging.getLogger("uvicorn.error")
+
+PREDICTION_WRITE_BEHIND = os.getenv("PREDICTION_WRITE_BEHIND", "0") == "1"
+PREDICTION_QUEUE_SIZE = int(os.getenv("PREDICTION_QUEUE_SIZE", "256"))
+PREDICTION_FLUSH_INTERVAL = float(os.getenv("PREDICTION_FLUSH_INTERVAL", "1.0"))
+
+
+class PredictionWriter:
+    """
+    Write-behind untuk save_predictions: request hanya memasukkan forecast ke queue,
+    thread background menggabungkan isi queue per lokasi lalu menulis dengan
+    INSERT multi-row (upsert). Queue dibatasi; kalau penuh, forecast ditulis
+    langsung di thread pemanggil supaya tidak ada data yang hilang.
+    """
+
+    def __init__(self, maxsize=PREDICTION_QUEUE_SIZE, flush_interval=PREDICTION_FLUSH_INTERVAL):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.flush_interval = flush_interval
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        self.enqueued = 0
+        self.written_rows = 0
+        self.sync_fallbacks = 0
+        self.failures = 0
+        self.flushes = 0
+        self.last_batch_rows = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="prediction-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, location: str, room: int, predictions: list):
+        """Return "queued" atau "written" (fallback sinkron saat queue penuh / writer mati)."""
+        rows = prediction_rows(room, predictions)
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait((location, rows))
+                with self._lock:
+                    self.enqueued += 1
+                return "queued"
+            except queue.Full:
+                pass
+        with self._lock:
+            self.sync_fallbacks += 1
+        self._write({location: rows})
+        return "written"
+
+    def _drain(self, block: bool):
+        items = []
+        try:
+            items.append(self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait())
+            while True:
+                items.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return items
+
+    def _write(self, rows_by_location):
+        t0 = time.time()
+        total = 0
+        for location, rows in rows_by_location.items():
+            try:
+                total += write_prediction_rows(location, rows)
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                logger.error(f"[{location}] prediction write failed ({len(rows)} rows): {e}")
+                logger.debug(traceback.format_exc())
+        latency = time.time() - t0
+        PREDICTION_WRITER_FLUSH.observe(latency)
+        PREDICTION_WRITER_BATCH.observe(total)
+        with self._lock:
+            self.flushes += 1
+            self.written_rows += total
+            self.last_batch_rows = total
+            self.last_flush_latency = latency
+            self.max_flush_latency = max(self.max_flush_latency, latency)
+
+    def _flush(self, items):
+        rows_by_location = defaultdict(list)
+        for location, rows in items:
+            rows_by_location[location].extend(rows)
+        self._write(rows_by_location)
+        for _ in items:
+            self._queue.task_done()
+
+    def _run(self):
+        while not self._stop.is_set():
+            items = self._drain(block=True)
+            if items:
+                self._flush(items)
+
+    def flush(self):
+        """Tulis semua yang masih di queue sekarang (dipanggil juga saat shutdown)."""
+        items = self._drain(block=False)
+        if items:
+            self._flush(items)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2 + 1)
+            self._thread = None
+        self.flush()
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self._thread is not None,
+                "queue_depth": self.queue_depth(),
+                "queue_max": self._queue.maxsize,
+                "enqueued": self.enqueued,
+                "written_rows": self.written_rows,
+                "sync_fallbacks": self.sync_fallbacks,
+                "failures": self.failures,
+                "flushes": self.flushes,
+                "last_batch_rows": self.last_batch_rows,
+                "last_flush_latency": self.last_flush_latency,
+                "max_flush_latency": self.max_flush_latency,
+            }
+
+
+PREDICTION_WRITER = PredictionWriter()
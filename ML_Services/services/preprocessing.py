@@ -1,8 +1,9 @@
+import os
 import numpy as np
-import pandas as pd
 from fastapi import HTTPException
 from datetime import datetime, timedelta
 from ML_Services.db import get_connection
+from ML_Services.services.resample import resample, resample_rows
 from collections import defaultdict
 
 TABLE_MAP = {
@@ -10,6 +11,13 @@ TABLE_MAP = {
     "gayungan": "server_gayungan"
 }
 
+# 5-minute rollups, dijaga oleh backend/rollups.py
+ROLLUP_TABLE_MAP = {
+    "kebalen": "rollup_5min_kebalen",
+    "gayungan": "rollup_5min_gayungan"
+}
+ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "0") == "1"
+
 PREDICTION_TABLE_MAP = {
     "kebalen": "predictions_kebalen",
     "gayungan": "predictions_gayungan"
@@ -23,13 +31,92 @@ ROOM_MAP = {
     5: "ROOM5"
 }
 
+# jam tambahan di luar duration_hours, supaya sensor yang sempat telat tetap dapat N data
+SENSOR_FETCH_MARGIN_HOURS = int(os.getenv("SENSOR_FETCH_MARGIN_HOURS", "1"))
+# catat Handler_read_* MySQL (baris yang benar-benar dibaca engine), butuh 2 query tambahan
+SENSOR_FETCH_STATS = os.getenv("SENSOR_FETCH_STATS", "0") == "1"
+
+SENSOR_COLUMNS = ["sensor_id", "time_id", "temperature", "humidity"]
+
+
+class SensorRows:
+    """
+    Hasil fetch dalam bentuk kolom NumPy (tanpa DataFrame).
+    rows_fetched = baris yang dikirim DB, rows_scanned = baris yang dibaca engine
+    (hanya terisi kalau SENSOR_FETCH_STATS aktif).
+    """
+
+    def __init__(self, sensor_id, time_id, temperature, humidity, rows_fetched=0, rows_scanned=None):
+        self.sensor_id = sensor_id
+        self.time_id = time_id
+        self.temperature = temperature
+        self.humidity = humidity
+        self.rows_fetched = rows_fetched
+        self.rows_scanned = rows_scanned
+
+    def __len__(self):
+        return len(self.time_id)
+
+    def as_dict(self):
+        return {c: getattr(self, c) for c in SENSOR_COLUMNS}
+
+    def stats(self):
+        return {"scanned": self.rows_scanned, "fetched": self.rows_fetched, "returned": len(self)}
+
+
+def _rows_to_columns(rows, limit: int, rows_scanned=None):
+    """
+    rows: tuple (sensor_id, time_id, temperature, humidity) urut sensor_id, time_id DESC.
+    Ambil `limit` baris terakhir per sensor tanpa sort ulang.
+    """
+    if not rows:
+        return SensorRows(*(np.array([]) for _ in SENSOR_COLUMNS), rows_fetched=0, rows_scanned=rows_scanned)
+
+    sensor_col, time_col, temp_col, hum_col = zip(*rows)
+    sensor = np.array(sensor_col, dtype=object)
+    n = len(sensor)
+
+    # posisi baris dalam grup sensor-nya (data sudah terurut dari SQL)
+    is_start = np.empty(n, dtype=bool)
+    is_start[0] = True
+    is_start[1:] = sensor[1:] != sensor[:-1]
+    idx = np.arange(n)
+    group_start = np.maximum.accumulate(np.where(is_start, idx, 0))
+    keep = (idx - group_start) < limit
+
+    return SensorRows(
+        sensor[keep],
+        np.array(time_col, dtype="datetime64[ns]")[keep],
+        np.array(temp_col, dtype=np.float64)[keep],
+        np.array(hum_col, dtype=np.float64)[keep],
+        rows_fetched=n,
+        rows_scanned=rows_scanned,
+    )
+
+
+def _handler_reads(cursor):
+    cursor.execute("SHOW SESSION STATUS LIKE 'Handler_read%'")
+    return sum(int(v) for _, v in cursor.fetchall())
+
+
+def _fetch_bounded(sql: str, params: tuple):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        before = _handler_reads(cursor) if SENSOR_FETCH_STATS else None
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        scanned = _handler_reads(cursor) - before if SENSOR_FETCH_STATS else None
+    finally:
+        cursor.close()
+        conn.close()
+    return rows, scanned
+
+
 def get_sensor_data(location: str, room: int, duration_hours: int):
     table = TABLE_MAP.get(location)
     if not table:
         raise ValueError("Unknown location")
-    
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
 
     room_name = ROOM_MAP.get(room)
     if not room_name:
@@ -38,49 +125,179 @@ def get_sensor_data(location: str, room: int, duration_hours: int):
     # total data per sensor = duration_hours * 12 (karena 12 data per jam)
     limit = duration_hours * 12
 
-    # Optimized: Ambil N terakhir per sensor langsung di SQL
+    # Hanya baca rentang waktu terakhir lewat index (room_id, time_id), dihitung dari
+    # data terbaru room ini (bukan NOW()) supaya tetap jalan kalau sensor sempat mati.
     sql = f"""
-        SELECT t.sensor_id, t.time_id, t.temperature, t.humidity
-        FROM (
-            SELECT *,
-                ROW_NUMBER() OVER (PARTITION BY sensor_id ORDER BY time_id DESC) AS rn
+        SELECT sensor_id, time_id, temperature, humidity
+        FROM {table}
+        WHERE room_id = %s
+          AND time_id >= (SELECT MAX(time_id) FROM {table} WHERE room_id = %s) - INTERVAL %s HOUR
+        ORDER BY sensor_id, time_id DESC
+    """
+    rows, scanned = _fetch_bounded(sql, (room_name, room_name, duration_hours + SENSOR_FETCH_MARGIN_HOURS))
+
+    if not rows:
+        return []
+
+    return _rows_to_columns(rows, limit, scanned)
+
+
+def average_by_interval(raw_data, fill: str = None):
+    """
+    Rata-rata room per 5 menit di grid tetap (bucket kosong diisi, lihat RESAMPLE_FILL).
+    Return Resampled dengan array float32 yang langsung dipakai make_prediction.
+    """
+    return resample_rows(raw_data, fill)
+
+
+def get_location_sensor_data(location: str, rooms: list, duration_hours: int):
+    """
+    Sama seperti get_sensor_data tapi untuk beberapa room sekaligus, dalam satu query.
+    Return {room: SensorRows}; room tanpa data dapat list kosong.
+    """
+    table = TABLE_MAP.get(location)
+    if not table:
+        raise ValueError("Unknown location")
+
+    room_names = {}
+    for room in rooms:
+        room_name = ROOM_MAP.get(room)
+        if not room_name:
+            raise ValueError(f"Invalid room number: {room}")
+        room_names[room_name] = room
+
+    limit = duration_hours * 12
+    placeholders = ",".join(["%s"] * len(room_names))
+
+    sql = f"""
+        SELECT r.room_id, r.sensor_id, r.time_id, r.temperature, r.humidity
+        FROM {table} r
+        JOIN (
+            SELECT room_id, MAX(time_id) AS latest
             FROM {table}
-            WHERE room_id = %s
-        ) t
-        WHERE t.rn <= %s
-        ORDER BY t.sensor_id, t.time_id DESC
+            WHERE room_id IN ({placeholders})
+            GROUP BY room_id
+        ) m ON r.room_id = m.room_id AND r.time_id >= m.latest - INTERVAL %s HOUR
+        ORDER BY r.room_id, r.sensor_id, r.time_id DESC
     """
-    cursor.execute(sql, (room_name, limit))
+    rows, scanned = _fetch_bounded(sql, tuple(room_names) + (duration_hours + SENSOR_FETCH_MARGIN_HOURS,))
+
+    by_room = defaultdict(list)
+    for row in rows:
+        by_room[row[0]].append(row[1:])
+
+    result = {room: [] for room in rooms}
+    for room_name, room_rows in by_room.items():
+        room = room_names.get(room_name)
+        if room is not None:
+            # rows_scanned berlaku untuk seluruh query, bukan per room
+            result[room] = _rows_to_columns(room_rows, limit, scanned)
+
+    return result
+
+
+def get_latest_time_ids(location: str, rooms: list):
+    """
+    Versi data per room untuk forecast cache: time_id terbaru di tabel raw, atau
+    (bucket terbaru, cnt) di rollup 5 menit kalau forecast dihitung dari rollup,
+    supaya cache baru invalid setelah refresher benar-benar menulis data baru.
+    """
+    table = ROLLUP_TABLE_MAP.get(location) if ROLLUPS_ENABLED else TABLE_MAP.get(location)
+    if not table:
+        raise ValueError("Unknown location")
+
+    room_names = {ROOM_MAP[r]: r for r in rooms if r in ROOM_MAP}
+    result = {room: None for room in rooms}
+    if not room_names:
+        return result
+
+    placeholders = ",".join(["%s"] * len(room_names))
+    if ROLLUPS_ENABLED:
+        # bucket terakhir bisa masih terisi sebagian; cnt ikut berubah saat di-refresh
+        sql = f"""
+            SELECT r.room_id, r.bucket, r.cnt
+            FROM {table} r
+            WHERE r.room_id IN ({placeholders}) AND r.sensor_id = 'ALL'
+              AND r.bucket = (
+                  SELECT MAX(bucket) FROM {table}
+                  WHERE room_id = r.room_id AND sensor_id = 'ALL'
+              )
+        """
+    else:
+        sql = f"""
+            SELECT room_id, MAX(time_id) AS latest
+            FROM {table}
+            WHERE room_id IN ({placeholders})
+            GROUP BY room_id
+        """
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(sql, tuple(room_names))
     rows = cursor.fetchall()
     cursor.close()
     conn.close()
 
-    if not rows:
-        return []
+    for room_name, *latest in rows:
+        result[room_names[room_name]] = tuple(latest) if ROLLUPS_ENABLED else latest[0]
+    return result
 
-    # convert ke DataFrame biar gampang proses
-    df = pd.DataFrame(rows)
 
-    # ambil N data terakhir per sensor
-    df_sorted = df.sort_values(["sensor_id", "time_id"], ascending=[True, False])
-    df_limited = df_sorted.groupby("sensor_id").head(limit)
+def get_location_rollups(location: str, rooms: list, duration_hours: int):
+    """
+    Rata-rata room per 5 menit langsung dari tabel rollup (pengganti
+    get_location_sensor_data + average_by_interval). Return {room: Resampled}
+    di grid 5 menit yang sama (bucket hilang diisi); room tanpa data dapat list kosong.
+    """
+    rollup = ROLLUP_TABLE_MAP.get(location)
+    if not rollup:
+        raise ValueError("Unknown location")
 
-    return df_limited
+    room_names = {}
+    for room in rooms:
+        room_name = ROOM_MAP.get(room)
+        if not room_name:
+            raise ValueError(f"Invalid room number: {room}")
+        room_names[room_name] = room
 
+    limit = duration_hours * 12
+    placeholders = ",".join(["%s"] * len(room_names))
+    sql = f"""
+        SELECT t.room_id, t.bucket, t.temp_avg, t.hum_avg
+        FROM (
+            SELECT room_id, bucket, temp_avg, hum_avg,
+                ROW_NUMBER() OVER (PARTITION BY room_id ORDER BY bucket DESC) AS rn
+            FROM {rollup}
+            WHERE room_id IN ({placeholders}) AND sensor_id = 'ALL'
+        ) t
+        WHERE t.rn <= %s
+        ORDER BY t.room_id, t.bucket
+    """
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(sql, tuple(room_names) + (limit,))
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
 
-def average_by_interval(raw_data):
-    df = pd.DataFrame(raw_data, columns=["sensor_id", "time_id", "temperature", "humidity"])
-    df["time_id"] = pd.to_datetime(df["time_id"])
+    by_room = defaultdict(list)
+    for row in rows:
+        by_room[row[0]].append(row[1:])
 
-    # Buat kolom pembulatan ke 5 menit
-    df["timestamp_5min"] = df["time_id"].dt.floor("5min")
+    result = {room: [] for room in rooms}
+    for room_name, room_rows in by_room.items():
+        room = room_names.get(room_name)
+        if room is not None:
+            buckets, temps, hums = zip(*room_rows)
+            result[room] = resample(
+                np.array(buckets, dtype="datetime64[ns]"),
+                np.array(temps, dtype=np.float64),
+                np.array(hums, dtype=np.float64),
+            )
+
+    return result
 
-    # Groupby lalu ambil rata-rata
-    avg_df = (
-        df.groupby("timestamp_5min")[["temperature", "humidity"]]
-        .mean()
-        .reset_index()
-        .sort_values("timestamp_5min")
-    )
 
-    return avg_df
+def get_room_rollup(location: str, room: int, duration_hours: int):
+    return get_location_rollups(location, [room], duration_hours)[room]
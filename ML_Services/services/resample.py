@@ -0,0 +1,110 @@
+"""
+Resampling data sensor ke grid 5 menit dengan NumPy (pengganti pandas floor + groupby).
+
+Setiap bucket 5 menit di antara data pertama dan terakhir selalu ada di output, jadi
+window 12 langkah LSTM benar-benar 1 jam. Bucket tanpa data diisi sesuai RESAMPLE_FILL:
+    interpolate  linear antar bucket berisi (default)
+    ffill        nilai bucket sebelumnya
+    none         bucket kosong dibuang (perilaku lama average_by_interval)
+"""
+import os
+import numpy as np
+
+RESAMPLE_INTERVAL_SECONDS = 300
+RESAMPLE_FILL = os.getenv("RESAMPLE_FILL", "interpolate")
+FILL_METHODS = ("interpolate", "ffill", "none")
+
+
+class Resampled:
+    """
+    Rata-rata per bucket sebagai array kontigu: timestamps (datetime64[ns]) dan
+    temperature/humidity (float32, langsung jadi input model). filled = bucket hasil isian.
+    """
+
+    def __init__(self, timestamps, temperature, humidity, filled):
+        self.timestamps = timestamps
+        self.temperature = temperature
+        self.humidity = humidity
+        self.filled = filled
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def gaps_filled(self):
+        return int(self.filled.sum())
+
+    def records(self):
+        """List of dict {timestamp_5min, temperature, humidity}, hanya untuk debugging / JSON."""
+        return [
+            {"timestamp_5min": t, "temperature": float(temp), "humidity": float(hum)}
+            for t, temp, hum in zip(self.timestamps.astype("datetime64[us]").tolist(), self.temperature, self.humidity)
+        ]
+
+
+def _bin_mean(idx, values, nbins):
+    # NaN (NULL di DB) tidak ikut dihitung, sama dengan pandas mean()
+    valid = ~np.isnan(values)
+    counts = np.bincount(idx[valid], minlength=nbins)
+    sums = np.bincount(idx[valid], weights=values[valid], minlength=nbins)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def _fill(values, method: str):
+    missing = np.isnan(values)
+    if not missing.any() or missing.all():
+        return values
+    positions = np.arange(len(values))
+    if method == "ffill":
+        # posisi bucket valid terakhir; bucket kosong di awal pakai nilai valid pertama
+        last = np.maximum.accumulate(np.where(missing, -1, positions))
+        last[last < 0] = np.argmax(~missing)
+        return values[last]
+    return np.interp(positions, positions[~missing], values[~missing])
+
+
+def resample(time_id, temperature, humidity, fill: str = None, interval_seconds: int = RESAMPLE_INTERVAL_SECONDS):
+    """
+    time_id: array datetime64, temperature/humidity: array float (boleh NaN), urutan bebas.
+    Return Resampled, bucket = floor(time_id) ke kelipatan interval_seconds.
+    """
+    fill = fill or RESAMPLE_FILL
+    if fill not in FILL_METHODS:
+        raise ValueError(f"Unknown fill method: {fill}")
+
+    if len(time_id) == 0:
+        empty = np.empty(0, dtype=np.float32)
+        return Resampled(np.empty(0, dtype="datetime64[ns]"), empty, empty.copy(), np.empty(0, dtype=bool))
+
+    step = np.int64(interval_seconds) * 1_000_000_000
+    bins = np.asarray(time_id, dtype="datetime64[ns]").view(np.int64) // step
+    first = bins.min()
+    idx = bins - first
+    nbins = int(idx.max()) + 1
+
+    temp = _bin_mean(idx, np.asarray(temperature, dtype=np.float64), nbins)
+    hum = _bin_mean(idx, np.asarray(humidity, dtype=np.float64), nbins)
+    has_rows = np.bincount(idx, minlength=nbins) > 0
+    timestamps = ((first + np.arange(nbins)) * step).astype("datetime64[ns]")
+
+    if fill == "none":
+        timestamps, temp, hum = timestamps[has_rows], temp[has_rows], hum[has_rows]
+        filled = np.zeros(len(timestamps), dtype=bool)
+    else:
+        filled = ~has_rows
+        temp, hum = _fill(temp, fill), _fill(hum, fill)
+
+    return Resampled(
+        timestamps,
+        np.ascontiguousarray(temp, dtype=np.float32),
+        np.ascontiguousarray(hum, dtype=np.float32),
+        filled,
+    )
+
+
+def resample_rows(raw_data, fill: str = None):
+    """SensorRows (atau dict kolom yang sama) -> Resampled."""
+    if isinstance(raw_data, dict):
+        return resample(raw_data["time_id"], raw_data["temperature"], raw_data["humidity"], fill)
+    return resample(raw_data.time_id, raw_data.temperature, raw_data.humidity, fill)
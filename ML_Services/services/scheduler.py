@@ -0,0 +1,129 @@
+import os
+import time
+import asyncio
+import logging
+import traceback
+
+from shared.metrics import SCHEDULER_LAG, SCHEDULER_RUN
+
+logger = logging.getLogger("uvicorn.error")
+
+FORECAST_SCHEDULER = os.getenv("FORECAST_SCHEDULER", "0") == "1"
+SCHEDULER_INTERVAL_SECONDS = int(os.getenv("SCHEDULER_INTERVAL_SECONDS", "300"))  # sama dengan bucket 5min
+SCHEDULER_OFFSET_SECONDS = float(os.getenv("SCHEDULER_OFFSET_SECONDS", "30"))     # tunggu data bucket baru masuk
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "2"))
+SCHEDULER_HORIZON_HOURS = int(os.getenv("SCHEDULER_HORIZON_HOURS", "24"))
+
+
+def next_run_at(now: float, interval: float = SCHEDULER_INTERVAL_SECONDS, offset: float = SCHEDULER_OFFSET_SECONDS):
+    """Waktu (epoch) boundary interval berikutnya + offset."""
+    boundary = (now // interval) * interval
+    run_at = boundary + offset
+    if run_at <= now:
+        run_at += interval
+    return run_at
+
+
+class ForecastScheduler:
+    """
+    Hitung ulang forecast semua (location, room) sesaat setelah setiap boundary 5 menit.
+
+    run_fn(location, room) adalah fungsi blocking (pipeline penuh termasuk save);
+    dijalankan di executor dengan batas concurrency. Lag jadwal dan durasi run
+    dicatat per room supaya kelihatan kapan satu putaran tidak muat lagi di interval.
+    """
+
+    def __init__(self, jobs, run_fn, executor, concurrency=SCHEDULER_CONCURRENCY,
+                 interval=SCHEDULER_INTERVAL_SECONDS, offset=SCHEDULER_OFFSET_SECONDS):
+        self.jobs = list(jobs)  # [(location, room)]
+        self.run_fn = run_fn
+        self.executor = executor
+        self.concurrency = concurrency
+        self.interval = interval
+        self.offset = offset
+
+        self._task = None
+        self.rooms = {}  # (location, room) -> statistik terakhir
+        self.ticks = 0
+        self.last_tick = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._loop())
+            logger.info("Forecast scheduler started for %d rooms", len(self.jobs))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            scheduled = next_run_at(time.time(), self.interval, self.offset)
+            await asyncio.sleep(max(0.0, scheduled - time.time()))
+            try:
+                await self.run_once(scheduled)
+            except Exception as e:
+                logger.error("Forecast scheduler tick failed: %s\n%s", e, traceback.format_exc())
+
+    async def run_once(self, scheduled: float = None):
+        scheduled = scheduled or time.time()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_event_loop()
+
+        async def _run(location, room):
+            async with semaphore:
+                started = time.time()
+                stats = {"scheduled_at": scheduled, "started_at": started, "lag": started - scheduled}
+                try:
+                    res = await loop.run_in_executor(self.executor, self.run_fn, location, room)
+                    if isinstance(res, dict) and res.get("error"):
+                        stats["status"] = "no_data"
+                    elif isinstance(res, dict) and res.get("profiling", {}).get("cache", {}).get("hit"):
+                        stats["status"] = "unchanged"
+                    else:
+                        stats["status"] = "ok"
+                except Exception as e:
+                    stats["status"] = "error"
+                    stats["error"] = str(e)
+                    logger.error(f"[{location}/{room}] scheduled forecast failed: {e}")
+                stats["duration"] = time.time() - started
+                SCHEDULER_LAG.labels(location, str(room)).observe(stats["lag"])
+                SCHEDULER_RUN.labels(location, str(room), stats["status"]).observe(stats["duration"])
+                prev = self.rooms.get((location, room), {})
+                stats["runs"] = prev.get("runs", 0) + 1
+                self.rooms[(location, room)] = stats
+
+        t0 = time.time()
+        await asyncio.gather(*[_run(loc, room) for loc, room in self.jobs])
+        finished = time.time()
+
+        self.ticks += 1
+        self.last_tick = {
+            "scheduled_at": scheduled,
+            "duration": finished - t0,
+            "lag": t0 - scheduled,
+            # putaran selesai setelah jadwal berikutnya -> fleet tidak muat di interval
+            "overran": finished > scheduled + self.interval,
+        }
+        if self.last_tick["overran"]:
+            logger.warning("Forecast scheduler tick took %.1fs, longer than the %ss interval",
+                           finished - scheduled, self.interval)
+
+    def status(self):
+        return {
+            "running": self._task is not None,
+            "interval": self.interval,
+            "offset": self.offset,
+            "concurrency": self.concurrency,
+            "ticks": self.ticks,
+            "last_tick": self.last_tick,
+            "rooms": [
+                {"location": loc, "room": room, **stats}
+                for (loc, room), stats in sorted(self.rooms.items())
+            ],
+        }
@@ -0,0 +1,122 @@
+"""
+Helper skema / migrasi untuk tabel yang dipakai ML service.
+
+    python -m ML_Services.services.schema            # terapkan
+    python -m ML_Services.services.schema --dry-run  # tampilkan SQL saja
+"""
+import argparse
+import logging
+
+from ML_Services.db import get_connection
+from shared.db import DB_BACKEND
+from ML_Services.services.preprocessing import PREDICTION_TABLE_MAP, TABLE_MAP
+
+logger = logging.getLogger("uvicorn.error")
+
+PREDICTION_UNIQUE_INDEX = "uq_room_predicted_time"
+
+# index untuk fetch berbatas waktu (get_sensor_data) dan query per sensor (/dashboard-data)
+SENSOR_INDEXES = {
+    "idx_room_time": "(room_id, time_id)",
+    "idx_sensor_time": "(sensor_id, time_id)",
+}
+
+
+def _index_exists(cursor, table: str, index: str):
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """,
+        (table, index),
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def prediction_migrations(table: str):
+    return [
+        # buang duplikat lama, sisakan baris terbaru per (room, predicted_time);
+        # created_at yang sama dipecah dengan id supaya tepat satu baris tersisa
+        f"""
+        DELETE older FROM {table} older
+        JOIN {table} newer
+          ON older.room = newer.room
+         AND older.predicted_time = newer.predicted_time
+         AND (older.created_at, older.id) < (newer.created_at, newer.id)
+        """,
+        f"ALTER TABLE {table} ADD UNIQUE INDEX {PREDICTION_UNIQUE_INDEX} (room, predicted_time)",
+    ]
+
+
+def ensure_prediction_indexes(dry_run: bool = False):
+    """Pastikan tabel predictions_* punya unique key (room, predicted_time) untuk upsert."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    applied = []
+    try:
+        for table in PREDICTION_TABLE_MAP.values():
+            if _index_exists(cursor, table, PREDICTION_UNIQUE_INDEX):
+                continue
+            for sql in prediction_migrations(table):
+                applied.append(sql.strip())
+                if not dry_run:
+                    cursor.execute(sql)
+            if not dry_run:
+                conn.commit()
+                logger.info("Added %s on %s", PREDICTION_UNIQUE_INDEX, table)
+    finally:
+        cursor.close()
+        conn.close()
+    return applied
+
+
+def missing_prediction_indexes():
+    """
+    Tabel predictions_* yang belum punya unique key (room, predicted_time). Tanpa key itu
+    ON DUPLICATE KEY UPDATE tidak pernah cocok dan setiap forecast ulang menambah duplikat.
+    """
+    if DB_BACKEND == "sqlite":
+        return []  # tabel SQLite (benchmarks/synthetic.py) dibuat dengan UNIQUE (room, predicted_time)
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        return [t for t in PREDICTION_TABLE_MAP.values() if not _index_exists(cursor, t, PREDICTION_UNIQUE_INDEX)]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def ensure_sensor_indexes(dry_run: bool = False):
+    """Pastikan tabel raw server_* punya index yang dipakai fetch berbatas waktu."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    applied = []
+    try:
+        for table in TABLE_MAP.values():
+            for index, columns in SENSOR_INDEXES.items():
+                if _index_exists(cursor, table, index):
+                    continue
+                sql = f"ALTER TABLE {table} ADD INDEX {index} {columns}"
+                applied.append(sql)
+                if not dry_run:
+                    cursor.execute(sql)
+                    logger.info("Added %s on %s", index, table)
+        if not dry_run:
+            conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply ML service schema migrations")
+    parser.add_argument("--dry-run", action="store_true", help="print SQL without executing")
+    args = parser.parse_args()
+
+    for sql in ensure_sensor_indexes(dry_run=args.dry_run) + ensure_prediction_indexes(dry_run=args.dry_run):
+        print(sql + ";\n")
+
+
+if __name__ == "__main__":
+    main()
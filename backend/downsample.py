@@ -0,0 +1,86 @@
+"""
+Downsampling time series untuk chart: hasil maksimal `n` titik tapi bentuk kurva
+(puncak, lembah) tetap terlihat. Semua fungsi mengembalikan index terurut ke array asli.
+"""
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int):
+    """Largest-Triangle-Three-Buckets: titik pertama & terakhir + 1 titik per bucket."""
+    size = len(x)
+    if n >= size or n < 3:
+        return np.arange(size)
+
+    edges = np.linspace(1, size - 1, n - 1).astype(np.int64)  # n-2 bucket di antara ujung
+    selected = np.empty(n, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = size - 1
+
+    # rata-rata bucket berikutnya dihitung sekaligus (cumsum), loop hanya per bucket
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < n - 1 else size)
+        nhi = max(nhi, nlo + 1)
+        avg_x = (cx[nhi] - cx[nlo]) / (nhi - nlo)
+        avg_y = (cy[nhi] - cy[nlo]) / (nhi - nlo)
+
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(y: np.ndarray, n: int):
+    """Index minimum dan maksimum per bucket (n/2 bucket), plus kedua ujung."""
+    size = len(y)
+    if n >= size or n < 4:
+        return np.arange(size)
+
+    buckets = (n - 2) // 2
+    edges = np.linspace(0, size, buckets + 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    starts, ends = starts[ends > starts], ends[ends > starts]
+
+    # argmin/argmax per bucket tanpa loop: reduceat nilai, lalu cari posisi pertama yang sama;
+    # fmin/fmax mengabaikan NaN, jadi hanya bucket yang seluruhnya NaN tidak punya kandidat
+    mins = np.fmin.reduceat(y, starts)
+    maxs = np.fmax.reduceat(y, starts)
+    bucket_of = np.repeat(np.arange(len(starts)), ends - starts)
+    is_min = y == mins[bucket_of]
+    is_max = y == maxs[bucket_of]
+    first_min = np.full(len(starts), size, dtype=np.int64)
+    first_max = np.full(len(starts), size, dtype=np.int64)
+    idx = np.arange(size)
+    np.minimum.at(first_min, bucket_of[is_min], idx[is_min])
+    np.minimum.at(first_max, bucket_of[is_max], idx[is_max])
+
+    picked = np.concatenate(([0, size - 1], first_min, first_max))
+    return np.unique(picked[picked < size])  # bucket seluruhnya NaN tetap bernilai `size`
+
+
+def downsample(timestamps: np.ndarray, series: list, n: int, method: str = "lttb"):
+    """
+    Pilih index yang dipakai bersama oleh beberapa series dengan sumbu waktu sama
+    (mis. temperature & humidity). Budget `n` dibagi rata antar series.
+    """
+    size = len(timestamps)
+    if size <= n:
+        return np.arange(size)
+
+    per_series = max(n // len(series), 4)
+    x = timestamps.astype("datetime64[s]").astype(np.float64)
+    picked = []
+    for y in series:
+        y = np.asarray(y, dtype=np.float64)
+        if method == "minmax":
+            picked.append(minmax(y, per_series))
+        else:
+            picked.append(lttb(x, y, per_series))
+    return np.unique(np.concatenate(picked))
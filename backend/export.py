@@ -0,0 +1,313 @@
+"""
+Export bulk data sensor mentah (server_*) atau forecast tersimpan (predictions_*)
+untuk rentang waktu tertentu, sebagai CSV, NDJSON atau Parquet.
+
+Baris dibaca per chunk lewat cursor unbuffered dari koneksi di luar pool, lalu
+di-encode per chunk oleh generator, jadi memori tetap kecil walau rentangnya setahun.
+
+    python -m backend.export --location gayungan --start 2026-01-01 --end 2026-02-01 --out jan.csv
+    python -m backend.export --kind predictions --location kebalen --start 2026-01-01 --format ndjson
+"""
+import io
+import os
+import csv
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import traceback
+from collections import deque
+from datetime import datetime
+
+from backend.db import connect_unpooled
+
+logger = logging.getLogger("uvicorn.error")
+
+TABLE_MAP = {
+    "kebalen": "server_kebalen",
+    "gayungan": "server_gayungan"
+}
+
+PREDICTION_TABLE_MAP = {
+    "kebalen": "predictions_kebalen",
+    "gayungan": "predictions_gayungan"
+}
+
+KINDS = ("readings", "predictions")
+FORMATS = ("csv", "ndjson", "parquet")
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "10000"))
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+
+# kolom: (nama, tipe) -> tipe dipakai untuk schema Parquet
+COLUMNS = {
+    "readings": [
+        ("sensor_id", "string"), ("room_id", "string"), ("time_id", "timestamp"),
+        ("temperature", "double"), ("humidity", "double"),
+    ],
+    "predictions": [
+        ("room", "string"), ("predicted_time", "timestamp"),
+        ("predicted_temp", "double"), ("predicted_humid", "double"), ("created_at", "timestamp"),
+    ],
+}
+
+
+def local_time(ts: datetime):
+    # kolom DATETIME tanpa zona: waktu ber-zona diubah ke jam server (sama seperti ingest)
+    if ts is not None and ts.tzinfo is not None:
+        ts = ts.astimezone().replace(tzinfo=None)
+    return ts
+
+
+def build_query(kind: str, location: str, start: datetime, end: datetime, room: str = None, sensor: str = None):
+    """Return (sql, params) untuk rentang [start, end), urut waktu."""
+    names = [c for c, _ in COLUMNS[kind]]
+    if kind == "readings":
+        table, time_col, room_col = TABLE_MAP[location], "time_id", "room_id"
+    else:
+        table, time_col, room_col = PREDICTION_TABLE_MAP[location], "predicted_time", "room"
+
+    where = [f"{time_col} >= %s", f"{time_col} < %s"]
+    params = [start, end]
+    if room:
+        where.append(f"{room_col} = %s")
+        params.append(room)
+    if sensor and kind == "readings":
+        where.append("sensor_id = %s")
+        params.append(sensor)
+
+    sql = f"""
+        SELECT {", ".join(names)}
+        FROM `{table}`
+        WHERE {" AND ".join(where)}
+        ORDER BY {time_col}
+    """
+    return sql, tuple(params)
+
+
+def iter_chunks(sql: str, params: tuple, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Yield list baris per chunk; koneksi ditutup saat generator selesai / ditutup."""
+    conn = connect_unpooled()
+    cursor = None
+    try:
+        # unbuffered: mysql-connector membaca baris dari socket saat fetchmany, bukan sekaligus
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield rows
+    finally:
+        try:
+            if cursor:
+                cursor.close()
+        except Exception:
+            pass  # unread result kalau export dihentikan di tengah
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _value(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+
+def encode_csv(chunks, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([c for c, _ in columns])
+    yield buffer.getvalue().encode()
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerows([[_value(v) for v in row] for row in rows])
+        yield buffer.getvalue().encode()
+
+
+def encode_ndjson(chunks, columns):
+    names = [c for c, _ in columns]
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(names, map(_value, row)))) + "\n" for row in rows).encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """File tujuan ParquetWriter yang isinya diambil per chunk (tell tetap posisi absolut)."""
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def encode_parquet(chunks, columns):
+    # pyarrow opsional, hanya dibutuhkan untuk format parquet
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"string": pa.string(), "double": pa.float64(), "timestamp": pa.timestamp("us")}
+    schema = pa.schema([(name, types[t]) for name, t in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        for rows in chunks:
+            # satu row group per chunk
+            writer.write_table(pa.Table.from_pylist(
+                [dict(zip(schema.names, row)) for row in rows], schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {"csv": encode_csv, "ndjson": encode_ndjson, "parquet": encode_parquet}
+
+
+class ExportTracker:
+    """Jumlah export yang sedang jalan + ringkasan export terakhir (rows/s)."""
+
+    def __init__(self, max_concurrent: int = EXPORT_MAX_CONCURRENT, keep: int = 20):
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._active = 0
+        self._recent = deque(maxlen=keep)
+
+    def busy(self):
+        # batas lunak: dicek sebelum response dibuat, dihitung saat stream mulai
+        with self._lock:
+            return self._active >= self.max_concurrent
+
+    def started(self):
+        with self._lock:
+            self._active += 1
+
+    def finished(self, summary: dict):
+        with self._lock:
+            self._active -= 1
+            self._recent.append(summary)
+
+    def stats(self):
+        with self._lock:
+            return {"active": self._active, "max_concurrent": self.max_concurrent, "recent": list(self._recent)}
+
+
+EXPORTS = ExportTracker()
+
+
+def stream_export(kind: str, location: str, start: datetime, end: datetime, fmt: str = "csv",
+                  room: str = None, sensor: str = None, chunk_rows: int = EXPORT_CHUNK_ROWS,
+                  tracker: ExportTracker = EXPORTS):
+    """Generator bytes hasil export; ringkasan (rows, bytes, rows/s) dicatat di tracker dan log."""
+    columns = COLUMNS[kind]
+    start, end = local_time(start), local_time(end)
+    sql, params = build_query(kind, location, start, end, room, sensor)
+    summary = {
+        "kind": kind, "location": location, "format": fmt, "room": room, "sensor": sensor,
+        "start": start.isoformat(), "end": end.isoformat(), "rows": 0, "bytes": 0, "status": "aborted",
+    }
+
+    def counted(chunks):
+        for rows in chunks:
+            summary["rows"] += len(rows)
+            yield rows
+
+    tracker.started()
+    t0 = time.perf_counter()
+    try:
+        for data in ENCODERS[fmt](counted(iter_chunks(sql, params, chunk_rows)), columns):
+            if data:
+                summary["bytes"] += len(data)
+                yield data
+        summary["status"] = "ok"
+    except Exception as e:
+        # header sudah terkirim, error hanya bisa dicatat; output terpotong
+        summary["status"] = "error"
+        logger.error("Export %s/%s failed: %s\n%s", kind, location, str(e), traceback.format_exc())
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        summary["seconds"] = round(elapsed, 3)
+        summary["rows_per_sec"] = round(summary["rows"] / elapsed, 1) if elapsed > 0 else 0.0
+        tracker.finished(summary)
+        logger.info(
+            "Export %s/%s %s: %d rows, %d bytes in %.2fs (%.0f rows/s, %s)",
+            kind, location, fmt, summary["rows"], summary["bytes"], elapsed, summary["rows_per_sec"], summary["status"],
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream raw readings or saved forecasts to a file")
+    parser.add_argument("--kind", choices=KINDS, default="readings")
+    parser.add_argument("--location", choices=sorted(TABLE_MAP), required=True)
+    parser.add_argument("--start", type=datetime.fromisoformat, required=True)
+    parser.add_argument("--end", type=datetime.fromisoformat, help="exclusive, default now")
+    parser.add_argument("--room", help="e.g. ROOM1")
+    parser.add_argument("--sensor", help="e.g. DHT1 (readings only)")
+    parser.add_argument("--format", choices=FORMATS, help="default: from --out extension, else csv")
+    parser.add_argument("--out", help="output file, default stdout")
+    parser.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    fmt = args.format
+    if not fmt and args.out:
+        ext = os.path.splitext(args.out)[1].lstrip(".").lower()
+        fmt = ext if ext in FORMATS else None
+    fmt = fmt or "csv"
+    if fmt == "parquet" and not parquet_available():
+        parser.error("parquet export needs pyarrow (pip install pyarrow)")
+    if fmt == "parquet" and not args.out:
+        parser.error("parquet export needs --out")
+
+    tracker = ExportTracker(max_concurrent=1)
+    start, end = local_time(args.start), local_time(args.end) or datetime.now()
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    try:
+        for data in stream_export(args.kind, args.location, start, end, fmt,
+                                  args.room, args.sensor, args.chunk_rows, tracker):
+            out.write(data)
+    finally:
+        if args.out:
+            out.close()
+
+    summary = tracker.stats()["recent"][-1]
+    print(
+        f"{summary['rows']} rows, {summary['bytes']} bytes in {summary['seconds']:.2f}s "
+        f"({summary['rows_per_sec']:.0f} rows/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Hot tier in-memory untuk data terbaru: ring buffer berbasis array per (lokasi, sensor),
+ukurannya dari ROOM_MAP x HOT_TIER_POINTS. Diisi sekali saat startup (satu query per
+lokasi), lalu diikuti dengan polling time_id baru (atau langsung setelah /ingest).
+
+/dashboard-data (termasuk rata-rata "ALL") dijawab dari sini tanpa query DB; request
+yang butuh data di luar buffer tetap lewat SQL.
+"""
+import os
+import time
+import logging
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from backend.db import get_connection
+
+logger = logging.getLogger("uvicorn.error")
+
+HOT_TIER_ENABLED = os.getenv("HOT_TIER_ENABLED", "0") == "1"
+# titik per sensor yang disimpan (288 = 24 jam data 5 menit)
+HOT_TIER_POINTS = int(os.getenv("HOT_TIER_POINTS", "288"))
+HOT_TIER_POLL_SECONDS = float(os.getenv("HOT_TIER_POLL_SECONDS", "2"))
+# baris terlambat (time_id sedikit di belakang watermark) tetap ditangkap saat tailing
+HOT_TIER_LATE_SECONDS = int(os.getenv("HOT_TIER_LATE_SECONDS", "60"))
+# interval data sensor; dipakai untuk menghitung rentang jam query awal
+SENSOR_INTERVAL_SECONDS = 300
+
+
+def _to_seconds(ts: datetime):
+    return int(np.datetime64(ts, "s").astype(np.int64))
+
+
+def _to_datetime(seconds):
+    return np.datetime64(int(seconds), "s").astype(datetime)
+
+
+class LocationBuffer:
+    """
+    Ring buffer semua sensor satu lokasi: array [n_sensor, capacity] untuk time (detik epoch),
+    temperature dan humidity (NaN = NULL). Per sensor data tersimpan urut waktu.
+    """
+
+    def __init__(self, sensors, capacity: int):
+        self.index = {s: i for i, s in enumerate(sensors)}
+        self.capacity = capacity
+        n = len(sensors)
+        self.times = np.zeros((n, capacity), dtype=np.int64)
+        self.temps = np.full((n, capacity), np.nan)
+        self.hums = np.full((n, capacity), np.nan)
+        self.head = np.zeros(n, dtype=np.int64)   # posisi tulis berikutnya
+        self.count = np.zeros(n, dtype=np.int64)
+        self.filled_from = None  # detik epoch; baris lebih lama dari ini tidak pernah dimuat
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.temps.nbytes + self.hums.nbytes + self.head.nbytes + self.count.nbytes
+
+    def _positions(self, i: int):
+        n = self.count[i]
+        return (self.head[i] - n + np.arange(n)) % self.capacity
+
+    def append(self, sensor: str, t: int, temp, hum):
+        i = self.index.get(sensor)
+        if i is None:
+            return False
+        temp = np.nan if temp is None else float(temp)
+        hum = np.nan if hum is None else float(hum)
+
+        n = self.count[i]
+        last = self.times[i, (self.head[i] - 1) % self.capacity] if n else None
+        if last is None or t > last:
+            pos = self.head[i]
+            self.times[i, pos], self.temps[i, pos], self.hums[i, pos] = t, temp, hum
+            self.head[i] = (pos + 1) % self.capacity
+            self.count[i] = min(n + 1, self.capacity)
+            return True
+
+        # baris terlambat / duplikat: sisipkan urut waktu lalu tulis ulang baris sensor ini
+        pos = self._positions(i)
+        times, temps, hums = self.times[i, pos], self.temps[i, pos], self.hums[i, pos]
+        k = int(np.searchsorted(times, t))
+        if k < n and times[k] == t:
+            self.temps[i, pos[k]], self.hums[i, pos[k]] = temp, hum
+            return True
+        if n == self.capacity and k == 0:
+            return False  # lebih lama dari isi buffer yang sudah penuh
+        times = np.insert(times, k, t)[-self.capacity:]
+        temps = np.insert(temps, k, temp)[-self.capacity:]
+        hums = np.insert(hums, k, hum)[-self.capacity:]
+        m = len(times)
+        self.times[i, :m], self.temps[i, :m], self.hums[i, :m] = times, temps, hums
+        self.head[i] = m % self.capacity
+        self.count[i] = m
+        return True
+
+    def latest(self, sensors):
+        idx = [self.index[s] for s in sensors if s in self.index and self.count[self.index[s]]]
+        if not idx:
+            return None
+        return max(self.times[i, (self.head[i] - 1) % self.capacity] for i in idx)
+
+    def sensor_rows(self, sensor: str, points: int):
+        """(times, temps, hums) `points` baris terakhir, atau None kalau buffer tidak cukup."""
+        i = self.index.get(sensor)
+        if i is None or self.count[i] < points:
+            return None
+        pos = self._positions(i)[-points:]
+        return self.times[i, pos], self.temps[i, pos], self.hums[i, pos]
+
+    def average_rows(self, sensors, points: int, bucket_seconds: int = None):
+        """
+        Rata-rata room per time_id (atau per bucket), `points` key terakhir. None kalau
+        key yang diminta tidak dijamin lengkap di buffer (sensor yang buffernya penuh
+        sudah membuang baris lama, dan baris sebelum filled_from tidak pernah dimuat).
+        """
+        coverage = self.filled_from
+        parts = []
+        for s in sensors:
+            i = self.index.get(s)
+            if i is None or not self.count[i]:
+                continue
+            pos = self._positions(i)
+            if self.count[i] == self.capacity:
+                coverage = max(coverage, int(self.times[i, pos[0]]))
+            parts.append((self.times[i, pos], self.temps[i, pos], self.hums[i, pos]))
+        if not parts:
+            return None
+
+        times = np.concatenate([p[0] for p in parts])
+        temps = np.concatenate([p[1] for p in parts])
+        hums = np.concatenate([p[2] for p in parts])
+        keys = times - times % bucket_seconds if bucket_seconds else times
+
+        keep = keys >= coverage
+        keys, temps, hums = keys[keep], temps[keep], hums[keep]
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        if len(uniq) < points:
+            return None
+
+        # AVG SQL: NULL tidak dihitung, semua NULL -> NULL
+        def _mean(values):
+            valid = ~np.isnan(values)
+            counts = np.bincount(inverse[valid], minlength=len(uniq))
+            sums = np.bincount(inverse[valid], weights=values[valid], minlength=len(uniq))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+        return uniq[-points:], _mean(temps)[-points:], _mean(hums)[-points:]
+
+
+class HotTier:
+    def __init__(self, table_map, room_map, capacity: int = HOT_TIER_POINTS, bucket_seconds: int = None):
+        self.table_map = table_map
+        self.room_map = room_map
+        self.capacity = capacity
+        self.bucket_seconds = bucket_seconds  # rata-rata "ALL" per bucket (mis. 300 saat rollup aktif)
+        self.buffers = {
+            location: LocationBuffer([s for sensors in rooms.values() for s in sensors], capacity)
+            for location, rooms in room_map.items()
+        }
+        self.ready = set()
+        self.watermark = {}
+        self._seen = {location: set() for location in room_map}
+        self.counters = {"hits": 0, "misses": 0, "miss_not_ready": 0, "miss_outside_buffer": 0,
+                         "polls": 0, "rows": 0, "errors": 0}
+        self.fill_time = {}
+        self._counter_lock = threading.Lock()
+        self._backfill = {}  # location -> time_id terlama dari ingest yang belum di-tail
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _count(self, *names):
+        with self._counter_lock:
+            for name in names:
+                self.counters[name] += 1
+
+    # --- loading / tailing ---
+    def _query(self, sql, params=()):
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def fill(self, location: str):
+        """Satu query bulk: semua sensor lokasi, cukup jam untuk `capacity` titik per sensor."""
+        t0 = time.time()
+        table = self.table_map[location]
+        buf = self.buffers[location]
+        latest = self._query(f"SELECT MAX(time_id) FROM `{table}`")[0][0]
+        if latest is None:
+            since = datetime.now()
+            rows = []
+        else:
+            since = latest - timedelta(seconds=self.capacity * SENSOR_INTERVAL_SECONDS + HOT_TIER_LATE_SECONDS)
+            rows = self._query(
+                f"""
+                SELECT sensor_id, time_id, temperature, humidity
+                FROM `{table}`
+                WHERE time_id >= %s
+                ORDER BY time_id
+                """,
+                (since,),
+            )
+        with buf.lock:
+            buf.filled_from = _to_seconds(since)
+            for sensor_id, time_id, temperature, humidity in rows:
+                buf.append(sensor_id, _to_seconds(time_id), temperature, humidity)
+        self.watermark[location] = latest or since
+        cutoff = self.watermark[location] - timedelta(seconds=HOT_TIER_LATE_SECONDS)
+        self._seen[location] = {(r[0], r[1]) for r in rows if r[1] >= cutoff}
+        self.ready.add(location)
+        self.fill_time[location] = time.time() - t0
+        logger.info("Hot tier %s filled with %d rows in %.3fs", location, len(rows), self.fill_time[location])
+
+    def tail(self, location: str, since: datetime = None):
+        """Ambil baris baru sejak watermark (dengan toleransi baris terlambat), atau sejak `since`."""
+        table = self.table_map[location]
+        late = self.watermark[location] - timedelta(seconds=HOT_TIER_LATE_SECONDS)
+        since = min(since, late) if since is not None else late
+        rows = self._query(
+            f"""
+            SELECT sensor_id, time_id, temperature, humidity
+            FROM `{table}`
+            WHERE time_id >= %s
+            ORDER BY time_id
+            """,
+            (since,),
+        )
+        seen = self._seen[location]
+        fresh = [r for r in rows if (r[0], r[1]) not in seen]
+        buf = self.buffers[location]
+        with buf.lock:
+            for sensor_id, time_id, temperature, humidity in fresh:
+                buf.append(sensor_id, _to_seconds(time_id), temperature, humidity)
+        for r in fresh:
+            seen.add((r[0], r[1]))
+            if r[1] > self.watermark[location]:
+                self.watermark[location] = r[1]
+        cutoff = self.watermark[location] - timedelta(seconds=HOT_TIER_LATE_SECONDS)
+        self._seen[location] = {k for k in seen if k[1] >= cutoff}
+        with self._counter_lock:
+            self.counters["polls"] += 1
+            self.counters["rows"] += len(fresh)
+        return len(fresh)
+
+    def _run(self):
+        for location in self.table_map:
+            try:
+                self.fill(location)
+            except Exception as e:
+                self._count("errors")
+                logger.error("Hot tier fill failed for %s: %s\n%s", location, e, traceback.format_exc())
+        while not self._stop.is_set():
+            self._wake.wait(HOT_TIER_POLL_SECONDS)
+            self._wake.clear()
+            for location in list(self.ready):
+                try:
+                    self.tail(location, self._backfill.pop(location, None))
+                except Exception as e:
+                    self._count("errors")
+                    logger.error("Hot tier tail failed for %s: %s", location, e)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="hot-tier", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def wake(self, location: str = None, since: datetime = None):
+        """Tail sekarang, mis. setelah /ingest; `since` = time_id terlama yang baru ditulis."""
+        if location is not None and since is not None:
+            current = self._backfill.get(location)
+            self._backfill[location] = since if current is None else min(current, since)
+        self._wake.set()
+
+    # --- serving ---
+    def latest(self, location: str, sensors):
+        """time_id terbaru untuk sensor-sensor ini (versi cache), None kalau belum siap / kosong."""
+        if location not in self.ready:
+            return None
+        buf = self.buffers[location]
+        with buf.lock:
+            latest = buf.latest(sensors)
+        return None if latest is None else _to_datetime(latest)
+
+    def dashboard_rows(self, location: str, sensor: str, sensors_in_room, points: int):
+        """List (time_id, temperature, humidity) urut lama -> baru, atau None (pakai SQL)."""
+        if location not in self.ready:
+            self._count("misses", "miss_not_ready")
+            return None
+        buf = self.buffers[location]
+        with buf.lock:
+            if sensor == "ALL":
+                found = buf.average_rows(sensors_in_room, points, self.bucket_seconds)
+            else:
+                found = buf.sensor_rows(sensor, points)
+            if found is not None:
+                found = tuple(a.copy() for a in found)
+        if found is None:
+            self._count("misses", "miss_outside_buffer")
+            return None
+
+        self._count("hits")
+        times, temps, hums = found
+        nulls = lambda a: [None if v != v else v for v in a.tolist()]  # noqa: E731 (NaN -> NULL)
+        return list(zip(times.astype("datetime64[s]").tolist(), nulls(temps), nulls(hums)))
+
+    def memory_bytes(self):
+        return sum(buf.nbytes for buf in self.buffers.values())
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self.counters)
+        served = counters["hits"] + counters["misses"]
+        return dict(
+            counters,
+            hit_rate=counters["hits"] / served if served else None,
+            enabled=HOT_TIER_ENABLED,
+            capacity_per_sensor=self.capacity,
+            memory_bytes=self.memory_bytes(),
+            locations={
+                location: {
+                    "ready": location in self.ready,
+                    "sensors": len(buf.index),
+                    "points": int(buf.count.sum()),
+                    "watermark": str(self.watermark.get(location)),
+                    "fill_seconds": self.fill_time.get(location),
+                }
+                for location, buf in self.buffers.items()
+            },
+        )
@@ -0,0 +1,218 @@
+"""
+Ingest batch pembacaan sensor ke server_<lokasi>.
+
+Validasi terhadap ROOM_MAP, dedup pada (sensor_id, time_id) (dalam batch dan terhadap
+baris yang sudah ada), INSERT multi-row dalam satu transaksi, lalu publish event
+"data baru" in-process lewat NEW_DATA supaya cache, stream dan rollup tidak perlu
+menunggu polling berikutnya.
+"""
+import os
+import math
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from backend.db import get_connection
+from backend.storage import raw_cutoff
+
+logger = logging.getLogger("uvicorn.error")
+
+INGEST_MAX_BATCH = int(os.getenv("INGEST_MAX_BATCH", "5000"))
+# jumlah baris per statement INSERT multi-row
+INGEST_INSERT_BATCH = int(os.getenv("INGEST_INSERT_BATCH", "500"))
+# time_id lebih dari ini di depan jam server dianggap salah jam di perangkat
+INGEST_MAX_FUTURE_SECONDS = int(os.getenv("INGEST_MAX_FUTURE_SECONDS", "300"))
+
+
+class Reading(BaseModel):
+    sensor_id: str
+    room_id: str
+    time_id: datetime
+    temperature: Optional[float] = None
+    humidity: Optional[float] = None
+
+
+class IngestRequest(BaseModel):
+    location: str
+    readings: List[Reading]
+
+
+class NewData:
+    """Event setelah insert: room -> time_id terbaru yang baru masuk, plus rentang waktunya."""
+
+    def __init__(self, location: str, rooms: dict, sensors: set, rows: int, min_time: datetime, max_time: datetime):
+        self.location = location
+        self.rooms = rooms
+        self.sensors = sensors
+        self.rows = rows
+        self.min_time = min_time
+        self.max_time = max_time
+
+
+class NewDataBus:
+    """Pub/sub in-process. Callback dipanggil sinkron; error subscriber hanya dicatat."""
+
+    def __init__(self):
+        self._subscribers = []
+        self.published = 0
+        self.errors = 0
+
+    def subscribe(self, fn):
+        self._subscribers.append(fn)
+        return fn
+
+    def unsubscribe(self, fn):
+        if fn in self._subscribers:
+            self._subscribers.remove(fn)
+
+    def publish(self, event: NewData):
+        self.published += 1
+        for fn in list(self._subscribers):
+            try:
+                fn(event)
+            except Exception as e:
+                self.errors += 1
+                logger.error("New-data subscriber %s failed: %s", getattr(fn, "__name__", fn), e)
+
+    def stats(self):
+        return {
+            "subscribers": [getattr(fn, "__name__", repr(fn)) for fn in self._subscribers],
+            "published": self.published,
+            "errors": self.errors,
+        }
+
+
+NEW_DATA = NewDataBus()
+
+
+def _normalize_time(ts: datetime):
+    # kolom DATETIME tanpa zona / pecahan detik; waktu ber-zona diubah ke jam server
+    if ts.tzinfo is not None:
+        ts = ts.astimezone().replace(tzinfo=None)
+    return ts.replace(microsecond=0)
+
+
+def _number(v):
+    return v is None or math.isfinite(v)
+
+
+class Ingestor:
+    def __init__(self, table_map, room_map, bus: NewDataBus = NEW_DATA,
+                 insert_batch: int = INGEST_INSERT_BATCH):
+        self.table_map = table_map
+        self.room_map = room_map
+        self.bus = bus
+        self.insert_batch = insert_batch
+        # dedup "cek lalu insert" harus serial per tabel (dalam satu proses)
+        self._locks = {location: threading.Lock() for location in table_map}
+        self.stats_counter = {"batches": 0, "received": 0, "inserted": 0, "duplicates": 0, "rejected": 0, "seconds": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def validate(self, location: str, readings: list):
+        """Return (rows, rejected). rows: {(sensor_id, time_id): tuple baris}, yang terakhir menang."""
+        rooms = self.room_map[location]
+        max_time = datetime.now() + timedelta(seconds=INGEST_MAX_FUTURE_SECONDS)
+        # rows older than the raw retention would land in an already compacted range
+        min_time = raw_cutoff()
+        rows, rejected = {}, []
+        for i, r in enumerate(readings):
+            if r.room_id not in rooms:
+                rejected.append({"index": i, "error": f"unknown room {r.room_id}"})
+                continue
+            if r.sensor_id not in rooms[r.room_id]:
+                rejected.append({"index": i, "error": f"sensor {r.sensor_id} is not in {r.room_id}"})
+                continue
+            if not (_number(r.temperature) and _number(r.humidity)):
+                rejected.append({"index": i, "error": "temperature/humidity must be finite"})
+                continue
+            time_id = _normalize_time(r.time_id)
+            if time_id > max_time:
+                rejected.append({"index": i, "error": "time_id is in the future"})
+                continue
+            if min_time is not None and time_id < min_time:
+                rejected.append({"index": i, "error": "time_id is older than the raw retention"})
+                continue
+            rows[(r.sensor_id, time_id)] = (r.sensor_id, r.room_id, time_id, r.temperature, r.humidity)
+        return rows, rejected
+
+    def _existing(self, cursor, table: str, rows: dict):
+        sensors = sorted({k[0] for k in rows})
+        times = [k[1] for k in rows]
+        placeholders = ",".join(["%s"] * len(sensors))
+        cursor.execute(
+            f"""
+            SELECT sensor_id, time_id FROM `{table}`
+            WHERE sensor_id IN ({placeholders}) AND time_id >= %s AND time_id <= %s
+            """,
+            tuple(sensors) + (min(times), max(times)),
+        )
+        return {(s, t) for s, t in cursor.fetchall()}
+
+    def write(self, location: str, rows: dict):
+        """Insert baris yang belum ada. Return list baris yang benar-benar ditulis."""
+        table = self.table_map[location]
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            with self._locks[location]:
+                existing = self._existing(cursor, table, rows)
+                fresh = [row for key, row in rows.items() if key not in existing]
+                for i in range(0, len(fresh), self.insert_batch):
+                    chunk = fresh[i:i + self.insert_batch]
+                    values = ",".join(["(%s, %s, %s, %s, %s)"] * len(chunk))
+                    cursor.execute(
+                        f"INSERT INTO `{table}` (sensor_id, room_id, time_id, temperature, humidity) VALUES {values}",
+                        tuple(v for row in chunk for v in row),
+                    )
+                conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        return fresh
+
+    def ingest(self, location: str, readings: list):
+        """Blocking: validasi, tulis, publish. Return ringkasan untuk response."""
+        t0 = time.perf_counter()
+        rows, rejected = self.validate(location, readings)
+        written = self.write(location, rows) if rows else []
+        elapsed = time.perf_counter() - t0
+
+        if written:
+            latest = {}
+            for sensor_id, room_id, time_id, _, _ in written:
+                if room_id not in latest or time_id > latest[room_id]:
+                    latest[room_id] = time_id
+            times = [row[2] for row in written]
+            self.bus.publish(NewData(
+                location, latest, {row[0] for row in written}, len(written), min(times), max(times)
+            ))
+
+        duplicates = len(readings) - len(rejected) - len(written)
+        with self._stats_lock:
+            s = self.stats_counter
+            s["batches"] += 1
+            s["received"] += len(readings)
+            s["inserted"] += len(written)
+            s["duplicates"] += duplicates
+            s["rejected"] += len(rejected)
+            s["seconds"] += elapsed
+
+        return {
+            "location": location,
+            "received": len(readings),
+            "inserted": len(written),
+            "duplicates": duplicates,
+            "rejected": rejected,
+            "seconds": round(elapsed, 4),
+            "rows_per_sec": round(len(readings) / elapsed, 1) if elapsed > 0 else None,
+        }
+
+    def stats(self):
+        with self._stats_lock:
+            s = dict(self.stats_counter)
+        s["rows_per_sec"] = s["received"] / s["seconds"] if s["seconds"] else 0.0
+        return dict(s, bus=self.bus.stats())
@@ -0,0 +1,217 @@
+import os
+import json
+import asyncio
+import logging
+import traceback
+from datetime import datetime, timedelta
+from collections import defaultdict
+
+from backend.db import get_connection, run
+
+logger = logging.getLogger("uvicorn.error")
+
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "2"))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "100"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+# baris yang datang terlambat (time_id sedikit lebih lama dari watermark) tetap ditangkap
+STREAM_LATE_SECONDS = int(os.getenv("STREAM_LATE_SECONDS", "60"))
+# berapa time_id terakhir per room yang disimpan untuk menghitung ulang rata-rata "ALL"
+STREAM_RECENT_POINTS = int(os.getenv("STREAM_RECENT_POINTS", "6"))
+
+# ditaruh di queue subscriber saat dia ketinggalan; stream mengirim snapshot baru
+RESYNC = object()
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscription:
+    def __init__(self, location: str, room: str, sensor: str):
+        self.location = location
+        self.room = room
+        self.sensor = sensor
+        self.queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.dropped = 0
+
+    def push(self, item):
+        """Non-blocking; klien lambat tidak boleh menahan watcher."""
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # buang backlog, minta klien resync dengan snapshot
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class TableWatcher:
+    """
+    Satu watcher per tabel lokasi: polling baris baru sekali untuk semua subscriber,
+    lalu fan-out ke queue masing-masing. Beban DB tidak tergantung jumlah klien.
+    """
+
+    def __init__(self, hub, location: str):
+        self.hub = hub
+        self.location = location
+        self.table = hub.table_map[location]
+        self.sensor_room = {
+            s: room for room, sensors in hub.room_map[location].items() for s in sensors
+        }
+        self.watermark = None
+        self.seen = set()
+        self.recent = defaultdict(dict)  # room -> {key: {(sensor, time_id): (temp, hum)}}
+        self.polls = 0
+        self.rows = 0
+        self.wakeups = 0
+        self.loop = asyncio.get_event_loop()
+        self._wake = asyncio.Event()
+
+    def wake(self):
+        """Poll sekarang (dipanggil dari thread mana pun, mis. setelah ingest)."""
+        self.wakeups += 1
+        self.loop.call_soon_threadsafe(self._wake.set)
+
+    def _query(self, sql, params=()):
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _poll(self):
+        sensors = list(self.sensor_room)
+        placeholders = ",".join(["%s"] * len(sensors))
+        if self.watermark is None:
+            rows = self._query(
+                f"SELECT MAX(time_id) FROM `{self.table}` WHERE sensor_id IN ({placeholders})",
+                tuple(sensors),
+            )
+            self.watermark = rows[0][0] or datetime(1970, 1, 1)
+            return []
+
+        since = self.watermark - timedelta(seconds=STREAM_LATE_SECONDS)
+        rows = self._query(
+            f"""
+            SELECT sensor_id, time_id, temperature, humidity
+            FROM `{self.table}`
+            WHERE sensor_id IN ({placeholders}) AND time_id >= %s
+            ORDER BY time_id
+            """,
+            tuple(sensors) + (since,),
+        )
+        fresh = [r for r in rows if (r[0], r[1]) not in self.seen]
+        for r in fresh:
+            self.seen.add((r[0], r[1]))
+            if r[1] > self.watermark:
+                self.watermark = r[1]
+        cutoff = self.watermark - timedelta(seconds=STREAM_LATE_SECONDS)
+        self.seen = {k for k in self.seen if k[1] >= cutoff}
+        return fresh
+
+    def _dispatch(self, rows):
+        classify = self.hub.classify
+        all_key = self.hub.all_key
+        touched = defaultdict(set)  # room -> keys untuk rata-rata ALL yang berubah
+
+        for sensor_id, time_id, temperature, humidity in rows:
+            room = self.sensor_room.get(sensor_id)
+            if room is None:
+                continue
+            temp, hum = float(temperature or 0.0), float(humidity or 0.0)
+            self.hub.publish(self.location, room, sensor_id, {
+                "timestamp": time_id.isoformat(),
+                "temperature": temp,
+                "humidity": hum,
+                "class": classify(temp),
+            })
+
+            key = all_key(time_id)
+            self.recent[room].setdefault(key, {})[(sensor_id, time_id)] = (temp, hum)
+            touched[room].add(key)
+
+        for room, keys in touched.items():
+            for key in sorted(keys):
+                values = list(self.recent[room][key].values())
+                temp = sum(v[0] for v in values) / len(values)
+                hum = sum(v[1] for v in values) / len(values)
+                self.hub.publish(self.location, room, "ALL", {
+                    "timestamp": key.isoformat(),
+                    "temperature": temp,
+                    "humidity": hum,
+                    "class": classify(temp),
+                })
+            for old in sorted(self.recent[room])[:-STREAM_RECENT_POINTS]:
+                del self.recent[room][old]
+
+    async def run(self):
+        logger.info(f"[{self.location}] stream watcher started")
+        try:
+            while self.hub.has_subscribers(self.location):
+                try:
+                    rows = await run(self._poll)
+                    self.polls += 1
+                    if rows:
+                        self.rows += len(rows)
+                        self._dispatch(rows)
+                except Exception as e:
+                    logger.error("Stream watcher %s failed: %s\n%s", self.location, e, traceback.format_exc())
+                try:
+                    await asyncio.wait_for(self._wake.wait(), STREAM_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+        finally:
+            self.hub.watchers.pop(self.location, None)
+            logger.info(f"[{self.location}] stream watcher stopped")
+
+
+class StreamHub:
+    def __init__(self, table_map, room_map, classify, all_key=lambda ts: ts):
+        self.table_map = table_map
+        self.room_map = room_map
+        self.classify = classify
+        self.all_key = all_key  # time_id -> key rata-rata "ALL" (mis. bucket 5 menit)
+        self.subscribers = defaultdict(set)  # (location, room, sensor) -> {Subscription}
+        self.watchers = {}
+
+    def has_subscribers(self, location: str):
+        return any(key[0] == location and subs for key, subs in self.subscribers.items())
+
+    def subscribe(self, location: str, room: str, sensor: str):
+        sub = Subscription(location, room, sensor)
+        self.subscribers[(location, room, sensor)].add(sub)
+        if location not in self.watchers:
+            watcher = TableWatcher(self, location)
+            self.watchers[location] = watcher
+            asyncio.get_event_loop().create_task(watcher.run())
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        key = (sub.location, sub.room, sub.sensor)
+        self.subscribers[key].discard(sub)
+        if not self.subscribers[key]:
+            del self.subscribers[key]
+
+    def wake(self, location: str):
+        watcher = self.watchers.get(location)
+        if watcher is not None:
+            watcher.wake()
+
+    def publish(self, location: str, room: str, sensor: str, item):
+        for sub in list(self.subscribers.get((location, room, sensor), ())):
+            sub.push(item)
+
+    def stats(self):
+        return {
+            "subscribers": sum(len(s) for s in self.subscribers.values()),
+            "dropped": sum(sub.dropped for subs in self.subscribers.values() for sub in subs),
+            "watchers": {
+                loc: {"polls": w.polls, "rows": w.rows, "wakeups": w.wakeups, "watermark": str(w.watermark)}
+                for loc, w in self.watchers.items()
+            },
+        }
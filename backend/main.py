@@ -1,9 +1,24 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from backend.db import get_connection
+from backend.db import get_connection, run, stats as db_stats, PoolTimeout
+from backend.sensors import ROOM_MAP, TABLE_MAP
+from shared.metrics import instrument, gauge, counter, STAGE_LATENCY
+from backend.rollups import ROLLUP_TABLE_MAP, ROLLUP_HOURLY_TABLE_MAP, ROLLUP_ALL, ROLLUPS_ENABLED, REFRESHER, floor_5min
+from backend.storage import STORAGE, STORAGE_ENABLED, cutoffs as storage_cutoffs, dry_run as storage_dry_run
+from backend.response_cache import DASHBOARD_CACHE, DASHBOARD_CACHE_ENABLED
+from backend.live_stream import StreamHub, RESYNC, STREAM_HEARTBEAT_SECONDS, sse
+from backend.downsample import downsample, METHODS as DOWNSAMPLE_METHODS
+from backend.ingest import Ingestor, IngestRequest, NEW_DATA, INGEST_MAX_BATCH
+from backend.hot_tier import HotTier, HOT_TIER_ENABLED
+from backend.export import EXPORTS, KINDS as EXPORT_KINDS, FORMATS as EXPORT_FORMATS, MEDIA_TYPES, local_time, parquet_available, stream_export
 from datetime import datetime
+import numpy as np
+import asyncio
+import os
 import traceback
 import logging
+import time
 
 logger = logging.getLogger("uvicorn.error")
 
@@ -17,37 +32,74 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-TABLE_MAP = {
-    "kebalen": "server_kebalen",
-    "gayungan": "server_gayungan"
-}
-
-ROOM_MAP = {
-    "gayungan": {
-        "ROOM1": ["DHT1", "DHT2", "DHT3", "DHT4"],
-        "ROOM2": ["DHT5"],
-        "ROOM3": ["DHT6"],
-        "ROOM4": ["DHT7", "DHT8", "DHT9"],
-        "ROOM5": ["DHT10", "DHT11", "DHT12"]
-    },
-    "kebalen": {
-        "ROOM1": ["DHT1", "DHT2", "DHT3", "DHT4"],
-        "ROOM2": ["DHT5", "DHT6"]
-    }
-}
+# /metrics: request counts/latency, dashboard stage histograms, DB pool and executor queue
+instrument(app, "backend")
+
+@app.exception_handler(PoolTimeout)
+def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    logger.warning("DB pool exhausted on %s: %s", request.url.path, exc)
+    return JSONResponse({"detail": "Database busy, try again"}, status_code=503, headers={"Retry-After": "1"})
+
+
+@app.on_event("startup")
+def start_rollups():
+    if ROLLUPS_ENABLED:
+        REFRESHER.start()
+
+
+@app.on_event("shutdown")
+def stop_rollups():
+    REFRESHER.stop()
+
+
+@app.on_event("startup")
+def start_storage():
+    if STORAGE_ENABLED:
+        STORAGE.start()
+
+
+@app.on_event("shutdown")
+def stop_storage():
+    STORAGE.stop()
+
+
+# ring buffer data terbaru per sensor; "ALL" dirata-rata per bucket 5 menit kalau rollup aktif
+HOT_TIER = HotTier(TABLE_MAP, ROOM_MAP, bucket_seconds=300 if ROLLUPS_ENABLED else None)
+gauge("hot_tier_memory_bytes", "Bytes held by the dashboard hot tier ring buffers", HOT_TIER.memory_bytes)
+counter("hot_tier_hits", "Dashboard requests answered from the hot tier", lambda: HOT_TIER.counters["hits"])
+counter("hot_tier_misses", "Dashboard requests that fell through to SQL", lambda: HOT_TIER.counters["misses"])
+
+
+@app.on_event("startup")
+def start_hot_tier():
+    if HOT_TIER_ENABLED:
+        HOT_TIER.start()
+
+
+@app.on_event("shutdown")
+def stop_hot_tier():
+    HOT_TIER.stop()
+
 
 @app.get("/")
 def root():
     return {"message": "backend is running"}
 
-@app.get("/dashboard-data")
-def get_dashboard_data(
-    location: str = Query(..., description="kebalen or gayungan"),
-    room: str = Query(..., description="room id e.g. ROOM1"),
-    sensor: str = Query(..., description="sensor id e.g. DHT1 or ALL"),
-    points: int = Query(12, description="max number of history points (default 12)")
-):
-    # validation
+def _classify(temp: float) -> str:
+    if temp <= 10:
+        return "Anomali"
+    elif 11 <= temp <= 25:
+        return "Normal"
+    elif 26 <= temp <= 27:
+        return "Minor"
+    elif 28 <= temp <= 29:
+        return "Major"
+    else:
+        return "Critical"
+
+
+def _validate_dashboard_params(location: str, room: str, sensor: str):
+    """Returns the sensors configured for the room, or raises HTTP 400."""
     if location not in ROOM_MAP or location not in TABLE_MAP:
         raise HTTPException(status_code=400, detail="Invalid location")
 
@@ -61,18 +113,112 @@ def get_dashboard_data(
     if sensor != "ALL" and sensor not in sensors_in_room:
         raise HTTPException(status_code=400, detail="Invalid sensor for this room")
 
+    return sensors_in_room
+
+
+def _latest_time_id(location: str, room: str, sensors: list, rollup_rooms: list = None):
+    """
+    Cheap version probe for the response cache: newest time_id for the requested sensor(s),
+    or (newest bucket, cnt) of the ALL rollup of `rollup_rooms` when that is what gets served.
+    """
+    if rollup_rooms:
+        # bucket terakhir bisa masih terisi sebagian, cnt berubah tiap kali di-refresh
+        placeholders = ",".join(["%s"] * len(rollup_rooms))
+        query = f"""
+            SELECT bucket, SUM(cnt) FROM `{ROLLUP_TABLE_MAP[location]}`
+            WHERE room_id IN ({placeholders}) AND sensor_id = %s
+            GROUP BY bucket
+            ORDER BY bucket DESC
+            LIMIT 1
+        """
+        params = tuple(rollup_rooms) + (ROLLUP_ALL,)
+    else:
+        placeholders = ",".join(["%s"] * len(sensors))
+        query = f"SELECT MAX(time_id) FROM `{TABLE_MAP[location]}` WHERE sensor_id IN ({placeholders})"
+        params = tuple(sensors)
+
+    conn = get_connection()
+    if conn is None:
+        raise HTTPException(status_code=500, detail="DB connection failed")
+    cursor = None
+    try:
+        t0 = time.perf_counter()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        STAGE_LATENCY.labels("backend", "dashboard_probe", location, room).observe(time.perf_counter() - t0)
+        if rollup_rooms:
+            return (row[0], int(row[1])) if row else None
+        return row[0] if row else None
+    except Exception as e:
+        logger.error("Error probing latest time_id: %s\n%s", str(e), traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Internal server error. Check server logs for details.")
+    finally:
+        try:
+            if cursor:
+                cursor.close()
+            conn.close()
+        except Exception:
+            pass
+
+
+def _dashboard_payload(rows):
+    """rows: (time_id, temperature, humidity) oldest first -> {latest, history}."""
+    history = []
+    for ts, temperature, humidity in rows:
+        try:
+            iso = ts.isoformat() if hasattr(ts, "isoformat") else str(ts)
+        except Exception:
+            iso = str(ts)
+        history.append({
+            "timestamp": iso,
+            "temperature": float(temperature or 0.0),
+            "humidity": float(humidity or 0.0)
+        })
+
+    if not history:
+        return {"latest": None, "history": []}
+
+    latest_row = history[-1]
+    temp_class = _classify(latest_row["temperature"])
+
+    return {
+        "latest": {
+            "temperature": latest_row["temperature"],
+            "humidity": latest_row["humidity"],
+            "class": temp_class,
+            "timestamp": latest_row["timestamp"]
+        },
+        "history": history
+    }
+
+
+def _fetch_dashboard(location: str, room: str, sensor: str, points: int, sensors_in_room: list):
     conn = get_connection()
     if conn is None:
         raise HTTPException(status_code=500, detail="DB connection failed")
 
     cursor = None
     try:
+        t0 = time.perf_counter()
         cursor = conn.cursor(dictionary=True)
 
         # use mapped table name
         table_name = TABLE_MAP[location]
 
-        if sensor == "ALL":
+        if sensor == "ALL" and ROLLUPS_ENABLED:
+            # room average per 5-minute bucket, maintained by backend/rollups.py
+            query = f"""
+                SELECT bucket AS time_id,
+                       temp_avg AS temperature,
+                       hum_avg  AS humidity
+                FROM `{ROLLUP_TABLE_MAP[location]}`
+                WHERE room_id = %s AND sensor_id = %s
+                ORDER BY bucket DESC
+                LIMIT %s
+            """
+            cursor.execute(query, (room, ROLLUP_ALL, points))
+        elif sensor == "ALL":
             placeholders = ",".join(["%s"] * len(sensors_in_room))
             query = f"""
                 SELECT time_id,
@@ -98,46 +244,11 @@ def get_dashboard_data(
 
         rows = cursor.fetchall() or []
         rows = list(reversed(rows))
+        STAGE_LATENCY.labels("backend", "dashboard_query", location, room).observe(time.perf_counter() - t0)
 
-        if not rows:
-            return {"latest": None, "history": []}
-
-        history = []
-        for r in rows:
-            ts = r.get("time_id")
-            try:
-                iso = ts.isoformat() if hasattr(ts, "isoformat") else str(ts)
-            except Exception:
-                iso = str(ts)
-            history.append({
-                "timestamp": iso,
-                "temperature": float(r.get("temperature") or 0.0),
-                "humidity": float(r.get("humidity") or 0.0)
-            })
-
-        latest_row = history[-1]
-        temp = latest_row["temperature"]
-
-        if temp <= 10:
-            temp_class = "Anomali"
-        elif 11 <= temp <= 25:
-            temp_class = "Normal"
-        elif 26 <= temp <= 27:
-            temp_class = "Minor"
-        elif 28 <= temp <= 29:
-            temp_class = "Major"
-        else:
-            temp_class = "Critical"
-
-        return {
-            "latest": {
-                "temperature": latest_row["temperature"],
-                "humidity": latest_row["humidity"],
-                "class": temp_class,
-                "timestamp": latest_row["timestamp"]
-            },
-            "history": history
-        }
+        return _dashboard_payload(
+            (r.get("time_id"), r.get("temperature"), r.get("humidity")) for r in rows
+        )
 
     except Exception as e:
         tb = traceback.format_exc()
@@ -149,4 +260,547 @@ def get_dashboard_data(
                 cursor.close()
             conn.close()
         except Exception:
-            pass
\ No newline at end of file
+            pass
+
+
+def _dashboard_version(location: str, room: str, sensor: str, sensors: list):
+    # hot tier dulu (payload juga dari sana), selain itu probe tabel yang dibaca _fetch_dashboard
+    if HOT_TIER_ENABLED:
+        latest = HOT_TIER.latest(location, sensors)
+        if latest is not None:
+            return latest
+    return _latest_time_id(location, room, sensors, rollup_rooms=[room] if sensor == "ALL" and ROLLUPS_ENABLED else None)
+
+
+def _load_dashboard(location: str, room: str, sensor: str, points: int, sensors_in_room: list):
+    """Dari hot tier kalau semua titik yang diminta ada di memori, selain itu SQL."""
+    if HOT_TIER_ENABLED:
+        t0 = time.perf_counter()
+        rows = HOT_TIER.dashboard_rows(location, sensor, sensors_in_room, points)
+        if rows is not None:
+            STAGE_LATENCY.labels("backend", "dashboard_hot", location, room).observe(time.perf_counter() - t0)
+            return _dashboard_payload(rows)
+    return _fetch_dashboard(location, room, sensor, points, sensors_in_room)
+
+
+@app.get("/dashboard-data")
+async def get_dashboard_data(
+    request: Request,
+    location: str = Query(..., description="kebalen or gayungan"),
+    room: str = Query(..., description="room id e.g. ROOM1"),
+    sensor: str = Query(..., description="sensor id e.g. DHT1 or ALL"),
+    points: int = Query(12, description="max number of history points (default 12)")
+):
+    sensors_in_room = _validate_dashboard_params(location, room, sensor)
+
+    if not DASHBOARD_CACHE_ENABLED:
+        return await run(_load_dashboard, location, room, sensor, points, sensors_in_room)
+
+    # cached per (location, room, sensor, points), refreshed when a newer time_id appears
+    entry = await run(
+        DASHBOARD_CACHE.get,
+        (location, room, sensor, points),
+        lambda: _dashboard_version(location, room, sensor, sensors_in_room if sensor == "ALL" else [sensor]),
+        lambda: _load_dashboard(location, room, sensor, points, sensors_in_room),
+    )
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if entry.last_modified:
+        headers["Last-Modified"] = entry.last_modified
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or entry.etag in [t.strip() for t in if_none_match.split(",")]):
+        DASHBOARD_CACHE.mark_not_modified()
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(entry.payload, headers=headers)
+
+
+def _batch_plan(location: str, rooms: str = None, sensors: str = None):
+    """Returns {room: [sensor ids and/or "ALL"]} for the batch endpoint, or raises HTTP 400."""
+    if location not in ROOM_MAP or location not in TABLE_MAP:
+        raise HTTPException(status_code=400, detail="Invalid location")
+
+    room_list = [r.strip() for r in rooms.split(",") if r.strip()] if rooms else list(ROOM_MAP[location])
+    invalid = [r for r in room_list if r not in ROOM_MAP[location]]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid room(s) for this location: {invalid}")
+
+    wanted = {x.strip() for x in sensors.split(",") if x.strip()} if sensors else None
+    plan = {}
+    for room in room_list:
+        keys = ["ALL"] + ROOM_MAP[location][room]
+        if wanted is not None:
+            keys = [k for k in keys if k in wanted]
+        if keys:
+            plan[room] = keys
+
+    if wanted is not None:
+        unknown = wanted - {k for keys in plan.values() for k in keys}
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Invalid sensor(s) for the selected rooms: {sorted(unknown)}")
+    return plan
+
+
+def _batch_rollup_rooms(plan: dict):
+    """Rooms whose ALL series comes from rollup_5min (only with ROLLUPS_ENABLED)."""
+    if not ROLLUPS_ENABLED:
+        return []
+    return sorted(room for room, keys in plan.items() if "ALL" in keys)
+
+
+def _batch_sensors(location: str, plan: dict):
+    """
+    Raw sensors that have to be read: single sensors, plus every sensor of a room with ALL
+    when the room average is computed from raw rows (rollups disabled).
+    """
+    needed = set()
+    for room, keys in plan.items():
+        needed.update(k for k in keys if k != "ALL")
+        if "ALL" in keys and not ROLLUPS_ENABLED:
+            needed.update(ROOM_MAP[location][room])
+    return sorted(needed)
+
+
+def _batch_version(location: str, plan: dict):
+    sensors = _batch_sensors(location, plan)
+    rollup_rooms = _batch_rollup_rooms(plan)
+    raw = _latest_time_id(location, "batch", sensors) if sensors else None
+    if not rollup_rooms:
+        return raw
+    rollup = _latest_time_id(location, "batch", sensors, rollup_rooms=rollup_rooms)
+    if not sensors:
+        return rollup
+    return (raw, rollup)
+
+
+def _fetch_dashboard_batch(location: str, plan: dict, points: int):
+    """
+    Every (room, sensor) of the plan from one statement: the last `points` rows per
+    sensor (UNION ALL of index range scans on (sensor_id, time_id)). Room averages are
+    computed from those rows; the last N time_ids of a room never need older rows.
+    With ROLLUPS_ENABLED the ALL series are read from rollup_5min in the same statement.
+    """
+    sensors = _batch_sensors(location, plan)
+    rollup_rooms = _batch_rollup_rooms(plan)
+    table_name = TABLE_MAP[location]
+    branch = (
+        f"SELECT * FROM (SELECT 's' AS src, sensor_id, time_id, temperature, humidity FROM `{table_name}`"
+        f" WHERE sensor_id = %s ORDER BY time_id DESC LIMIT %s) AS s{{i}}"
+    )
+    # ALL dengan rollup: rata-rata room per 5 menit langsung dari rollup_5min, seperti /dashboard-data
+    rollup_branch = (
+        f"SELECT * FROM (SELECT 'r' AS src, room_id, bucket, temp_avg, hum_avg FROM `{ROLLUP_TABLE_MAP[location]}`"
+        f" WHERE room_id = %s AND sensor_id = %s ORDER BY bucket DESC LIMIT %s) AS r{{i}}"
+    )
+    query = " UNION ALL ".join(
+        [branch.format(i=i) for i in range(len(sensors))]
+        + [rollup_branch.format(i=i) for i in range(len(rollup_rooms))]
+    )
+    params = tuple(v for sensor in sensors for v in (sensor, points))
+    params += tuple(v for room in rollup_rooms for v in (room, ROLLUP_ALL, points))
+
+    conn = get_connection()
+    cursor = None
+    try:
+        t0 = time.perf_counter()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall() or []
+        STAGE_LATENCY.labels("backend", "dashboard_batch_query", location, "batch").observe(time.perf_counter() - t0)
+    except Exception as e:
+        logger.error("Error in /dashboard-batch: %s\n%s", str(e), traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Internal server error. Check server logs for details.")
+    finally:
+        try:
+            if cursor:
+                cursor.close()
+            conn.close()
+        except Exception:
+            pass
+
+    by_sensor = {sensor: [] for sensor in sensors}
+    by_room = {room: [] for room in rollup_rooms}
+    for src, key, time_id, temperature, humidity in rows:
+        target = by_sensor if src == "s" else by_room
+        target[key].append((time_id, float(temperature or 0.0), float(humidity or 0.0)))
+    for series in list(by_sensor.values()) + list(by_room.values()):
+        series.sort(key=lambda r: r[0])
+
+    result = {}
+    for room, keys in plan.items():
+        result[room] = {}
+        for key in keys:
+            if key != "ALL":
+                result[room][key] = _dashboard_payload(by_sensor[key])
+                continue
+            if room in by_room:
+                result[room][key] = _dashboard_payload(by_room[room])
+                continue
+            # same as the single-room ALL query: AVG per time_id, last N time_ids
+            grouped = {}
+            for sensor in ROOM_MAP[location][room]:
+                for time_id, temperature, humidity in by_sensor[sensor]:
+                    grouped.setdefault(time_id, []).append((temperature, humidity))
+            history = [
+                (ts, sum(v[0] for v in vals) / len(vals), sum(v[1] for v in vals) / len(vals))
+                for ts, vals in sorted(grouped.items())[-points:]
+            ]
+            result[room][key] = _dashboard_payload(history)
+    return {"location": location, "rooms": result}
+
+
+@app.get("/dashboard-batch")
+async def get_dashboard_batch(
+    request: Request,
+    location: str = Query(..., description="kebalen or gayungan"),
+    rooms: str = Query(None, description="comma separated rooms, default: whole location"),
+    sensors: str = Query(None, description="comma separated sensor ids and/or ALL, default: all + room averages"),
+    points: int = Query(12, description="max number of history points per series (default 12)")
+):
+    """
+    Several /dashboard-data answers in one request and one SQL statement:
+    { location, rooms: { ROOM1: { ALL: {latest, history}, DHT1: {...} }, ... } }
+    """
+    plan = _batch_plan(location, rooms, sensors)
+
+    if not DASHBOARD_CACHE_ENABLED:
+        return await run(_fetch_dashboard_batch, location, plan, points)
+
+    entry = await run(
+        DASHBOARD_CACHE.get,
+        ("batch", location, tuple((room, tuple(keys)) for room, keys in plan.items()), points),
+        lambda: _batch_version(location, plan),
+        lambda: _fetch_dashboard_batch(location, plan, points),
+    )
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if entry.last_modified:
+        headers["Last-Modified"] = entry.last_modified
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or entry.etag in [t.strip() for t in if_none_match.split(",")]):
+        DASHBOARD_CACHE.mark_not_modified()
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(entry.payload, headers=headers)
+
+
+# batas atas max_points untuk /dashboard-history
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "2000"))
+
+
+def _history_segments(location: str, start: datetime, end: datetime):
+    """
+    [(source, seg_start, seg_end)] covering [start, end): raw rows before the retention cutoffs
+    are compacted away (backend/storage.py), so older parts come from the hourly / 5-minute rollups.
+    """
+    recent = "rollup_5min" if ROLLUPS_ENABLED else "raw"
+    policy = storage_cutoffs() if STORAGE_ENABLED else None
+    if not policy:
+        return [(recent, start, end)]
+
+    bounds = [("rollup_1h", policy["rollup_5min"]), ("rollup_5min", policy["raw"]), (recent, None)]
+    segments, cursor_start = [], start
+    for source, upper in bounds:
+        seg_end = end if upper is None else min(end, upper)
+        if seg_end <= cursor_start:
+            continue
+        if segments and segments[-1][0] == source:
+            segments[-1] = (source, segments[-1][1], seg_end)
+        else:
+            segments.append((source, cursor_start, seg_end))
+        cursor_start = seg_end
+    return segments
+
+
+def _history_query(cursor, location: str, room: str, sensor: str, source: str,
+                   start: datetime, end: datetime, sensors_in_room: list):
+    if source in ("rollup_1h", "rollup_5min"):
+        rollup = (ROLLUP_HOURLY_TABLE_MAP if source == "rollup_1h" else ROLLUP_TABLE_MAP)[location]
+        # buckets per sensor or the room-wide 'ALL' row, no GROUP BY on raw rows
+        cursor.execute(
+            f"""
+            SELECT bucket, temp_avg, hum_avg
+            FROM `{rollup}`
+            WHERE room_id = %s AND sensor_id = %s AND bucket >= %s AND bucket < %s
+            ORDER BY bucket
+            """,
+            (room, ROLLUP_ALL if sensor == "ALL" else sensor, start, end),
+        )
+    elif sensor == "ALL":
+        placeholders = ",".join(["%s"] * len(sensors_in_room))
+        cursor.execute(
+            f"""
+            SELECT time_id, AVG(temperature), AVG(humidity)
+            FROM `{TABLE_MAP[location]}`
+            WHERE sensor_id IN ({placeholders}) AND time_id >= %s AND time_id < %s
+            GROUP BY time_id
+            ORDER BY time_id
+            """,
+            tuple(sensors_in_room) + (start, end),
+        )
+    else:
+        cursor.execute(
+            f"""
+            SELECT time_id, temperature, humidity
+            FROM `{TABLE_MAP[location]}`
+            WHERE sensor_id = %s AND time_id >= %s AND time_id < %s
+            ORDER BY time_id
+            """,
+            (sensor, start, end),
+        )
+    return cursor.fetchall() or []
+
+
+def _fetch_history(location: str, room: str, sensor: str, start: datetime, end: datetime,
+                   max_points: int, method: str, sensors_in_room: list):
+    segments = _history_segments(location, start, end)
+    conn = get_connection()
+    cursor = None
+    try:
+        t0 = time.perf_counter()
+        cursor = conn.cursor()
+        rows = []
+        for source, seg_start, seg_end in segments:
+            rows.extend(_history_query(cursor, location, room, sensor, source, seg_start, seg_end, sensors_in_room))
+        STAGE_LATENCY.labels("backend", "history_query", location, room).observe(time.perf_counter() - t0)
+    except Exception as e:
+        logger.error("Error in /dashboard-history: %s\n%s", str(e), traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Internal server error. Check server logs for details.")
+    finally:
+        try:
+            if cursor:
+                cursor.close()
+            conn.close()
+        except Exception:
+            pass
+
+    t1 = time.perf_counter()
+    timestamps = np.array([r[0] for r in rows], dtype="datetime64[us]")
+    temps = np.array([float(r[1] or 0.0) for r in rows])
+    hums = np.array([float(r[2] or 0.0) for r in rows])
+    idx = downsample(timestamps, [temps, hums], max_points, method)
+    payload = _dashboard_payload((rows[i][0], temps[i], hums[i]) for i in idx)
+    STAGE_LATENCY.labels("backend", "history_downsample", location, room).observe(time.perf_counter() - t1)
+
+    payload.update({
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "source": "+".join(seg[0] for seg in segments) or "raw",
+        "segments": [{"source": src, "start": a.isoformat(), "end": b.isoformat()} for src, a, b in segments],
+        "method": method,
+        "raw_points": len(rows),
+        "returned_points": len(payload["history"]),
+    })
+    return payload
+
+
+@app.get("/dashboard-history")
+async def get_dashboard_history(
+    location: str = Query(..., description="kebalen or gayungan"),
+    room: str = Query(..., description="room id e.g. ROOM1"),
+    sensor: str = Query(..., description="sensor id e.g. DHT1 or ALL"),
+    start: datetime = Query(..., description="range start (inclusive), ISO 8601"),
+    end: datetime = Query(None, description="range end (exclusive), default now"),
+    max_points: int = Query(500, description="max number of points returned after downsampling"),
+    method: str = Query("lttb", description="lttb or minmax")
+):
+    """
+    History for a time range, downsampled server-side to at most `max_points` points
+    so a week or month of readings stays a chart-sized payload.
+    """
+    sensors_in_room = _validate_dashboard_params(location, room, sensor)
+    start, end = local_time(start), local_time(end) or datetime.now()
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if not 10 <= max_points <= HISTORY_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"max_points must be between 10 and {HISTORY_MAX_POINTS}")
+    if method not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of {list(DOWNSAMPLE_METHODS)}")
+
+    return await run(_fetch_history, location, room, sensor, start, end, max_points, method, sensors_in_room)
+
+
+@app.get("/export")
+def export_data(
+    location: str = Query(..., description="kebalen or gayungan"),
+    start: datetime = Query(..., description="range start (inclusive), ISO 8601"),
+    end: datetime = Query(None, description="range end (exclusive), default now"),
+    kind: str = Query("readings", description="readings or predictions"),
+    format: str = Query("csv", description="csv, ndjson or parquet"),
+    room: str = Query(None, description="optional room filter e.g. ROOM1"),
+    sensor: str = Query(None, description="optional sensor filter e.g. DHT1 (readings only)")
+):
+    """
+    Streams raw readings or saved forecasts for a time range. Rows are read in chunks from an
+    unbuffered cursor and encoded as they arrive, so memory stays flat for long ranges.
+    """
+    if location not in TABLE_MAP:
+        raise HTTPException(status_code=400, detail="Invalid location")
+    if kind not in EXPORT_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {list(EXPORT_KINDS)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(EXPORT_FORMATS)}")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="parquet export is not available (pyarrow not installed)")
+    if room and room not in ROOM_MAP[location]:
+        raise HTTPException(status_code=400, detail="Invalid room")
+    if sensor:
+        if kind != "readings":
+            raise HTTPException(status_code=400, detail="sensor filter only applies to readings")
+        sensors = ROOM_MAP[location][room] if room else [s for ss in ROOM_MAP[location].values() for s in ss]
+        if sensor not in sensors:
+            raise HTTPException(status_code=400, detail="Invalid sensor")
+    start, end = local_time(start), local_time(end) or datetime.now()
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if EXPORTS.busy():
+        raise HTTPException(status_code=503, detail="Too many exports running, try again later", headers={"Retry-After": "30"})
+
+    filename = f"{kind}_{location}_{start:%Y%m%d%H%M}_{end:%Y%m%d%H%M}.{format}"
+    # generator sync: Starlette mengiterasinya di threadpool, event loop tetap bebas
+    return StreamingResponse(
+        stream_export(kind, location, start, end, format, room, sensor),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/admin/export")
+def admin_export():
+    """Running exports and rows/s, bytes and status of the most recent ones."""
+    return EXPORTS.stats()
+
+
+@app.get("/admin/cache")
+def admin_cache():
+    """Hit/revalidation/miss counters of the /dashboard-data response cache."""
+    return DASHBOARD_CACHE.stats()
+
+
+@app.get("/admin/hot-tier")
+def admin_hot_tier():
+    """Hit rate, fallback reasons, memory and watermark of the in-memory hot tier."""
+    return HOT_TIER.stats()
+
+
+@app.get("/admin/storage")
+async def admin_storage(dry_run: bool = Query(False, description="report what compaction/retention would save")):
+    """Retention cutoffs and the last compaction run; with dry_run=true a size / query time report."""
+    if dry_run:
+        return await run(storage_dry_run, ROOM_MAP)
+    return STORAGE.stats()
+
+
+@app.get("/admin/db")
+def admin_db():
+    """Pool usage, acquire wait times and per-query timings."""
+    return db_stats()
+
+
+# rata-rata "ALL" di stream harus cocok dengan history snapshot (bucket 5 menit kalau pakai rollup)
+STREAM_HUB = StreamHub(TABLE_MAP, ROOM_MAP, _classify, all_key=floor_5min if ROLLUPS_ENABLED else (lambda ts: ts))
+
+
+@app.get("/dashboard-stream")
+async def dashboard_stream(
+    request: Request,
+    location: str = Query(..., description="kebalen or gayungan"),
+    room: str = Query(..., description="room id e.g. ROOM1"),
+    sensor: str = Query(..., description="sensor id e.g. DHT1 or ALL"),
+    points: int = Query(12, description="history points in the initial snapshot (default 12)")
+):
+    """
+    Server-Sent Events: satu event `snapshot` (format sama dengan /dashboard-data),
+    lalu event `reading` {timestamp, temperature, humidity, class} untuk tiap data baru.
+    Klien yang tertinggal menerima snapshot baru, bukan backlog.
+    """
+    sensors_in_room = _validate_dashboard_params(location, room, sensor)
+
+    async def events():
+        # subscribe di dalam generator: kalau klien putus sebelum stream mulai,
+        # generator tidak pernah jalan dan tidak ada subscription yang tertinggal
+        sub = STREAM_HUB.subscribe(location, room, sensor)
+        try:
+            snapshot = await run(_fetch_dashboard, location, room, sensor, points, sensors_in_room)
+            yield sse("snapshot", snapshot)
+            while not await request.is_disconnected():
+                try:
+                    item = await asyncio.wait_for(sub.queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if item is RESYNC:
+                    snapshot = await run(_fetch_dashboard, location, room, sensor, points, sensors_in_room)
+                    yield sse("snapshot", snapshot)
+                else:
+                    yield sse("reading", item)
+        finally:
+            STREAM_HUB.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/admin/stream")
+def admin_stream():
+    """Subscribers, dropped (backpressure) events and watcher state of /dashboard-stream."""
+    return STREAM_HUB.stats()
+
+
+# ---------------- Ingest ----------------
+
+INGESTOR = Ingestor(TABLE_MAP, ROOM_MAP)
+
+
+# subscribers of the in-process "new data" event; the ML service runs in another process
+# and keeps versioning its forecast cache on the latest time_id
+@NEW_DATA.subscribe
+def invalidate_dashboard_cache(event):
+    rooms = set(event.rooms)
+    DASHBOARD_CACHE.invalidate(
+        lambda key: (key[0] == event.location and key[1] in rooms) or (key[0] == "batch" and key[1] == event.location)
+    )
+
+
+@NEW_DATA.subscribe
+def wake_stream_watcher(event):
+    STREAM_HUB.wake(event.location)
+
+
+@NEW_DATA.subscribe
+def tail_hot_tier(event):
+    if HOT_TIER_ENABLED:
+        HOT_TIER.wake(event.location, event.min_time)
+
+
+@NEW_DATA.subscribe
+def refresh_rollups(event):
+    if ROLLUPS_ENABLED:
+        REFRESHER.mark_dirty(event.location, event.min_time)
+
+
+@app.post("/ingest")
+async def ingest_readings(body: IngestRequest):
+    """
+    Batch of readings for one location. Invalid rows are rejected individually, rows whose
+    (sensor_id, time_id) already exist are skipped, the rest go in with multi-row INSERTs.
+    """
+    if body.location not in TABLE_MAP:
+        raise HTTPException(status_code=400, detail="Invalid location")
+    if not body.readings:
+        raise HTTPException(status_code=400, detail="readings is empty")
+    if len(body.readings) > INGEST_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {INGEST_MAX_BATCH} readings per batch")
+
+    return await run(INGESTOR.ingest, body.location, body.readings)
+
+
+@app.get("/admin/ingest")
+def admin_ingest():
+    """Ingest totals (inserted / duplicates / rejected, rows/s) and new-data subscribers."""
+    return INGESTOR.stats()
@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+
+DASHBOARD_CACHE_ENABLED = os.getenv("DASHBOARD_CACHE_ENABLED", "1") == "1"
+# selama TTL, response dilayani tanpa menyentuh DB sama sekali
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "5"))
+DASHBOARD_CACHE_MAX_ENTRIES = int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "1024"))
+
+
+class CacheEntry:
+    __slots__ = ("payload", "version", "etag", "last_modified", "checked_at")
+
+    def __init__(self, payload, version):
+        self.payload = payload
+        self.version = version
+        body = json.dumps(payload, sort_keys=True, default=str).encode()
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        # versi bisa tuple (bucket rollup, cnt); Last-Modified dari elemen pertama
+        stamp = version[0] if isinstance(version, tuple) else version
+        self.last_modified = (
+            formatdate(stamp.timestamp(), usegmt=True) if hasattr(stamp, "timestamp") else None
+        )
+        self.checked_at = time.monotonic()
+
+
+class ResponseCache:
+    """
+    Cache response per key dengan versi data (mis. time_id terbaru).
+
+    - masih dalam TTL        -> langsung dari cache (0 query)
+    - lewat TTL, versi sama  -> 1 query probe murah, cache diperpanjang
+    - versi berubah / kosong -> query penuh, cache diganti
+    Request bersamaan untuk key yang sama menunggu satu refresh yang sama.
+    """
+
+    def __init__(self, ttl=DASHBOARD_CACHE_TTL, max_entries=DASHBOARD_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.stats_counter = {"fresh_hits": 0, "revalidated": 0, "misses": 0, "not_modified": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats_counter[name] += 1
+
+    def get(self, key, probe_fn, load_fn):
+        """probe_fn() -> versi data saat ini, load_fn() -> payload. Return CacheEntry."""
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+
+            if entry is not None and time.monotonic() - entry.checked_at < self.ttl:
+                self._count("fresh_hits")
+                return entry
+
+            version = probe_fn()
+            if entry is not None and version is not None and entry.version == version:
+                entry.checked_at = time.monotonic()
+                self._count("revalidated")
+                return entry
+
+            entry = CacheEntry(load_fn(), version)
+            self._count("misses")
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    old_key, _ = self._entries.popitem(last=False)
+                    self._key_locks.pop(old_key, None)
+            return entry
+
+    def invalidate(self, predicate=None):
+        with self._lock:
+            for key in [k for k in self._entries if predicate is None or predicate(k)]:
+                del self._entries[key]
+
+    def mark_not_modified(self):
+        self._count("not_modified")
+
+    def stats(self):
+        with self._lock:
+            return dict(self.stats_counter, size=len(self._entries), ttl=self.ttl)
+
+
+DASHBOARD_CACHE = ResponseCache()
@@ -0,0 +1,290 @@
+"""
+5-minute rollups of the raw sensor tables.
+
+One row per (room_id, sensor_id, bucket) with avg/min/max/count of temperature and
+humidity; sensor_id = 'ALL' holds the room-level aggregate over every sensor in the
+room (same numbers as average_by_interval in ML_Services). Buckets are recomputed
+from raw rows, so a refresh is idempotent and late rows are absorbed as long as
+they land within ROLLUP_LOOKBACK_MINUTES.
+
+    python -m backend.rollups --create            # create rollup tables (5-minute and hourly)
+    python -m backend.rollups --rebuild           # backfill full history
+    python -m backend.rollups --refresh           # aggregate new rows only
+"""
+import os
+import time
+import logging
+import argparse
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+from shared import db as shared_db
+from backend.db import get_connection
+
+logger = logging.getLogger("uvicorn.error")
+
+TABLE_MAP = {
+    "kebalen": "server_kebalen",
+    "gayungan": "server_gayungan"
+}
+
+ROLLUP_TABLE_MAP = {
+    "kebalen": "rollup_5min_kebalen",
+    "gayungan": "rollup_5min_gayungan"
+}
+
+# hourly rollups, written by the compaction job in backend/storage.py
+ROLLUP_HOURLY_TABLE_MAP = {
+    "kebalen": "rollup_1h_kebalen",
+    "gayungan": "rollup_1h_gayungan"
+}
+
+ROLLUP_ALL = "ALL"
+ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "0") == "1"
+ROLLUP_REFRESH_SECONDS = float(os.getenv("ROLLUP_REFRESH_SECONDS", "60"))
+ROLLUP_LOOKBACK_MINUTES = int(os.getenv("ROLLUP_LOOKBACK_MINUTES", "15"))
+ROLLUP_REBUILD_CHUNK_DAYS = int(os.getenv("ROLLUP_REBUILD_CHUNK_DAYS", "7"))
+
+# floor ke 5 menit (wall clock), sama dengan pandas dt.floor("5min")
+BUCKET_SQL = (
+    "(time_id - INTERVAL MOD(MINUTE(time_id), 5) MINUTE"
+    " - INTERVAL SECOND(time_id) SECOND"
+    " - INTERVAL MICROSECOND(time_id) MICROSECOND)"
+)
+
+
+# hourly buckets
+HOUR_BUCKET_SQL = (
+    "(time_id - INTERVAL MINUTE(time_id) MINUTE"
+    " - INTERVAL SECOND(time_id) SECOND"
+    " - INTERVAL MICROSECOND(time_id) MICROSECOND)"
+)
+
+
+def bucket_sql(minutes: int = 5):
+    """Bucket expression for 5-minute or hourly rollups; the SQLite stand-in gets the same floor as text."""
+    if shared_db.DB_BACKEND == "sqlite":
+        return (
+            "(strftime('%Y-%m-%d %H:', time_id)"
+            f" || printf('%02d:00', CAST(strftime('%M', time_id) AS INTEGER) / {minutes} * {minutes}))"
+        )
+    return BUCKET_SQL if minutes == 5 else HOUR_BUCKET_SQL
+
+
+def floor_5min(ts: datetime):
+    return ts.replace(minute=ts.minute - ts.minute % 5, second=0, microsecond=0)
+
+
+def create_rollup_tables():
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        for rollup in list(ROLLUP_TABLE_MAP.values()) + list(ROLLUP_HOURLY_TABLE_MAP.values()):
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS `{rollup}` (
+                    room_id   VARCHAR(16) NOT NULL,
+                    sensor_id VARCHAR(16) NOT NULL,
+                    bucket    DATETIME    NOT NULL,
+                    temp_avg  DOUBLE,
+                    temp_min  DOUBLE,
+                    temp_max  DOUBLE,
+                    hum_avg   DOUBLE,
+                    hum_min   DOUBLE,
+                    hum_max   DOUBLE,
+                    cnt       INT NOT NULL,
+                    PRIMARY KEY (room_id, sensor_id, bucket)
+                )
+            """)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _aggregate_sql(location: str, bounded: bool, minutes: int = 5):
+    table = TABLE_MAP[location]
+    rollup = (ROLLUP_TABLE_MAP if minutes == 5 else ROLLUP_HOURLY_TABLE_MAP)[location]
+    bucket = bucket_sql(minutes)
+    where = "time_id >= %s AND time_id < %s" if bounded else "time_id >= %s"
+    aggregates = """
+        AVG(temperature), MIN(temperature), MAX(temperature),
+        AVG(humidity), MIN(humidity), MAX(humidity),
+        COUNT(*)
+    """
+    upsert = """
+        ON DUPLICATE KEY UPDATE
+            temp_avg = VALUES(temp_avg), temp_min = VALUES(temp_min), temp_max = VALUES(temp_max),
+            hum_avg = VALUES(hum_avg), hum_min = VALUES(hum_min), hum_max = VALUES(hum_max),
+            cnt = VALUES(cnt)
+    """
+    columns = "(room_id, sensor_id, bucket, temp_avg, temp_min, temp_max, hum_avg, hum_min, hum_max, cnt)"
+    per_sensor = f"""
+        INSERT INTO `{rollup}` {columns}
+        SELECT room_id, sensor_id, {bucket} AS bucket, {aggregates}
+        FROM `{table}`
+        WHERE {where}
+        GROUP BY room_id, sensor_id, bucket
+        {upsert}
+    """
+    per_room = f"""
+        INSERT INTO `{rollup}` {columns}
+        SELECT room_id, '{ROLLUP_ALL}', {bucket} AS bucket, {aggregates}
+        FROM `{table}`
+        WHERE {where}
+        GROUP BY room_id, bucket
+        {upsert}
+    """
+    return per_sensor, per_room
+
+
+def _aggregate(cursor, location: str, start, end=None, minutes: int = 5):
+    for sql in _aggregate_sql(location, bounded=end is not None, minutes=minutes):
+        cursor.execute(sql, (start, end) if end is not None else (start,))
+
+
+def _latest_bucket(location: str):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT MAX(bucket) FROM `{ROLLUP_TABLE_MAP[location]}`")
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def refresh(location: str, since: datetime = None, dirty_since: datetime = None):
+    """
+    Aggregate raw rows from `since` (default: newest rollup bucket minus the lookback
+    window) up to now. `dirty_since` pulls the start further back when older rows were
+    ingested. Falls back to a full rebuild when the rollup table is empty.
+    Returns the bucket the refresh started from.
+    """
+    if since is None:
+        latest = _latest_bucket(location)
+        if latest is None:
+            rebuild(location)
+            return None
+        since = latest - timedelta(minutes=ROLLUP_LOOKBACK_MINUTES)
+    if dirty_since is not None and dirty_since < since:
+        since = dirty_since
+
+    since = floor_5min(since)
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        _aggregate(cursor, location, since)
+        conn.commit()
+        return since
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def rebuild(location: str, chunk_days: int = ROLLUP_REBUILD_CHUNK_DAYS):
+    """Backfill rollups for the whole raw history, in day-aligned chunks."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT MIN(time_id), MAX(time_id) FROM `{TABLE_MAP[location]}`")
+        first, last = cursor.fetchone()
+        if first is None:
+            return 0
+
+        start = first.replace(hour=0, minute=0, second=0, microsecond=0)
+        chunks = 0
+        while start <= last:
+            end = start + timedelta(days=chunk_days)
+            _aggregate(cursor, location, start, end)
+            conn.commit()
+            chunks += 1
+            logger.info(f"[{location}] rollup rebuilt {start:%Y-%m-%d} .. {end:%Y-%m-%d}")
+            start = end
+        return chunks
+    finally:
+        cursor.close()
+        conn.close()
+
+
+class RollupRefresher:
+    """Background thread that keeps the rollups current for every location."""
+
+    def __init__(self, interval: float = ROLLUP_REFRESH_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._dirty = {}  # location -> oldest time_id ingested since the last refresh
+        self._dirty_lock = threading.Lock()
+        self.last_refresh = {}
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="rollup-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def trigger(self):
+        """Refresh now instead of waiting for the next interval."""
+        self._wake.set()
+
+    def mark_dirty(self, location: str, since: datetime):
+        """New raw rows from `since` on: include them in the next refresh and run it now."""
+        with self._dirty_lock:
+            current = self._dirty.get(location)
+            self._dirty[location] = since if current is None else min(current, since)
+        self.trigger()
+
+    def refresh_all(self):
+        for location in ROLLUP_TABLE_MAP:
+            with self._dirty_lock:
+                dirty_since = self._dirty.pop(location, None)
+            t0 = time.time()
+            try:
+                refresh(location, dirty_since=dirty_since)
+                self.last_refresh[location] = {"at": t0, "duration": time.time() - t0, "error": None}
+            except Exception as e:
+                self.last_refresh[location] = {"at": t0, "duration": time.time() - t0, "error": str(e)}
+                logger.error("Rollup refresh failed for %s: %s\n%s", location, e, traceback.format_exc())
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh_all()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+REFRESHER = RollupRefresher()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain 5-minute sensor rollups")
+    parser.add_argument("--location", choices=sorted(ROLLUP_TABLE_MAP), help="default: all locations")
+    parser.add_argument("--create", action="store_true", help="create rollup tables")
+    parser.add_argument("--rebuild", action="store_true", help="backfill the whole raw history")
+    parser.add_argument("--refresh", action="store_true", help="aggregate rows since the last rollup")
+    args = parser.parse_args()
+
+    locations = [args.location] if args.location else list(ROLLUP_TABLE_MAP)
+    if args.create or args.rebuild:
+        create_rollup_tables()
+    for location in locations:
+        t0 = time.time()
+        if args.rebuild:
+            chunks = rebuild(location)
+            print(f"{location}: rebuilt {chunks} chunk(s) in {time.time() - t0:.1f}s")
+        elif args.refresh:
+            since = refresh(location)
+            print(f"{location}: refreshed from {since} in {time.time() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
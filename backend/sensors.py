@@ -0,0 +1,20 @@
+# tabel raw per lokasi dan sensor per room; dipisah dari main.py supaya tool
+# (benchmarks, CLI storage) bisa memakainya tanpa membangun aplikasi FastAPI
+TABLE_MAP = {
+    "kebalen": "server_kebalen",
+    "gayungan": "server_gayungan"
+}
+
+ROOM_MAP = {
+    "gayungan": {
+        "ROOM1": ["DHT1", "DHT2", "DHT3", "DHT4"],
+        "ROOM2": ["DHT5"],
+        "ROOM3": ["DHT6"],
+        "ROOM4": ["DHT7", "DHT8", "DHT9"],
+        "ROOM5": ["DHT10", "DHT11", "DHT12"]
+    },
+    "kebalen": {
+        "ROOM1": ["DHT1", "DHT2", "DHT3", "DHT4"],
+        "ROOM2": ["DHT5", "DHT6"]
+    }
+}
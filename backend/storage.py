@@ -0,0 +1,577 @@
+"""
+Storage management for the raw sensor tables (server_*) and saved forecasts (predictions_*).
+
+- monthly RANGE partitions on the time column (MySQL), kept STORAGE_PARTITIONS_AHEAD months ahead
+- raw rows older than STORAGE_RAW_RETENTION_DAYS are compacted into the 5-minute and hourly
+  rollups (backend/rollups.py) and then removed: whole partitions are dropped, or on an
+  unpartitioned table (and the SQLite stand-in) each compacted chunk is deleted in the same
+  transaction as its aggregates
+- 5-minute rollups and forecasts expire after their own retention; hourly rollups are kept
+
+    python -m backend.storage --dry-run              # report: sizes, expired rows, query time before/after
+    python -m backend.storage --dry-run --raw-days 7 --json report.json
+    python -m backend.storage --partition            # one-off: convert tables to monthly partitions (MySQL)
+    python -m backend.storage --run                  # compaction + retention + future partitions
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+import traceback
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from shared import db as shared_db
+from backend.db import get_connection
+from backend.rollups import (
+    TABLE_MAP, ROLLUP_TABLE_MAP, ROLLUP_HOURLY_TABLE_MAP, create_rollup_tables, _aggregate,
+)
+
+logger = logging.getLogger("uvicorn.error")
+
+PREDICTION_TABLE_MAP = {
+    "kebalen": "predictions_kebalen",
+    "gayungan": "predictions_gayungan"
+}
+
+# background job + routing of old /dashboard-history ranges to the rollups
+STORAGE_ENABLED = os.getenv("STORAGE_ENABLED", "0") == "1"
+STORAGE_RAW_RETENTION_DAYS = int(os.getenv("STORAGE_RAW_RETENTION_DAYS", "90"))
+# 0 = keep forever
+STORAGE_5MIN_RETENTION_DAYS = int(os.getenv("STORAGE_5MIN_RETENTION_DAYS", "365"))
+STORAGE_PREDICTION_RETENTION_DAYS = int(os.getenv("STORAGE_PREDICTION_RETENTION_DAYS", "90"))
+STORAGE_PARTITIONS_AHEAD = int(os.getenv("STORAGE_PARTITIONS_AHEAD", "3"))
+STORAGE_COMPACT_CHUNK_DAYS = int(os.getenv("STORAGE_COMPACT_CHUNK_DAYS", "7"))
+STORAGE_RUN_HOURS = float(os.getenv("STORAGE_RUN_HOURS", "24"))
+# repetitions per query in the dry-run timing (fastest run is reported)
+STORAGE_TIMING_REPEAT = int(os.getenv("STORAGE_TIMING_REPEAT", "3"))
+
+MAXVALUE_PARTITION = "pmax"
+
+
+def _day(ts: datetime):
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _month(ts: datetime):
+    return _day(ts).replace(day=1)
+
+
+def _next_month(ts: datetime):
+    return (ts.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def cutoffs(now: datetime = None, raw_days: int = STORAGE_RAW_RETENTION_DAYS,
+            rollup_days: int = STORAGE_5MIN_RETENTION_DAYS,
+            prediction_days: int = STORAGE_PREDICTION_RETENTION_DAYS):
+    """Day-aligned retention boundaries; rows strictly before them expire (None = keep)."""
+    today = _day(now or datetime.now())
+    return {
+        "raw": today - timedelta(days=raw_days),
+        "rollup_5min": today - timedelta(days=rollup_days) if rollup_days else None,
+        "predictions": today - timedelta(days=prediction_days) if prediction_days else None,
+    }
+
+
+def raw_cutoff(now: datetime = None):
+    """Oldest time_id still kept as raw rows while the retention policy is active."""
+    return cutoffs(now)["raw"] if STORAGE_ENABLED else None
+
+
+def managed_tables():
+    """(table, time column, kind, location) for every table with a retention policy."""
+    tables = []
+    for location in TABLE_MAP:
+        tables.append((TABLE_MAP[location], "time_id", "raw", location))
+        tables.append((PREDICTION_TABLE_MAP[location], "predicted_time", "predictions", location))
+    return tables
+
+
+def _is_mysql():
+    return shared_db.DB_BACKEND != "sqlite"
+
+
+def _scalar(cursor, sql, params=()):
+    cursor.execute(sql, params)
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+# ------------------------------
+# Partitions (MySQL)
+# ------------------------------
+def partitions(cursor, table: str):
+    """[(name, upper bound or None for MAXVALUE, estimated rows)]; empty when not partitioned."""
+    if not _is_mysql():
+        return []
+    cursor.execute(
+        """
+        SELECT partition_name, partition_description, table_rows
+        FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL
+        ORDER BY partition_ordinal_position
+        """,
+        (table,),
+    )
+    out = []
+    for name, description, rows in cursor.fetchall():
+        bound = None if description == "MAXVALUE" else datetime.fromisoformat(description.strip("'"))
+        out.append((name, bound, int(rows or 0)))
+    return out
+
+
+def _partition_defs(first: datetime, until: datetime):
+    defs, month = [], _month(first)
+    while month <= until:
+        upper = _next_month(month)
+        defs.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{upper:%Y-%m-%d}')")
+        month = upper
+    return defs
+
+
+def _key_migration(cursor, table: str, column: str):
+    """MySQL requires the partition column in every unique key, e.g. PRIMARY KEY (id) -> (id, time_id)."""
+    cursor.execute(
+        """
+        SELECT index_name, column_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND non_unique = 0
+        ORDER BY index_name, seq_in_index
+        """,
+        (table,),
+    )
+    keys = defaultdict(list)
+    for index, col in cursor.fetchall():
+        keys[index].append(col)
+
+    clauses = []
+    for index, cols in keys.items():
+        if column in cols:
+            continue
+        cols = ", ".join(cols + [column])
+        if index == "PRIMARY":
+            clauses.append(f"DROP PRIMARY KEY, ADD PRIMARY KEY ({cols})")
+        else:
+            clauses.append(f"DROP INDEX {index}, ADD UNIQUE INDEX {index} ({cols})")
+    return [f"ALTER TABLE `{table}` " + ", ".join(clauses)] if clauses else []
+
+
+def partition_sql(cursor, table: str, column: str, now: datetime = None):
+    """One-off conversion of an unpartitioned table to monthly partitions (plus MAXVALUE)."""
+    if not _is_mysql() or partitions(cursor, table):
+        return []
+    now = now or datetime.now()
+    first = _scalar(cursor, f"SELECT MIN({column}) FROM `{table}`") or now
+    until = _month(now)
+    for _ in range(STORAGE_PARTITIONS_AHEAD):
+        until = _next_month(until)
+    defs = _partition_defs(first, until) + [f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN (MAXVALUE)"]
+    return _key_migration(cursor, table, column) + [
+        f"ALTER TABLE `{table}` PARTITION BY RANGE COLUMNS({column}) ({', '.join(defs)})"
+    ]
+
+
+def future_partitions_sql(table: str, parts: list, now: datetime = None):
+    """Split MAXVALUE so there are partitions up to STORAGE_PARTITIONS_AHEAD months ahead."""
+    bounds = [bound for _, bound, _ in parts if bound is not None]
+    if not bounds or MAXVALUE_PARTITION not in [name for name, _, _ in parts]:
+        return []
+    until = _month(now or datetime.now())
+    for _ in range(STORAGE_PARTITIONS_AHEAD):
+        until = _next_month(until)
+    defs = _partition_defs(max(bounds), until)
+    if not defs:
+        return []
+    defs.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    return [f"ALTER TABLE `{table}` REORGANIZE PARTITION {MAXVALUE_PARTITION} INTO ({', '.join(defs)})"]
+
+
+def expired_partitions(parts: list, cutoff: datetime):
+    return [(name, rows) for name, bound, rows in parts if bound is not None and bound <= cutoff]
+
+
+# ------------------------------
+# Compaction / retention
+# ------------------------------
+def _compaction_start(cursor, location: str, cutoff: datetime):
+    """First hour that still has raw rows before the cutoff, skipping what is already compacted."""
+    first = _scalar(cursor, f"SELECT MIN(time_id) FROM `{TABLE_MAP[location]}` WHERE time_id < %s", (cutoff,))
+    if first is None:
+        return None
+    start = first.replace(minute=0, second=0, microsecond=0)
+    try:
+        compacted = _scalar(cursor, f"SELECT MAX(bucket) FROM `{ROLLUP_HOURLY_TABLE_MAP[location]}`")
+    except Exception:
+        compacted = None  # hourly table not created yet (dry run before the first run)
+    if compacted is not None and compacted > start:
+        # the last hourly bucket is recomputed, raw rows of that hour may still exist
+        start = min(compacted, cutoff)
+    return start
+
+
+def compact(location: str, cutoff: datetime, delete: bool = True, chunk_days: int = STORAGE_COMPACT_CHUNK_DAYS):
+    """
+    Write 5-minute and hourly rollups for raw rows before `cutoff`, in chunks. With `delete`
+    the raw rows of each chunk go in the same transaction (unpartitioned tables).
+    Returns {"chunks", "deleted_rows", "start"}.
+    """
+    table = TABLE_MAP[location]
+    conn = get_connection()
+    cursor = conn.cursor()
+    result = {"chunks": 0, "deleted_rows": 0, "start": None}
+    try:
+        start = _compaction_start(cursor, location, cutoff)
+        result["start"] = start
+        while start is not None and start < cutoff:
+            end = min(_day(start) + timedelta(days=chunk_days), cutoff)
+            _aggregate(cursor, location, start, end, minutes=5)
+            _aggregate(cursor, location, start, end, minutes=60)
+            if delete:
+                cursor.execute(f"DELETE FROM `{table}` WHERE time_id >= %s AND time_id < %s", (start, end))
+                result["deleted_rows"] += max(cursor.rowcount, 0)
+            conn.commit()
+            result["chunks"] += 1
+            logger.info(f"[{location}] compacted {start:%Y-%m-%d %H:%M} .. {end:%Y-%m-%d %H:%M}")
+            start = end
+        return result
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _retention_sql(table: str, column: str, cutoff: datetime, parts: list):
+    if parts:
+        expired = expired_partitions(parts, cutoff)
+        if not expired:
+            return []
+        return [(f"ALTER TABLE `{table}` DROP PARTITION {', '.join(name for name, _ in expired)}", ())]
+    return [(f"DELETE FROM `{table}` WHERE {column} < %s", (cutoff,))]
+
+
+def run_location(location: str, now: datetime = None, policy: dict = None):
+    """Compaction + retention + future partitions for one location. Returns a summary dict."""
+    now = now or datetime.now()
+    policy = policy or cutoffs(now)
+    raw, predictions = TABLE_MAP[location], PREDICTION_TABLE_MAP[location]
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        raw_parts = partitions(cursor, raw)
+        prediction_parts = partitions(cursor, predictions)
+    finally:
+        cursor.close()
+        conn.close()
+
+    summary = {"location": location, "raw_partitioned": bool(raw_parts)}
+    summary["compaction"] = compact(location, policy["raw"], delete=not raw_parts)
+
+    statements = []
+    for table, parts in ((raw, raw_parts), (predictions, prediction_parts)):
+        statements += [(sql, ()) for sql in future_partitions_sql(table, parts, now)]
+    if raw_parts:
+        statements += _retention_sql(raw, "time_id", policy["raw"], raw_parts)
+    if policy["rollup_5min"] is not None:
+        statements += _retention_sql(ROLLUP_TABLE_MAP[location], "bucket", policy["rollup_5min"], [])
+    if policy["predictions"] is not None:
+        statements += _retention_sql(predictions, "predicted_time", policy["predictions"], prediction_parts)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        executed = []
+        for sql, params in statements:
+            cursor.execute(sql, params)
+            conn.commit()
+            executed.append({"sql": sql, "rows": max(cursor.rowcount, 0)})
+        summary["statements"] = executed
+    finally:
+        cursor.close()
+        conn.close()
+    return summary
+
+
+def apply_partitioning(now: datetime = None, dry_run: bool = False):
+    """Convert every managed table to monthly partitions (MySQL). Returns the SQL."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    applied = []
+    try:
+        for table, column, _, _ in managed_tables():
+            for sql in partition_sql(cursor, table, column, now):
+                applied.append(sql)
+                if not dry_run:
+                    t0 = time.time()
+                    cursor.execute(sql)
+                    logger.info("%s: %s (%.1fs)", table, sql[:60], time.time() - t0)
+    finally:
+        cursor.close()
+        conn.close()
+    return applied
+
+
+# ------------------------------
+# Dry run
+# ------------------------------
+def _table_bytes(cursor, table: str):
+    if _is_mysql():
+        return _scalar(
+            cursor,
+            """
+            SELECT data_length + index_length FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name = %s
+            """,
+            (table,),
+        )
+    try:
+        return _scalar(
+            cursor,
+            "SELECT SUM(pgsize) FROM dbstat WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name = %s)",
+            (table,),
+        )
+    except Exception:
+        return None  # SQLite built without dbstat
+
+
+def _table_report(cursor, table: str, column: str, cutoff: datetime, now: datetime):
+    cursor.execute(f"SELECT COUNT(*), MIN({column}), MAX({column}) FROM `{table}`")
+    rows, oldest, newest = cursor.fetchone()
+    expired = _scalar(cursor, f"SELECT COUNT(*) FROM `{table}` WHERE {column} < %s", (cutoff,)) if cutoff else 0
+    size = _table_bytes(cursor, table)
+    parts = partitions(cursor, table)
+    # partitioned tables only shrink by whole partitions
+    removable = sum(n for _, n in expired_partitions(parts, cutoff)) if parts and cutoff else expired
+    bytes_saved = int(size * removable / rows) if size and rows else None
+    return {
+        "rows": rows,
+        "oldest": oldest.isoformat() if oldest else None,
+        "newest": newest.isoformat() if newest else None,
+        "cutoff": cutoff.isoformat() if cutoff else None,
+        "expired_rows": expired,
+        "removable_rows": removable,
+        "bytes": size,
+        "bytes_saved_est": bytes_saved,
+        "bytes_after_est": size - bytes_saved if bytes_saved is not None else size,
+        "partitioned": bool(parts),
+        "partitions": len(parts),
+        "expired_partitions": [name for name, _ in expired_partitions(parts, cutoff)] if cutoff else [],
+        "future_partitions_sql": future_partitions_sql(table, parts, now),
+        "partition_sql": [] if parts else partition_sql(cursor, table, column, now),
+    }
+
+
+def _time_query(cursor, sql, params):
+    best = None
+    for _ in range(max(STORAGE_TIMING_REPEAT, 1)):
+        t0 = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def _query_report(cursor, location: str, room_map: dict, cutoff: datetime, kept_fraction: float):
+    """
+    Representative reads against the whole table vs only rows after the cutoff, i.e. what the
+    same query costs once the expired rows are gone. Index-bounded queries are re-run with a
+    time_id >= cutoff bound; the full scan has no usable index for that bound, so its cost is
+    scaled by the fraction of rows kept (what partition pruning / deleting gives).
+    """
+    table = TABLE_MAP[location]
+    room, sensors = max(room_map[location].items(), key=lambda item: len(item[1]))
+    placeholders = ",".join(["%s"] * len(sensors))
+    queries = {
+        # /dashboard-data sensor=ALL without rollups: aggregates every row of the room's sensors
+        "dashboard_all": (
+            f"""
+            SELECT time_id, AVG(temperature), AVG(humidity) FROM `{table}`
+            WHERE sensor_id IN ({placeholders}) {{bound}}
+            GROUP BY time_id ORDER BY time_id DESC LIMIT 12
+            """,
+            tuple(sensors),
+        ),
+        "dashboard_sensor": (
+            f"SELECT time_id, temperature, humidity FROM `{table}` WHERE sensor_id = %s {{bound}} "
+            "ORDER BY time_id DESC LIMIT 12",
+            (sensors[0],),
+        ),
+        # export / ad-hoc reporting over the whole table
+        "full_scan": (f"SELECT COUNT(*), AVG(temperature) FROM `{table}`", ()),
+    }
+    report = {}
+    for name, (sql, params) in queries.items():
+        current = _time_query(cursor, sql.format(bound=""), params)
+        if "{bound}" in sql:
+            after, estimated = _time_query(cursor, sql.format(bound="AND time_id >= %s"), params + (cutoff,)), False
+        else:
+            after, estimated = current * kept_fraction, True
+        report[name] = {"room": room, "current_ms": round(current, 2), "after_ms": round(after, 2),
+                        "saved_ms": round(current - after, 2), "after_estimated": estimated}
+    return report
+
+
+def dry_run(room_map: dict, now: datetime = None, policy: dict = None, time_queries: bool = True):
+    """What a run would remove and how much smaller / faster the hot tables would be. Read-only."""
+    now = now or datetime.now()
+    policy = policy or cutoffs(now)
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        tables = {}
+        for table, column, kind, location in managed_tables():
+            cutoff = policy["raw"] if kind == "raw" else policy["predictions"]
+            tables[table] = dict(_table_report(cursor, table, column, cutoff, now), kind=kind, location=location)
+
+        compaction = {}
+        for location in TABLE_MAP:
+            report = tables[TABLE_MAP[location]]
+            start = _compaction_start(cursor, location, policy["raw"]) if report["expired_rows"] else None
+            hours = int((policy["raw"] - start).total_seconds() // 3600) if start else 0
+            series = sum(len(s) + 1 for s in room_map[location].values())  # sensors + the room 'ALL' row
+            compaction[location] = {
+                "from": start.isoformat() if start else None,
+                "to": policy["raw"].isoformat(),
+                "hourly_rows_est": hours * series,
+                "rollup_5min_rows_est": hours * 12 * series,
+            }
+
+        queries = {}
+        if time_queries:
+            for location in TABLE_MAP:
+                raw = tables[TABLE_MAP[location]]
+                kept = 1 - raw["removable_rows"] / raw["rows"] if raw["rows"] else 1.0
+                queries[location] = _query_report(cursor, location, room_map, policy["raw"], kept)
+    finally:
+        cursor.close()
+        conn.close()
+
+    sized = [t for t in tables.values() if t["bytes"] is not None]
+    return {
+        "generated_at": now.isoformat(timespec="seconds"),
+        "backend": shared_db.DB_BACKEND,
+        "policy": {
+            "raw_retention_days": (_day(now) - policy["raw"]).days,
+            "cutoffs": {k: v.isoformat() if v else None for k, v in policy.items()},
+        },
+        "tables": tables,
+        "compaction": compaction,
+        "queries": queries,
+        "totals": {
+            "bytes": sum(t["bytes"] for t in sized),
+            "bytes_saved_est": sum(t["bytes_saved_est"] or 0 for t in sized),
+            "removable_rows": sum(t["removable_rows"] for t in tables.values()),
+        },
+    }
+
+
+class StorageManager:
+    """Background thread running compaction + retention every STORAGE_RUN_HOURS."""
+
+    def __init__(self, interval: float = STORAGE_RUN_HOURS * 3600):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = {}
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="storage-manager", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def run_all(self):
+        create_rollup_tables()
+        for location in TABLE_MAP:
+            t0 = time.time()
+            try:
+                summary = run_location(location)
+                self.last_run[location] = dict(summary, at=t0, duration=time.time() - t0, error=None)
+            except Exception as e:
+                self.last_run[location] = {"at": t0, "duration": time.time() - t0, "error": str(e)}
+                logger.error("Storage run failed for %s: %s\n%s", location, e, traceback.format_exc())
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_all()
+            self._stop.wait(self.interval)
+
+    def stats(self):
+        return {
+            "enabled": STORAGE_ENABLED,
+            "cutoffs": {k: v.isoformat() if v else None for k, v in cutoffs().items()},
+            "last_run": self.last_run,
+        }
+
+
+STORAGE = StorageManager()
+
+
+def _print_report(report: dict):
+    print(f"backend {report['backend']}, cutoffs {report['policy']['cutoffs']}")
+    for table, t in report["tables"].items():
+        size = f"{t['bytes'] / 1e6:8.1f} MB" if t["bytes"] is not None else "       ? MB"
+        saved = f"{t['bytes_saved_est'] / 1e6:8.1f} MB" if t["bytes_saved_est"] is not None else "       ? MB"
+        print(f"  {table:22s} rows {t['rows']:>10}  expired {t['expired_rows']:>10}  removable {t['removable_rows']:>10}"
+              f"  size {size}  saved {saved}  partitions {t['partitions']}")
+    for location, c in report["compaction"].items():
+        print(f"  compact {location}: {c['from']} .. {c['to']}  ~{c['hourly_rows_est']} hourly,"
+              f" ~{c['rollup_5min_rows_est']} 5-minute rows")
+    for location, queries in report["queries"].items():
+        for name, q in queries.items():
+            print(f"  query {location}/{name:16s} {q['current_ms']:9.2f} ms -> {q['after_ms']:9.2f} ms")
+    totals = report["totals"]
+    print(f"total {totals['bytes'] / 1e6:.1f} MB, ~{totals['bytes_saved_est'] / 1e6:.1f} MB and "
+          f"{totals['removable_rows']} rows removable")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partitioning, compaction and retention of sensor/forecast tables")
+    parser.add_argument("--dry-run", action="store_true", help="report what a run would save, change nothing")
+    parser.add_argument("--partition", action="store_true", help="convert tables to monthly partitions (MySQL)")
+    parser.add_argument("--run", action="store_true", help="compact, expire and add future partitions")
+    parser.add_argument("--location", choices=sorted(TABLE_MAP), help="default: all locations (--run)")
+    parser.add_argument("--raw-days", type=int, default=STORAGE_RAW_RETENTION_DAYS)
+    parser.add_argument("--rollup-days", type=int, default=STORAGE_5MIN_RETENTION_DAYS, help="0 = keep")
+    parser.add_argument("--prediction-days", type=int, default=STORAGE_PREDICTION_RETENTION_DAYS, help="0 = keep")
+    parser.add_argument("--now", type=datetime.fromisoformat, help="reference time (default now)")
+    parser.add_argument("--no-timing", action="store_true", help="dry run without query timings")
+    parser.add_argument("--json", help="write the dry-run report here")
+    args = parser.parse_args()
+
+    now = args.now or datetime.now()
+    policy = cutoffs(now, args.raw_days, args.rollup_days, args.prediction_days)
+
+    if args.partition:
+        for sql in apply_partitioning(now, dry_run=args.dry_run):
+            print(sql + ";\n")
+        if not _is_mysql():
+            print("partitioning needs MySQL; the SQLite stand-in deletes compacted chunks instead")
+    elif args.dry_run:
+        from backend.sensors import ROOM_MAP
+        report = dry_run(ROOM_MAP, now, policy, time_queries=not args.no_timing)
+        _print_report(report)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+    elif args.run:
+        create_rollup_tables()
+        for location in [args.location] if args.location else list(TABLE_MAP):
+            t0 = time.time()
+            summary = run_location(location, now, policy)
+            c = summary["compaction"]
+            print(f"{location}: compacted {c['chunks']} chunk(s), deleted {c['deleted_rows']} raw rows, "
+                  f"{len(summary['statements'])} retention/partition statement(s) in {time.time() - t0:.1f}s")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Benchmark offline untuk jalur data & inferensi, memakai database SQLite sintetis.
+
+    python -m benchmarks.run                                  # semua, ukuran default
+    python -m benchmarks.run --days 1,7,30 --out results.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json          # cek regresi
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json     # simpan baseline baru
+
+Hasil berupa JSON: satu entri per (benchmark, parameter) dengan min/median/p95/mean
+dalam milidetik. Dengan --baseline, waktu minimum dibandingkan dengan baseline; rasio di atas
+threshold (default baseline["thresholds"]["default"]) dianggap regresi dan exit code 1.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+BENCHMARKS = ("get_sensor_data", "average_by_interval", "make_prediction", "save_predictions", "dashboard_data", "ingest")
+INGEST_BATCHES = (100, 1000)
+HORIZONS = (1, 3, 6, 12, 24)
+DEFAULT_THRESHOLD = 1.5
+# min lebih stabil dari median di mesin yang sibuk; median/p95 tetap dicatat
+COMPARE_METRIC = "min_ms"
+# selisih absolut di bawah ini dianggap noise, berapa pun rasionya
+DEFAULT_MIN_DELTA_MS = 2.0
+
+
+def measure(fn, repeat: int, warmup: int = 1):
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    times = np.asarray(times)
+    return {
+        "repeat": repeat,
+        "min_ms": float(times.min()),
+        "median_ms": float(np.median(times)),
+        "p95_ms": float(np.percentile(times, 95)),
+        "mean_ms": float(times.mean()),
+    }
+
+
+def result_key(entry):
+    params = ",".join(f"{k}={v}" for k, v in sorted(entry["params"].items()))
+    return f"{entry['name']}[{params}]"
+
+
+def run_size(days: float, selected, repeat: int, location: str, room: int, workdir: str):
+    from shared import db
+    from benchmarks.synthetic import build_database
+
+    path = os.path.join(workdir, f"bench_{days:g}d.sqlite3")
+    rows = build_database(path, days)
+    db.use_sqlite(path)
+
+    from ML_Services.services.preprocessing import get_sensor_data, average_by_interval
+    from ML_Services.services.prediction import make_prediction, save_predictions
+    from ML_Services.models_config import REGISTRY
+
+    results = []
+
+    def add(name, params, stats):
+        entry = {"name": name, "params": dict(params, days=days), **stats}
+        results.append(entry)
+        print(f"  {result_key(entry):60s} median {stats['median_ms']:9.2f} ms  p95 {stats['p95_ms']:9.2f} ms")
+
+    max_hours = min(max(HORIZONS), int(days * 24))
+    horizons = [h for h in HORIZONS if h <= max_hours]
+
+    if "get_sensor_data" in selected:
+        for hours in horizons:
+            add("get_sensor_data", {"location": location, "room": room, "hours": hours},
+                measure(lambda: get_sensor_data(location, room, hours), repeat))
+
+    raw_by_hours = {hours: get_sensor_data(location, room, hours) for hours in horizons}
+
+    if "average_by_interval" in selected:
+        for hours in horizons:
+            raw = raw_by_hours[hours]
+            add("average_by_interval", {"location": location, "room": room, "hours": hours},
+                measure(lambda: average_by_interval(raw), repeat))
+
+    seq_by_hours = {hours: average_by_interval(raw) for hours, raw in raw_by_hours.items()}
+
+    if "make_prediction" in selected:
+        models = REGISTRY.view(location)
+        for hours in horizons:
+            seq = seq_by_hours[hours]
+            add("make_prediction", {"location": location, "room": room, "hours": hours},
+                measure(lambda: make_prediction(seq, models, location, room, hours), max(3, repeat // 4)))
+
+    if "save_predictions" in selected:
+        start = datetime(2026, 2, 1)
+        for hours in horizons:
+            predictions = [
+                {"timestamp": (start + timedelta(minutes=5 * i)).isoformat(), "temperature": 24.0, "humidity": 58.0}
+                for i in range(hours * 12)
+            ]
+            add("save_predictions", {"location": location, "room": room, "rows": len(predictions)},
+                measure(lambda: save_predictions(location, room, predictions), repeat))
+
+    if "dashboard_data" in selected:
+        from fastapi.testclient import TestClient
+        import backend.main as backend_main
+
+        client = TestClient(backend_main.app)
+        room_name = f"ROOM{room}"
+        sensor = backend_main.ROOM_MAP[location][room_name][0]
+        for sensor_id in ("ALL", sensor):
+            for points in (12, 288):
+                url = f"/dashboard-data?location={location}&room={room_name}&sensor={sensor_id}&points={points}"
+
+                def uncached():
+                    backend_main.DASHBOARD_CACHE.invalidate()
+                    assert client.get(url).status_code == 200
+
+                def cached():
+                    assert client.get(url).status_code == 200
+
+                params = {"location": location, "room": room_name, "sensor": sensor_id, "points": points}
+                add("dashboard_data", dict(params, cache="miss"), measure(uncached, repeat))
+                add("dashboard_data", dict(params, cache="hit"), measure(cached, repeat))
+
+    if "ingest" in selected:
+        import backend.main as backend_main
+        from backend.ingest import Ingestor, NewDataBus, Reading
+
+        # bus tanpa subscriber: yang diukur validasi + dedup + INSERT
+        ingestor = Ingestor(backend_main.TABLE_MAP, backend_main.ROOM_MAP, bus=NewDataBus())
+        room_name = f"ROOM{room}"
+        sensors = backend_main.ROOM_MAP[location][room_name]
+        start = datetime(2026, 3, 1)
+        for batch in INGEST_BATCHES:
+            steps = -(-batch // len(sensors))
+            # timestamp baru untuk tiap panggilan (warmup + repeat), supaya tidak semua jadi duplikat
+            batches = iter([
+                [
+                    Reading(sensor_id=s, room_id=room_name, time_id=start + timedelta(minutes=5 * (n * steps + i)),
+                            temperature=24.0, humidity=58.0)
+                    for i in range(steps) for s in sensors
+                ][:batch]
+                for n in range(repeat + 1)
+            ])
+            start += timedelta(minutes=5 * steps * (repeat + 1))
+            stats = measure(lambda: ingestor.ingest(location, next(batches)), repeat)
+            stats["rows_per_sec"] = batch / (stats["median_ms"] / 1000)
+            add("ingest", {"location": location, "room": room_name, "rows": batch}, stats)
+            print(f"  {'':60s} {stats['rows_per_sec']:,.0f} rows/s")
+
+    return rows, results
+
+
+def compare(results, baseline):
+    """Return daftar regresi [(key, ratio, threshold)] terhadap baseline."""
+    thresholds = baseline.get("thresholds", {})
+    default = thresholds.get("default", DEFAULT_THRESHOLD)
+    min_delta = thresholds.get("min_delta_ms", DEFAULT_MIN_DELTA_MS)
+    base = baseline.get("results", {})
+    regressions = []
+    for entry in results:
+        key = result_key(entry)
+        ref = base.get(key)
+        if not ref or not ref.get(COMPARE_METRIC):
+            continue
+        ratio = entry[COMPARE_METRIC] / ref[COMPARE_METRIC]
+        entry["baseline_" + COMPARE_METRIC] = ref[COMPARE_METRIC]
+        entry["ratio"] = ratio
+        limit = thresholds.get(entry["name"], default)
+        if ratio > limit and entry[COMPARE_METRIC] - ref[COMPARE_METRIC] > min_delta:
+            regressions.append((key, ratio, limit))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks on a synthetic SQLite database")
+    parser.add_argument("--days", default="1,7", help="comma separated history sizes in days")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="comma separated benchmark names")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--location", default="gayungan")
+    parser.add_argument("--room", type=int, default=1)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help=f"compare {COMPARE_METRIC} with this baseline JSON")
+    parser.add_argument("--save-baseline", help="write the results as a new baseline JSON")
+    parser.add_argument("--threshold", type=float, help="override the default regression ratio")
+    args = parser.parse_args()
+
+    # forecast/response cache dan model preload tidak relevan untuk benchmark per fungsi
+    os.environ.setdefault("FORECAST_CACHE_ENABLED", "0")
+    os.environ.setdefault("MODEL_PRELOAD", "0")
+
+    selected = set(args.only.split(","))
+    unknown = selected - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {sorted(unknown)}")
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "forecast_engine": os.getenv("FORECAST_ENGINE", "fused"),
+        },
+        "sizes": {},
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="sensor-bench-") as workdir:
+        for days in [float(d) for d in args.days.split(",")]:
+            print(f"== {days:g} day(s) of history")
+            rows, results = run_size(days, selected, args.repeat, args.location, args.room, workdir)
+            report["sizes"][f"{days:g}"] = rows
+            report["results"].extend(results)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if args.threshold:
+            baseline.setdefault("thresholds", {})["default"] = args.threshold
+        regressions = compare(report["results"], baseline)
+        report["regressions"] = [{"key": k, "ratio": r, "threshold": t} for k, r, t in regressions]
+        for key, ratio, limit in regressions:
+            print(f"REGRESSION {key}: {ratio:.2f}x baseline (threshold {limit:.2f}x)")
+        status = 1 if regressions else 0
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {
+            "meta": report["meta"],
+            "thresholds": {
+                "default": args.threshold or DEFAULT_THRESHOLD,
+                "min_delta_ms": DEFAULT_MIN_DELTA_MS,
+                # SQLite commit dan TF lebih berisik dari query baca
+                "make_prediction": 2.0,
+                "save_predictions": 2.0,
+                "ingest": 2.0,
+            },
+            "results": {
+                result_key(e): {"min_ms": e["min_ms"], "median_ms": e["median_ms"], "p95_ms": e["p95_ms"]}
+                for e in report["results"]
+            },
+        }
+        with open(args.save_baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.save_baseline}")
+
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark cold start ML_Services: tiap mode dijalankan di proses Python baru.
+
+    python -m benchmarks.startup                       # semua mode, 3x per mode
+    python -m benchmarks.startup --modes numpy-bundle --repeat 5 --out startup.json
+
+Mode numpy-bundle butuh bundle: python -m ML_Services.services.model_bundle --build
+
+Per run dicatat: import ML_Services.main, load semua model + scaler, forecast pertama,
+total (termasuk start interpreter), max RSS, dan library berat yang ikut ter-import.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+# mode -> env untuk proses anak
+MODES = {
+    "keras-h5": {"FORECAST_ENGINE": "fused", "MODEL_BUNDLE": "0"},
+    "numpy-h5": {"FORECAST_ENGINE": "numpy", "MODEL_BUNDLE": "0"},
+    "numpy-bundle": {"FORECAST_ENGINE": "numpy", "MODEL_BUNDLE": "1"},
+}
+HEAVY_MODULES = ("tensorflow", "keras", "sklearn", "h5py", "joblib", "pandas")
+STAGES = ("import_s", "load_s", "first_forecast_s", "total_s")
+
+
+def child(location: str):
+    """Dijalankan di proses anak; print satu baris JSON."""
+    t0 = time.perf_counter()
+    from ML_Services.models_config import REGISTRY
+    from ML_Services.services.prediction import FORECAST_ENGINE, make_predictions_batch
+    from ML_Services.services.resample import resample
+    import ML_Services.main  # noqa: F401
+    t1 = time.perf_counter()
+
+    backend = "numpy" if FORECAST_ENGINE == "numpy" else "keras"
+    REGISTRY.preload(location, backend=backend)
+    t2 = time.perf_counter()
+
+    rooms = sorted(REGISTRY.paths[location][0]["temperature"])
+    ts = np.arange(24).astype("timedelta64[m]") * 5 + np.datetime64("2026-01-01T00:00", "ns")
+    seqs = {room: resample(ts, np.full(24, 24.0), np.full(24, 58.0)) for room in rooms}
+    make_predictions_batch(seqs, REGISTRY.view(location, backend), location, 1)
+    t3 = time.perf_counter()
+
+    import resource
+    print(json.dumps({
+        "import_s": t1 - t0,
+        "load_s": t2 - t1,
+        "first_forecast_s": t3 - t2,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "sources": sorted({m.get("source") for m in REGISTRY.status()["models"] if m.get("source")}),
+        "heavy_imports": [m for m in HEAVY_MODULES if m in sys.modules],
+    }))
+
+
+def run_mode(mode: str, location: str):
+    env = dict(os.environ, MODEL_PRELOAD="0", FORECAST_CACHE_ENABLED="0", **MODES[mode])
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", "--location", location],
+        env=env, capture_output=True, text=True,
+    )
+    total = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mode} failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["total_s"] = total
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark of the ML service")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma separated: " + ", ".join(MODES))
+    parser.add_argument("--location", default="gayungan")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.location)
+        return
+
+    modes = args.modes.split(",")
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown mode(s): {sorted(unknown)}")
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "location": args.location,
+        },
+        "results": {},
+    }
+    for mode in modes:
+        runs = [run_mode(mode, args.location) for _ in range(args.repeat)]
+        summary = {stage: float(np.median([r[stage] for r in runs])) for stage in STAGES}
+        summary.update({
+            "max_rss_mb": float(np.median([r["max_rss_mb"] for r in runs])),
+            "sources": runs[-1]["sources"],
+            "heavy_imports": runs[-1]["heavy_imports"],
+            "repeat": args.repeat,
+        })
+        report["results"][mode] = summary
+        print(
+            f"{mode:14s} import {summary['import_s']:6.2f}s  load {summary['load_s']:6.2f}s  "
+            f"first forecast {summary['first_forecast_s']:6.2f}s  total {summary['total_s']:6.2f}s  "
+            f"rss {summary['max_rss_mb']:6.0f} MB  heavy={','.join(summary['heavy_imports']) or '-'}"
+        )
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Data sensor sintetis dengan topologi asli (lokasi, room, jumlah DHT per room,
+interval 5 menit), dimuat ke file SQLite sebagai pengganti MySQL.
+
+    python -m benchmarks.synthetic --days 7 --out /tmp/sensor_7d.sqlite3
+"""
+import os
+import math
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+
+from backend.sensors import ROOM_MAP, TABLE_MAP
+from ML_Services.services.preprocessing import PREDICTION_TABLE_MAP
+
+INTERVAL_MINUTES = 5
+DEFAULT_END = datetime(2026, 1, 31)
+
+
+def create_schema(conn):
+    for location, table in TABLE_MAP.items():
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                sensor_id   VARCHAR(16) NOT NULL,
+                room_id     VARCHAR(16) NOT NULL,
+                time_id     DATETIME    NOT NULL,
+                temperature DOUBLE,
+                humidity    DOUBLE
+            )
+        """)
+        # sama dengan SENSOR_INDEXES di ML_Services/services/schema.py
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_room_time_{location} ON {table} (room_id, time_id)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_sensor_time_{location} ON {table} (sensor_id, time_id)")
+
+    for table in PREDICTION_TABLE_MAP.values():
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                room            VARCHAR(16) NOT NULL,
+                predicted_temp  DOUBLE,
+                predicted_humid DOUBLE,
+                predicted_time  DATETIME NOT NULL,
+                created_at      DATETIME,
+                UNIQUE (room, predicted_time)
+            )
+        """)
+
+
+def generate_rows(location: str, days: float, end: datetime = DEFAULT_END, seed: int = 0):
+    """Yield (sensor_id, room_id, time_id, temperature, humidity), pola harian + noise."""
+    rng = random.Random(f"{seed}:{location}")
+    steps = int(days * 24 * 60 / INTERVAL_MINUTES)
+    start = end - timedelta(minutes=INTERVAL_MINUTES * steps)
+    offsets = {
+        sensor: (rng.uniform(-1.5, 1.5), rng.uniform(-4, 4))
+        for sensors in ROOM_MAP[location].values() for sensor in sensors
+    }
+    for i in range(steps):
+        ts = start + timedelta(minutes=INTERVAL_MINUTES * i)
+        daily = math.sin(2 * math.pi * (ts.hour * 60 + ts.minute) / 1440)
+        for room, sensors in ROOM_MAP[location].items():
+            for sensor in sensors:
+                dt, dh = offsets[sensor]
+                yield (
+                    sensor,
+                    room,
+                    ts,
+                    round(24.0 + 2.5 * daily + dt + rng.gauss(0, 0.3), 2),
+                    round(58.0 - 6.0 * daily + dh + rng.gauss(0, 1.0), 2),
+                )
+
+
+def build_database(path: str, days: float, end: datetime = DEFAULT_END, seed: int = 0):
+    """Buat ulang file SQLite berisi `days` hari data untuk semua lokasi. Return jumlah baris."""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        create_schema(conn)
+        total = 0
+        for location, table in TABLE_MAP.items():
+            rows = [
+                (s, r, t.isoformat(" "), temp, hum)
+                for s, r, t, temp, hum in generate_rows(location, days, end, seed)
+            ]
+            conn.executemany(
+                f"INSERT INTO {table} (sensor_id, room_id, time_id, temperature, humidity) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            total += len(rows)
+        conn.commit()
+        return total
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic sensor database (SQLite)")
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--out", default="sensor_synthetic.sqlite3")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rows = build_database(args.out, args.days, seed=args.seed)
+    print(f"{args.out}: {rows} rows ({args.days:g} days)")
+
+
+if __name__ == "__main__":
+    main()
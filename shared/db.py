@@ -0,0 +1,400 @@
+"""
+Akses DB bersama untuk backend dan ML_Services.
+
+- pool koneksi sendiri: ukuran, overflow, acquire timeout dan recycle bisa diatur lewat env
+- koneksi dibuat saat pertama dipakai (bukan saat import)
+- setiap query dan waktu tunggu pool dicatat, lihat stats()
+- jalur async (fetchall / fetchone / run) untuk handler FastAPI
+- DB_BACKEND=sqlite memakai file SQLite sebagai pengganti MySQL untuk load test lokal
+"""
+import os
+import re
+import time
+import queue
+import asyncio
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from shared.metrics import DB_POOL_WAIT, DB_QUERY, track_executor
+
+logger = logging.getLogger("uvicorn.error")
+
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql")  # mysql | sqlite
+
+dbconfig = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", ""),
+    "database": os.getenv("DB_NAME", "intern_telkomsel")
+}
+
+DB_SQLITE_PATH = os.getenv("DB_SQLITE_PATH", "sensor_api.sqlite3")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+# koneksi tambahan saat pool penuh; ditutup lagi begitu dikembalikan
+DB_POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", "5"))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "10"))
+# koneksi yang lebih tua dari ini dibuka ulang (hindari wait_timeout MySQL)
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "3600"))
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+DB_QUERY_STATS_MAX = 200
+
+
+class PoolTimeout(RuntimeError):
+    """Tidak ada koneksi yang bisa dipakai dalam DB_ACQUIRE_TIMEOUT detik."""
+
+
+# ---------------- Statistik ----------------
+
+_stats_lock = threading.Lock()
+_pool_stats = {"acquired": 0, "timeouts": 0, "created": 0, "recycled": 0, "overflow_opened": 0,
+               "wait_total": 0.0, "wait_max": 0.0}
+_query_stats = {}
+
+
+def _query_key(sql: str):
+    return " ".join(sql.split())[:80]
+
+
+def _record_query(sql: str, elapsed: float, error: bool):
+    DB_QUERY.labels(sql.lstrip()[:6].upper()).observe(elapsed)
+    key = _query_key(sql)
+    with _stats_lock:
+        st = _query_stats.get(key)
+        if st is None:
+            if len(_query_stats) >= DB_QUERY_STATS_MAX:
+                key = "<other>"
+                st = _query_stats.setdefault(key, {"count": 0, "errors": 0, "total": 0.0, "max": 0.0})
+            else:
+                st = _query_stats[key] = {"count": 0, "errors": 0, "total": 0.0, "max": 0.0}
+        st["count"] += 1
+        st["errors"] += int(error)
+        st["total"] += elapsed
+        st["max"] = max(st["max"], elapsed)
+    if elapsed * 1000 > DB_SLOW_QUERY_MS:
+        logger.warning("Slow query (%.0f ms): %s", elapsed * 1000, key)
+
+
+def _record_wait(wait: float, timed_out: bool = False):
+    DB_POOL_WAIT.observe(wait)
+    with _stats_lock:
+        if timed_out:
+            _pool_stats["timeouts"] += 1
+            return
+        _pool_stats["acquired"] += 1
+        _pool_stats["wait_total"] += wait
+        _pool_stats["wait_max"] = max(_pool_stats["wait_max"], wait)
+
+
+def _count(name: str):
+    with _stats_lock:
+        _pool_stats[name] += 1
+
+
+# ---------------- SQLite stand-in ----------------
+
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+
+_DATETIME_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d+)?$")
+# "<expr> - INTERVAL %s HOUR" -> datetime(<expr>, '-N hours')
+_INTERVAL_RE = re.compile(r"(\((?:[^()]|\([^()]*\))*\)|[\w.]+)\s*-\s*INTERVAL\s+%s\s+HOUR", re.IGNORECASE)
+_UPSERT_RE = re.compile(r"ON DUPLICATE KEY UPDATE(.*)$", re.IGNORECASE | re.DOTALL)
+
+
+def _sqlite_sql(sql: str):
+    """Terjemahan minimal dialek MySQL yang dipakai service ini ke SQLite."""
+    sql = _INTERVAL_RE.sub(r"datetime(\1, '-' || %s || ' hours')", sql)
+    match = _UPSERT_RE.search(sql)
+    if match:
+        updates = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", match.group(1))
+        sql = sql[:match.start()] + "ON CONFLICT DO UPDATE SET" + updates
+    return sql.replace("%s", "?")
+
+
+def _sqlite_value(v):
+    if isinstance(v, str) and _DATETIME_RE.match(v):
+        return datetime.fromisoformat(v)
+    return v
+
+
+class _SQLiteCursor:
+    """Meniru cursor mysql-connector: placeholder %s, dictionary=True, datetime."""
+
+    def __init__(self, conn, dictionary=False):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(_sqlite_sql(sql), tuple(params or ()))
+
+    def executemany(self, sql, seq):
+        self._cursor.executemany(_sqlite_sql(sql), [tuple(p) for p in seq])
+
+    def _convert(self, row):
+        row = tuple(_sqlite_value(v) for v in row)
+        if self._dictionary:
+            return dict(zip([d[0] for d in self._cursor.description], row))
+        return row
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return None if row is None else self._convert(row)
+
+    def fetchall(self):
+        return [self._convert(r) for r in self._cursor.fetchall()]
+
+    def fetchmany(self, size=1):
+        return [self._convert(r) for r in self._cursor.fetchmany(size)]
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class _SQLiteConnection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=DB_ACQUIRE_TIMEOUT)
+
+    def cursor(self, dictionary=False, **kwargs):
+        return _SQLiteCursor(self._conn, dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def is_connected(self):
+        return True
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def close(self):
+        self._conn.close()
+
+
+def _connect():
+    if DB_BACKEND == "sqlite":
+        return _SQLiteConnection(DB_SQLITE_PATH)
+    import mysql.connector
+    return mysql.connector.connect(**dbconfig)
+
+
+# ---------------- Pool ----------------
+
+class _TimedCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        t0 = time.perf_counter()
+        error = True
+        try:
+            result = self._cursor.execute(sql, params)
+            error = False
+            return result
+        finally:
+            _record_query(sql, time.perf_counter() - t0, error)
+
+    def executemany(self, sql, seq):
+        t0 = time.perf_counter()
+        error = True
+        try:
+            result = self._cursor.executemany(sql, seq)
+            error = False
+            return result
+        finally:
+            _record_query(sql, time.perf_counter() - t0, error)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class PooledConnection:
+    """Dipakai seperti koneksi biasa; close() mengembalikan koneksi ke pool."""
+
+    def __init__(self, pool, raw, created_at, overflow):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._overflow = overflow
+
+    def cursor(self, *args, **kwargs):
+        return _TimedCursor(self._raw.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw, self._created_at, self._overflow)
+
+
+class ConnectionPool:
+    def __init__(self, size=DB_POOL_SIZE, overflow=DB_POOL_OVERFLOW,
+                 timeout=DB_ACQUIRE_TIMEOUT, recycle=DB_POOL_RECYCLE, connect=_connect):
+        self.size = size
+        self.overflow = overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size + overflow)
+        self._lock = threading.Lock()
+        self._open = 0
+        self._in_use = 0
+
+    def get_connection(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        t0 = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            _record_wait(time.perf_counter() - t0, timed_out=True)
+            raise PoolTimeout(f"no DB connection available after {timeout:.1f}s")
+        try:
+            raw, created_at, overflow = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        _record_wait(time.perf_counter() - t0)
+        return PooledConnection(self, raw, created_at, overflow)
+
+    def _checkout(self):
+        while True:
+            try:
+                raw, created_at = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if time.monotonic() - created_at > self.recycle or not self._alive(raw):
+                self._discard(raw)
+                _count("recycled")
+                continue
+            with self._lock:
+                self._in_use += 1
+            return raw, created_at, False
+
+        raw = self._connect()
+        _count("created")
+        with self._lock:
+            self._open += 1
+            self._in_use += 1
+            overflow = self._open > self.size
+        if overflow:
+            _count("overflow_opened")
+        return raw, time.monotonic(), overflow
+
+    @staticmethod
+    def _alive(raw):
+        try:
+            return raw.is_connected()
+        except Exception:
+            return False
+
+    def _discard(self, raw):
+        with self._lock:
+            self._open -= 1
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _release(self, raw, created_at, overflow):
+        try:
+            # transaksi yang belum di-commit tidak boleh terbawa ke pemakai berikutnya
+            if getattr(raw, "in_transaction", True):
+                raw.rollback()
+        except Exception:
+            overflow = True
+        with self._lock:
+            self._in_use -= 1
+        if overflow:
+            self._discard(raw)
+        else:
+            self._idle.put((raw, created_at))
+        self._slots.release()
+
+    def status(self):
+        with self._lock:
+            return {
+                "backend": DB_BACKEND,
+                "size": self.size,
+                "overflow": self.overflow,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+            }
+
+
+POOL = ConnectionPool()
+
+
+def get_connection():
+    return POOL.get_connection()
+
+
+def connect_unpooled():
+    """Koneksi di luar pool untuk baca panjang (export), supaya tidak menahan slot pool."""
+    return _connect()
+
+
+def use_sqlite(path: str):
+    """Pindahkan semua query ke file SQLite (benchmark / load test), pool lama dibuang."""
+    global DB_BACKEND, DB_SQLITE_PATH, POOL
+    DB_BACKEND = "sqlite"
+    DB_SQLITE_PATH = path
+    POOL = ConnectionPool()
+
+
+# ---------------- Async ----------------
+
+# satu thread per slot pool: query async antre di event loop, bukan di threadpool Starlette
+_EXECUTOR = ThreadPoolExecutor(max_workers=DB_POOL_SIZE + DB_POOL_OVERFLOW, thread_name_prefix="db")
+track_executor("db", _EXECUTOR)
+
+
+async def run(fn, *args):
+    """Jalankan fungsi blocking yang memakai DB di thread DB, dari handler async."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_EXECUTOR, fn, *args)
+
+
+def _fetch(sql, params, dictionary, one):
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=dictionary)
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchone() if one else cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+async def fetchall(sql, params=(), dictionary=False):
+    return await run(_fetch, sql, params, dictionary, False)
+
+
+async def fetchone(sql, params=(), dictionary=False):
+    return await run(_fetch, sql, params, dictionary, True)
+
+
+def stats():
+    with _stats_lock:
+        pool = dict(_pool_stats)
+        queries = {k: dict(v, avg=v["total"] / v["count"]) for k, v in _query_stats.items() if v["count"]}
+    pool["wait_avg"] = pool["wait_total"] / pool["acquired"] if pool["acquired"] else 0.0
+    return {"pool": dict(POOL.status(), **pool), "queries": queries}
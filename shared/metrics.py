@@ -0,0 +1,162 @@
+"""
+Metrik Prometheus untuk backend dan ML_Services (endpoint /metrics).
+
+Di hot path hanya ada Histogram.observe / Counter.inc; nilai yang mahal dihitung
+(queue executor, pool DB, model resident) dibaca lewat callback saat /metrics di-scrape.
+"""
+import time
+
+from prometheus_client import Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.responses import Response
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status", ["app", "method", "route", "status"]
+)
+HTTP_ERRORS = Counter(
+    "http_request_errors_total", "HTTP requests that ended in 5xx or an exception", ["app", "route"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["app", "route"], buckets=LATENCY_BUCKETS
+)
+STAGE_LATENCY = Histogram(
+    "pipeline_stage_seconds", "Latency per pipeline stage", ["app", "stage", "location", "room"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_WAIT = Histogram("db_pool_wait_seconds", "Time spent waiting for a pooled DB connection", buckets=WAIT_BUCKETS)
+DB_QUERY = Histogram("db_query_seconds", "DB query latency by statement type", ["kind"], buckets=LATENCY_BUCKETS)
+MODEL_LOAD = Histogram(
+    "model_load_seconds", "Model + scaler load time", ["location", "sensor", "backend"], buckets=LATENCY_BUCKETS
+)
+SCHEDULER_LAG = Histogram(
+    "scheduler_lag_seconds", "Delay between a room's scheduled forecast time and its start", ["location", "room"],
+    buckets=LATENCY_BUCKETS,
+)
+SCHEDULER_RUN = Histogram(
+    "scheduler_run_seconds", "Duration of one scheduled forecast run", ["location", "room", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+PREDICTION_WRITER_FLUSH = Histogram(
+    "prediction_writer_flush_seconds", "Write-behind flush latency (one multi-row upsert per location)",
+    buckets=LATENCY_BUCKETS,
+)
+PREDICTION_WRITER_BATCH = Histogram(
+    "prediction_writer_batch_rows", "Prediction rows written per write-behind flush",
+    buckets=(1, 50, 100, 288, 500, 1000, 2000, 5000, 10000),
+)
+
+
+def observe_stages(app: str, location: str, room, profiling: dict, stages):
+    """Catat durasi stage yang ada di dict profiling pipeline (nilai float detik)."""
+    room = str(room)
+    for stage in stages:
+        value = profiling.get(stage)
+        if isinstance(value, float):
+            STAGE_LATENCY.labels(app, stage, location, room).observe(value)
+
+
+class _CallbackCollector:
+    """Gauge / counter yang nilainya diambil dari callback saat scrape."""
+
+    def __init__(self):
+        self._gauges = []
+
+    def add(self, name, documentation, fn, labels=(), family=GaugeMetricFamily):
+        self._gauges.append((name, documentation, fn, tuple(labels), family))
+
+    def collect(self):
+        for name, documentation, fn, labels, family_cls in self._gauges:
+            family = family_cls(name, documentation, labels=labels or None)
+            try:
+                value = fn()
+            except Exception:
+                continue
+            if labels:
+                for label_values, v in value.items():
+                    family.add_metric([str(x) for x in label_values], v)
+            else:
+                family.add_metric([], value)
+            yield family
+
+
+GAUGES = _CallbackCollector()
+REGISTRY.register(GAUGES)
+
+
+def gauge(name: str, documentation: str, fn, labels=()):
+    """fn() -> angka, atau {(label, ...): angka} kalau labels diisi."""
+    GAUGES.add(name, documentation, fn, labels)
+
+
+def counter(name: str, documentation: str, fn, labels=()):
+    """Seperti gauge(), untuk nilai yang hanya naik (diekspor sebagai <name>_total, bisa di-rate())."""
+    GAUGES.add(name, documentation, fn, labels, family=CounterMetricFamily)
+
+
+_EXECUTORS = {}
+
+
+def track_executor(name: str, executor):
+    """Laporkan jumlah task yang antre di ThreadPoolExecutor sebagai executor_queue_depth."""
+    _EXECUTORS[name] = executor
+
+
+gauge(
+    "executor_queue_depth", "Tasks waiting for a thread in each executor",
+    lambda: {(name, ): ex._work_queue.qsize() for name, ex in _EXECUTORS.items()},
+    labels=("executor",),
+)
+
+
+def _pool_gauges():
+    from shared import db
+    if getattr(_pool_gauges, "registered", False):
+        return
+    _pool_gauges.registered = True
+    gauge("db_pool_in_use", "Checked-out DB connections", lambda: db.POOL.status()["in_use"])
+    gauge("db_pool_open", "Open DB connections (idle + in use)", lambda: db.POOL.status()["open"])
+    gauge("db_pool_capacity", "Pool size + overflow", lambda: db.POOL.size + db.POOL.overflow)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: jumlah request, error dan latency per route template."""
+
+    def __init__(self, app, name: str):
+        self.app = app
+        self.name = name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            if path != "/metrics":
+                HTTP_LATENCY.labels(self.name, path).observe(time.perf_counter() - t0)
+                HTTP_REQUESTS.labels(self.name, scope["method"], path, str(status[0])).inc()
+                if status[0] >= 500:
+                    HTTP_ERRORS.labels(self.name, path).inc()
+
+
+def instrument(app, name: str):
+    """Pasang middleware dan endpoint /metrics pada aplikasi FastAPI."""
+    app.add_middleware(MetricsMiddleware, name=name)
+    _pool_gauges()
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
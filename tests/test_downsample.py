@@ -0,0 +1,25 @@
+"""Downsampling /dashboard-history (backend/downsample.py)."""
+import numpy as np
+
+from backend.downsample import minmax
+
+
+def test_minmax_ignores_nan_runs():
+    y = np.sin(np.arange(1000) / 10.0)
+    y[300:420] = np.nan  # sensor mati: beberapa bucket seluruhnya NaN
+    y[500] = np.nan
+
+    picked = minmax(y, 100)
+
+    assert picked.max() < len(y)
+    assert picked[0] == 0 and picked[-1] == len(y) - 1
+    assert not np.isnan(y[picked[1:-1]]).any()
+
+
+def test_minmax_keeps_bucket_extremes():
+    y = np.zeros(1000)
+    y[123], y[456] = -5.0, 7.0
+
+    picked = minmax(y, 100)
+
+    assert {123, 456} <= set(picked.tolist())
@@ -0,0 +1,43 @@
+"""Forecast cache (ML_Services/services/forecast_cache.py): prefix serving dan invalidasi versi."""
+from datetime import datetime, timedelta
+
+from ML_Services.services.forecast_cache import ForecastCache
+
+START = datetime(2026, 1, 31, 0, 5)
+VERSION = datetime(2026, 1, 31)
+
+
+def _result(steps):
+    return {
+        "room": 1,
+        "predictions": [
+            {"timestamp": (START + timedelta(minutes=5 * i)).isoformat(), "temperature": 24.0 + i, "humidity": 60.0}
+            for i in range(steps)
+        ],
+    }
+
+
+def test_shorter_duration_is_served_as_prefix():
+    cache = ForecastCache()
+    cache.put("gayungan", 1, VERSION, _result(24 * 12))
+
+    hit = cache.get("gayungan", 1, 3, VERSION, START.isoformat())
+
+    assert hit == {"room": 1, "predictions": _result(24 * 12)["predictions"][:36]}
+
+
+def test_longer_duration_or_new_data_misses():
+    cache = ForecastCache()
+    cache.put("gayungan", 1, VERSION, _result(12))
+
+    assert cache.get("gayungan", 1, 2, VERSION, START.isoformat()) is None
+    assert cache.get("gayungan", 1, 1, VERSION + timedelta(minutes=5), START.isoformat()) is None
+    assert cache.get("gayungan", 1, 1, VERSION, START.isoformat()) is not None
+
+
+def test_short_forecast_does_not_replace_longer_entry():
+    cache = ForecastCache()
+    cache.put("gayungan", 1, VERSION, _result(24 * 12))
+    cache.put("gayungan", 1, VERSION, _result(12))
+
+    assert cache.get("gayungan", 1, 24, VERSION, START.isoformat()) is not None
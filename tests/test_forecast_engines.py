@@ -0,0 +1,63 @@
+"""
+Engine forecast (ML_Services/services/prediction.py) terhadap model yang di-commit:
+fused harus identik dengan loop model.predict lama, engine numpy sama dengan Keras
+sampai error pembulatan float32.
+
+    python -m pytest -q tests/test_forecast_engines.py
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from ML_Services.models_config import REGISTRY  # noqa: E402
+from ML_Services.services.prediction import _rollout_rooms  # noqa: E402
+
+STEPS = 12
+CASES = [("gayungan", (1, 2)), ("kebalen", (1, 2))]
+
+
+def _series(rooms, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(48)
+    return {
+        room: (
+            (24 + np.sin(t / 6) + rng.normal(0, 0.2, t.size)).astype(np.float32),
+            (60 + 3 * np.cos(t / 8) + rng.normal(0, 0.5, t.size)).astype(np.float32),
+        )
+        for room in rooms
+    }
+
+
+def _rollout(location, rooms, engine, steps=STEPS):
+    out, _ = _rollout_rooms(_series(rooms), REGISTRY.view(location), location, steps, engine)
+    return {room: tuple(np.asarray(v, dtype=np.float64) for v in out[room]) for room in rooms}
+
+
+@pytest.mark.parametrize("location,rooms", CASES)
+def test_fused_matches_legacy(location, rooms):
+    legacy = _rollout(location, rooms, "legacy")
+    fused = _rollout(location, rooms, "fused")
+    for room in rooms:
+        for got, want in zip(fused[room], legacy[room]):
+            assert got.shape == (STEPS,)
+            np.testing.assert_allclose(got, want, rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize("location,rooms", CASES)
+def test_numpy_matches_keras(location, rooms):
+    keras = _rollout(location, rooms, "fused")
+    numpy_ = _rollout(location, rooms, "numpy")
+    for room in rooms:
+        for got, want in zip(numpy_[room], keras[room]):
+            # jauh di bawah NUMPY_ENGINE_TOLERANCE (0.01) yang dipakai verifikasi runtime
+            np.testing.assert_allclose(got, want, rtol=0, atol=1e-3)
+
+
+@pytest.mark.parametrize("engine", ["fused", "numpy"])
+def test_short_horizon_is_prefix_of_long(engine):
+    # dasar forecast cache melayani durasi pendek sebagai prefix dari horizon terpanjang
+    long = _rollout("gayungan", (1,), engine, steps=2 * STEPS)
+    short = _rollout("gayungan", (1,), engine)
+    for got, want in zip(short[1], long[1]):
+        np.testing.assert_array_equal(got, want[:STEPS])
@@ -0,0 +1,55 @@
+"""Ring buffer hot tier (backend/hot_tier.py): baris terlambat disisipkan urut waktu."""
+import numpy as np
+
+from backend.hot_tier import LocationBuffer
+
+
+def _rows(buf, sensor):
+    i = buf.index[sensor]
+    pos = buf._positions(i)
+    return buf.times[i, pos].tolist(), buf.temps[i, pos].tolist()
+
+
+def test_late_row_is_inserted_in_order():
+    buf = LocationBuffer(["DHT1"], capacity=8)
+    for t in (0, 300, 900, 1200):
+        assert buf.append("DHT1", t, float(t), 50.0)
+
+    assert buf.append("DHT1", 600, 600.0, 50.0)  # terlambat
+
+    assert _rows(buf, "DHT1") == ([0, 300, 600, 900, 1200], [0.0, 300.0, 600.0, 900.0, 1200.0])
+    assert buf.latest(["DHT1"]) == 1200
+    # append berikutnya tetap di ujung
+    assert buf.append("DHT1", 1500, 1500.0, 50.0)
+    assert _rows(buf, "DHT1")[0][-2:] == [1200, 1500]
+
+
+def test_duplicate_overwrites_and_full_buffer_drops_oldest():
+    buf = LocationBuffer(["DHT1"], capacity=4)
+    for t in (0, 300, 600, 900):
+        buf.append("DHT1", t, 1.0, 50.0)
+
+    assert buf.append("DHT1", 300, 2.0, None)  # duplikat: nilai ditimpa, NULL -> NaN
+    times, temps = _rows(buf, "DHT1")
+    assert times == [0, 300, 600, 900] and temps[1] == 2.0
+    assert np.isnan(buf.hums[0, buf._positions(0)][1])
+
+    assert buf.append("DHT1", 450, 3.0, 50.0)  # buffer penuh: baris tertua dibuang
+    assert _rows(buf, "DHT1")[0] == [300, 450, 600, 900]
+    assert not buf.append("DHT1", 100, 4.0, 50.0)  # lebih lama dari isi buffer penuh
+
+
+def test_average_rows_after_late_insert():
+    buf = LocationBuffer(["DHT1", "DHT2"], capacity=8)
+    buf.filled_from = 0
+    for t in (0, 300, 900):
+        buf.append("DHT1", t, 20.0, 50.0)
+        buf.append("DHT2", t, 22.0, 54.0)
+    buf.append("DHT1", 600, 24.0, 50.0)
+    buf.append("DHT2", 600, 26.0, 54.0)
+
+    times, temps, hums = buf.average_rows(["DHT1", "DHT2"], 4)
+
+    assert times.tolist() == [0, 300, 600, 900]
+    assert temps.tolist() == [21.0, 21.0, 25.0, 21.0]
+    assert hums.tolist() == [52.0] * 4
@@ -0,0 +1,99 @@
+"""
+Compaction + retention (backend/storage.py) pada database SQLite sintetis.
+
+    python -m pytest -q tests
+"""
+from datetime import datetime
+
+import pytest
+
+from shared import db
+from benchmarks.synthetic import build_database, DEFAULT_END
+from backend import rollups, storage
+
+CUTOFF = datetime(2026, 1, 30)
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "storage.sqlite3")
+    build_database(path, days=3, end=DEFAULT_END)
+    previous = (db.DB_BACKEND, db.DB_SQLITE_PATH, db.POOL)
+    db.use_sqlite(path)
+    rollups.create_rollup_tables()
+    yield path
+    db.DB_BACKEND, db.DB_SQLITE_PATH, db.POOL = previous
+
+
+def _query(sql, params=()):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _hourly_from_raw(table, before):
+    rows = _query(
+        f"""
+        SELECT room_id, strftime('%Y-%m-%d %H:00:00', time_id) AS hour, AVG(temperature), MIN(humidity), COUNT(*)
+        FROM {table} WHERE time_id < %s GROUP BY room_id, hour ORDER BY room_id, hour
+        """,
+        (before,),
+    )
+    return [(room, datetime.fromisoformat(hour) if isinstance(hour, str) else hour, avg, hmin, cnt)
+            for room, hour, avg, hmin, cnt in rows]
+
+
+def test_compact_deletes_raw_chunks_and_keeps_aggregates(sqlite_db):
+    table = rollups.TABLE_MAP["gayungan"]
+    expected = _hourly_from_raw(table, CUTOFF)
+    recent_before = _query(f"SELECT COUNT(*) FROM {table} WHERE time_id >= %s", (CUTOFF,))[0][0]
+    assert expected and recent_before
+
+    result = storage.compact("gayungan", CUTOFF, delete=True, chunk_days=1)
+
+    assert result["chunks"] >= 2  # beberapa chunk, masing-masing satu transaksi
+    assert result["deleted_rows"] == sum(row[4] for row in expected)
+    # raw sebelum cutoff hilang, sesudah cutoff utuh
+    assert _query(f"SELECT COUNT(*) FROM {table} WHERE time_id < %s", (CUTOFF,))[0][0] == 0
+    assert _query(f"SELECT COUNT(*) FROM {table} WHERE time_id >= %s", (CUTOFF,))[0][0] == recent_before
+
+    hourly = _query(
+        f"""
+        SELECT room_id, bucket, temp_avg, hum_min, cnt FROM {rollups.ROLLUP_HOURLY_TABLE_MAP['gayungan']}
+        WHERE sensor_id = 'ALL' ORDER BY room_id, bucket
+        """
+    )
+    assert [(r[0], r[1], r[4]) for r in hourly] == [(r[0], r[1], r[4]) for r in expected]
+    for got, want in zip(hourly, expected):
+        assert got[2] == pytest.approx(want[2])
+        assert got[3] == pytest.approx(want[3])
+
+    five_min = _query(
+        f"SELECT COUNT(*), MAX(bucket) FROM {rollups.ROLLUP_TABLE_MAP['gayungan']} WHERE sensor_id = 'ALL'"
+    )[0]
+    assert five_min[0] > 0 and five_min[1] < CUTOFF
+
+
+def test_compact_is_idempotent(sqlite_db):
+    storage.compact("gayungan", CUTOFF, delete=True, chunk_days=1)
+    hourly = _query(f"SELECT * FROM {rollups.ROLLUP_HOURLY_TABLE_MAP['gayungan']} ORDER BY room_id, sensor_id, bucket")
+
+    again = storage.compact("gayungan", CUTOFF, delete=True, chunk_days=1)
+
+    assert again == {"chunks": 0, "deleted_rows": 0, "start": None}
+    assert _query(f"SELECT * FROM {rollups.ROLLUP_HOURLY_TABLE_MAP['gayungan']} ORDER BY room_id, sensor_id, bucket") == hourly
+
+
+def test_compact_without_delete_keeps_raw(sqlite_db):
+    table = rollups.TABLE_MAP["kebalen"]
+    total = _query(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+    result = storage.compact("kebalen", CUTOFF, delete=False, chunk_days=1)
+
+    assert result["deleted_rows"] == 0 and result["chunks"] >= 1
+    assert _query(f"SELECT COUNT(*) FROM {table}")[0][0] == total